@@ -1,6 +1,9 @@
 import streamlit as st
 from utils.navbar import create_header
 from utils.footer import render_footer
+# Importing the write queue starts its flusher, so removal entries journaled
+# before a restart are replayed as soon as the app is up
+from utils.write_queue import get_queue_status
 
 # 1. Page Config
 st.set_page_config(
@@ -43,6 +46,9 @@ with col2:
         * **Version:** v1.1.0
         """
     )
+    queue_status = get_queue_status()
+    if queue_status["dead_letters"]:
+        st.error(f"❌ {queue_status['dead_letters']} removal entries were rejected by the cloud sheet. See **New Entry**.")
 
 # 4. Footer
 render_footer()
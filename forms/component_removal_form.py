@@ -4,9 +4,10 @@ import streamlit as st
 import pandas as pd
 from datetime import date
 
-from utils.component_master_loader import load_component_master
+from utils.component_master_loader import component_master
 from utils.gsheet_loader import append_removal_event_gsheet as append_removal_event
 from validation.component_rules import validate_removal_event
+from utils.counter_index import check_counters
 from utils.defect_closer import close_defect
 
 
@@ -14,13 +15,8 @@ def component_removal_form():
 
     st.subheader("Component Removal Entry")
 
-    components_df = load_component_master()
-
-    # Build component selection map
-    component_map = {}
-    for _, row in components_df.iterrows():
-        label = f"{row['component_code']} | {row['component_name']}"
-        component_map[label] = row
+    # Labels and lookups are prebuilt and cached until components.csv changes
+    master = component_master()
 
     with st.form("component_removal_form", clear_on_submit=True):
 
@@ -34,7 +30,7 @@ def component_removal_form():
 
             component_label = st.selectbox(
                 "Component",
-                sorted(component_map.keys())
+                master.labels
             )
 
             serial_number = st.text_input("Serial Number")
@@ -65,7 +61,7 @@ def component_removal_form():
 
             removal_reason = st.text_input("Removal Reason")
 
-        selected_component = component_map[component_label]
+        selected_component = master.by_label[component_label]
 
         # Locked reference fields
         st.markdown("### Component Reference (Auto-filled)")
@@ -107,14 +103,17 @@ def component_removal_form():
                 "removal_reason": removal_reason,
             }
 
-            errors = validate_removal_event(event)
+            errors = validate_removal_event(event, master.by_code)
+            # FH/FC must fit between the aircraft's earlier and later removals
+            errors += check_counters(event)
 
             if errors:
                 for e in errors:
                     st.error(e)
                 return
 
-            append_removal_event(event)
+            if not append_removal_event(event):
+                return
 
             if removal_type == "Unscheduled":
                 close_defect(aircraft_reg, selected_component["ata_chapter"])
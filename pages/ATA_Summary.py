@@ -1,19 +1,19 @@
 import streamlit as st
 import pandas as pd
+from utils.dataset_store import session_dataset
+from utils.data_loader import maintenance_summaries
 
-if "df" not in st.session_state:
+data_version, df = session_dataset()
+if df is None:
     st.warning("Please upload or load data from the Home page.")
     st.stop()
 
-df = st.session_state["df"]
+# Materialized per dataset version; revisiting the page doesn't regroup the log
+summaries = maintenance_summaries(df, data_version)
+if "ata" not in summaries:
+    st.error("Missing columns: the maintenance log needs 'component' and 'hours_since_last' (or 'anomaly').")
+    st.stop()
 
 st.title("ATA Chapter Summary")
 
-ata_summary = df.groupby("ata_chapter").agg(
-    total_events=("anomaly", "count"),
-    anomalies=("anomaly", "sum")
-).reset_index()
-
-ata_summary["anomaly_rate (%)"] = (ata_summary["anomalies"] / ata_summary["total_events"] * 100).round(1)
-
-st.dataframe(ata_summary.sort_values("anomaly_rate (%)", ascending=False))
+st.dataframe(summaries["ata"])
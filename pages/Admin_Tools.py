@@ -3,7 +3,15 @@ import pandas as pd
 import numpy as np
 from utils.navbar import create_header
 from utils.footer import render_footer
-from utils.gsheet_loader import write_bulk_data, write_data_to_sheet, clear_worksheet_data, fetch_all_data
+from utils.gsheet_loader import write_bulk_data, write_data_to_sheet, clear_worksheet_data, fetch_reference_tables
+from utils.schema import apply_schema
+from utils.removal_sync import reset_mirror, sync_notice, sync_removal_events
+from utils.mtbf_state import rebuild_mtbf_state
+from utils.online_anomaly import rebuild_online_stats
+from utils.dedupe_index import rebuild_dedupe_index
+from utils.counter_index import counter_index, refresh_counter_index
+from utils.dataset_store import clear_datasets, publish, set_session_dataset
+from utils.component_master_loader import component_master
 
 # 1. Page Config
 st.set_page_config(page_title="Admin Tools", layout="wide", initial_sidebar_state="collapsed")
@@ -12,6 +20,9 @@ create_header(current_page="Admin Tools")
 st.title("🛠️ Admin Tools")
 st.markdown("System configuration, fleet management, and testing utilities.")
 
+# Reference tabs come from one shared, cached batch request
+reference_tables = fetch_reference_tables()
+
 # Create Tabs
 tab1, tab2, tab3, tab4 = st.tabs(["✈️ Aircraft Fleet", "📚 ATA Chapters", "🧪 Testing Data", "⚠️ Danger Zone"])
 
@@ -43,7 +54,7 @@ with tab1:
     # RIGHT: Live View of Google Sheet
     with col_view:
         st.markdown("##### Current Fleet List (Live from Cloud)")
-        df_fleet = fetch_all_data("aircraft_fleet")
+        df_fleet = reference_tables["aircraft_fleet"]
         if not df_fleet.empty:
             st.dataframe(df_fleet, use_container_width=True)
         else:
@@ -75,7 +86,7 @@ with tab2:
     # RIGHT: Live View
     with col_view:
         st.markdown("##### Current ATA List (Live from Cloud)")
-        df_ata = fetch_all_data("ata_chapters")
+        df_ata = reference_tables["ata_chapters"]
         if not df_ata.empty:
             st.dataframe(df_ata, use_container_width=True)
         else:
@@ -87,19 +98,35 @@ with tab3:
     st.markdown("Generate 50 realistic rows where **Flight Hours increase over time**.")
 
     if st.button("🔄 Generate 50 Smart Records"):
-        dates = pd.date_range(start="2024-01-01", periods=50)
-        
-        # 1. Create Base Arrays
-        data = []
-        
-        # We need to track the "Current FH" for each aircraft so it increases logically
-        # Starting FH for each plane
+        fleet = ["9N-AHA", "9N-AHB", "9N-AIC"]
+
+        # We need to track the "Current FH" for each aircraft so it increases logically.
+        # Each aircraft carries on from its last recorded removal (counter index),
+        # so repeated runs stay in FH/FC order; these are the starting values
+        # for an empty history
         current_fh = {"9N-AHA": 1200, "9N-AHB": 2500, "9N-AIC": 5000}
         current_fc = {"9N-AHA": 600,  "9N-AHB": 1100, "9N-AIC": 2200}
+        start = pd.Timestamp("2024-01-01")
+        index = counter_index()
+        for ac in fleet:
+            latest = index.latest(ac)
+            if latest:
+                last_date, last_fh, last_fc = latest
+                start = max(start, last_date + pd.Timedelta(days=1))
+                current_fh[ac] = max(current_fh[ac], last_fh)
+                if pd.notna(last_fc):
+                    current_fc[ac] = max(current_fc[ac], int(last_fc))
+        dates = pd.date_range(start=start, periods=50)
+
+        # 1. Create Base Arrays
+        data = []
+
+        # Components come from the master so the rows pass bulk validation
+        components = component_master().frame
 
         for d in dates:
             # Pick a random aircraft
-            ac = np.random.choice(["9N-AHA", "9N-AHB", "9N-AIC"])
+            ac = np.random.choice(fleet)
             
             # Simulate that the plane flew 4-8 hours since the last entry
             flight_time = np.random.randint(4, 9) 
@@ -110,14 +137,15 @@ with tab3:
             current_fc[ac] += cycles
             
             # Build the row
+            component = components.iloc[np.random.randint(len(components))]
             row = {
                 "aircraft_reg": ac,
-                "component_code": "C-123",
-                "component_name": np.random.choice(["Main Wheel", "Starter Gen", "Brake Unit", "Fuel Pump"], p=[0.4, 0.2, 0.2, 0.2]),
+                "component_code": component["component_code"],
+                "component_name": component["component_name"],
                 "part_number": "PN-DEMO-123",
                 "component_type": np.random.choice(["On Condition (OC)", "Life Limited (LL)"]),
                 "serial_number": f"SN-{np.random.randint(100,999)}",
-                "ata_chapter": np.random.choice(["32", "24", "21", "73", "27"]),
+                "ata_chapter": str(component["ata_chapter"]),
                 "removal_date": d,
                 "aircraft_fh": current_fh[ac], # Uses the increasing number
                 "aircraft_fc": current_fc[ac],
@@ -129,11 +157,12 @@ with tab3:
         df_demo = pd.DataFrame(data)
         
         with st.spinner("Syncing to Google Sheet..."):
-            success = write_bulk_data(df_demo)
+            written = write_bulk_data(df_demo)
         
-        if success:
-            st.session_state["df"] = df_demo
-            st.success("✅ Smart Data Generated! Go to Dashboard to see correct MTBF.")
+        if written is not None:
+            # Only the rows that passed validation and weren't already recorded
+            set_session_dataset(publish(apply_schema(written, "removal_events"), "removal_events:demo"))
+            st.success(f"✅ {len(written)} Smart Records Generated! Go to Dashboard to see correct MTBF.")
         else:
             st.error("⚠️ Failed to write to Google Sheet.")
 # --- TAB 4: DANGER ZONE ---
@@ -141,7 +170,7 @@ with tab4:
     st.subheader("Database Maintenance")
     st.error("⚠️ **Critical Actions**")
     
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         st.markdown("##### 1. Clear Session")
@@ -158,8 +187,30 @@ with tab4:
         if st.button("🔥 Wipe Removal Events", type="primary", disabled=not confirm_wipe):
             with st.spinner("Wiping 'removal_events'..."):
                 if clear_worksheet_data("removal_events"):
+                    rebuild_mtbf_state(pd.DataFrame())
+                    rebuild_online_stats(pd.DataFrame())
+                    rebuild_dedupe_index(pd.DataFrame())
+                    refresh_counter_index(pd.DataFrame())
+                    # Cached copies of the wiped history: the local mirror and
+                    # the datasets shared by every session
+                    reset_mirror()
+                    clear_datasets()
                     st.toast("History cleared!", icon="🧹")
                     st.success("✅ 'removal_events' tab cleared.")
                     st.session_state.clear()
 
+    with col3:
+        st.markdown("##### 3. Rebuild MTBF State")
+        st.caption("Recomputes the live MTBF totals, entry-time anomaly statistics and duplicate-entry index from the full history (use after corrections). Entry-time alerts are cleared.")
+
+        if st.button("♻️ Rebuild MTBF State"):
+            with st.spinner("Rebuilding from 'removal_events'..."):
+                history = sync_removal_events()
+                if sync_notice():
+                    st.warning(sync_notice())
+                rebuild_mtbf_state(history)
+                rebuild_online_stats(history)
+                rebuild_dedupe_index(history)
+            st.success("✅ MTBF state rebuilt.")
+
 render_footer()
@@ -2,112 +2,121 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from utils.gsheet_loader import connect_to_sheet
+from utils.removal_sync import sync_notice, sync_removal_events
+from utils.dataset_store import load_frame
+from utils.anomaly_engine import ANOMALY_MIN_SAMPLES, ANOMALY_THRESHOLD, anomaly_scores, premature_failures
+from utils.online_anomaly import get_recent_alerts
+
+# Sessions opening this page within this many seconds share one sync
+SHARED_MAX_AGE = 60
+
+# Only the most severe anomalies get a detail card; the rest are in the table
+MAX_DETAIL_CARDS = 10
 
 st.set_page_config(page_title="Anomaly Detection", layout="wide")
 st.title("🚨 Component Anomaly Detection")
 st.markdown("Automatic detection of components failing significantly earlier than their fleet average.")
 
 def load_data():
-    """Fetches live data from Google Sheets."""
+    """
+    Fetches live data from Google Sheets (new rows only, via the local mirror)
+    and returns (version, frame) from the shared dataset store.
+    """
     try:
-        sheet = connect_to_sheet()
-        if not sheet:
-            return pd.DataFrame()
-            
-        data = sheet.get_all_records()
-        if not data:
-            return pd.DataFrame()
-
-        df = pd.DataFrame(data)
-        
-        # Convert 'aircraft_fh' to numeric, handling any text errors
-        df['aircraft_fh'] = pd.to_numeric(df['aircraft_fh'], errors='coerce')
-        
-        # Ensure we only look at Unscheduled removals for anomaly detection
-        # (Scheduled removals are planned, so they aren't failures)
-        if 'removal_type' in df.columns:
-            df = df[df['removal_type'] == 'Unscheduled']
-            
-        return df
+        version, df = load_frame("removal_events", sync_removal_events, max_age=SHARED_MAX_AGE)
+        # Shown in every session sharing this sync, not only the one that ran it
+        if sync_notice():
+            st.warning(sync_notice())
+        return version, df
     except Exception as e:
         st.error(f"Error loading data: {e}")
-        return pd.DataFrame()
+        return None, pd.DataFrame()
+
+# 0. Alerts raised at entry time (scored as each removal was saved)
+recent_alerts = get_recent_alerts()
+if not recent_alerts.empty:
+    with st.expander(f"🔔 Entry-time alerts ({len(recent_alerts)} most recent)"):
+        st.dataframe(recent_alerts.drop(columns=["id"]), use_container_width=True, hide_index=True)
 
 # 1. Load Data
-df = load_data()
+data_version, df = load_data()
+
+# Robust scores for every failure interval (cached per dataset version).
+# Only Unscheduled removals form intervals; scheduled removals aren't failures.
+scores = anomaly_scores(df, data_version) if not df.empty else pd.DataFrame()
 
-if df.empty:
-    st.info("👋 No unscheduled removal data found in Google Sheets yet.")
+if scores.empty:
+    st.info("👋 No repeat unscheduled removals of the same serial number found in Google Sheets yet.")
     st.stop()
 
 # 2. Sidebar Filters (Updated for new columns)
 st.sidebar.header("Filter Data")
+aircraft_options = sorted(scores["aircraft_reg"].dropna().astype(str).unique())
 selected_aircraft = st.sidebar.multiselect(
-    "Aircraft Registration", 
-    options=df["aircraft_reg"].unique(),
-    default=df["aircraft_reg"].unique()
+    "Aircraft Registration",
+    options=aircraft_options,
+    default=aircraft_options
 )
+ata_options = sorted(scores["ata_chapter"].dropna().astype(str).unique())
 selected_ata = st.sidebar.multiselect(
     "ATA Chapter",
-    options=df["ata_chapter"].unique(),
-    default=df["ata_chapter"].unique()
+    options=ata_options,
+    default=ata_options
+)
+threshold = st.sidebar.slider(
+    "Flag intervals with robust z-score below", min_value=-6.0, max_value=-1.0,
+    value=ANOMALY_THRESHOLD, step=0.5
 )
 
-# Apply Filters
-filtered_df = df[
-    (df["aircraft_reg"].isin(selected_aircraft)) &
-    (df["ata_chapter"].isin(selected_ata))
+# Apply Filters (slices the precomputed scores; nothing is recomputed)
+filtered = scores[
+    (scores["aircraft_reg"].isin(selected_aircraft)) &
+    (scores["ata_chapter"].isin(selected_ata))
 ]
 
 # 3. The Logic: Find Premature Failures
-# We group by 'component_name' to find the average life of each type of part.
-if not filtered_df.empty:
-    stats = filtered_df.groupby("component_name")['aircraft_fh'].agg(['mean', 'std', 'count']).reset_index()
-
-    # We need at least 2 data points to calculate a standard deviation
-    valid_components = stats[stats['count'] >= 2] 
-
-    if valid_components.empty:
-        st.warning("ℹ️ Not enough data to detect anomalies yet. You need at least 2 removals of the same component.")
+# Each interval (FH a unit flew since its previous unscheduled removal) is
+# compared with the median interval of the same component across the fleet.
+if not filtered.empty:
+    if filtered["robust_z"].notna().sum() == 0:
+        st.warning(f"ℹ️ Not enough data to detect anomalies yet. You need at least {ANOMALY_MIN_SAMPLES} repeat removals of the same component.")
         st.subheader("Current Data Log")
-        st.dataframe(filtered_df)
+        st.dataframe(filtered)
     else:
-        # Merge stats back to the main list
-        df_analysis = pd.merge(filtered_df, stats, on="component_name")
-
-        # Define "Anomaly": Failing earlier than (Mean - 1.5 Standard Deviations)
-        # The .replace(0, 1) prevents division by zero if all parts last exactly the same amount
-        df_analysis['z_score'] = (df_analysis['aircraft_fh'] - df_analysis['mean']) / df_analysis['std'].replace(0, 1)
-        
-        # We look for z_score < -1.5 (Bottom 7% of performers)
-        anomalies = df_analysis[df_analysis['z_score'] < -1.5]
+        anomalies = premature_failures(filtered, threshold)
 
         # 4. Display Results
         st.divider()
         if not anomalies.empty:
             st.error(f"🚨 Found {len(anomalies)} Premature Failures")
-            
-            for index, row in anomalies.iterrows():
-                with st.expander(f"⚠️ {row['component_name']} on {row['aircraft_reg']} (ATA {row['ata_chapter']})", expanded=True):
+
+            for row in anomalies.head(MAX_DETAIL_CARDS).itertuples(index=False):
+                with st.expander(f"⚠️ {row.component_name} S/N {row.serial_number} on {row.aircraft_reg} (ATA {row.ata_chapter})", expanded=True):
                     c1, c2, c3 = st.columns(3)
-                    c1.metric("Failed At", f"{row['aircraft_fh']} FH")
-                    c2.metric("Fleet Average", f"{row['mean']:.1f} FH")
-                    c3.metric("Deficit", f"{row['aircraft_fh'] - row['mean']:.1f} FH", delta_color="inverse")
-                    st.caption(f"Reason: {row['removal_reason']}")
+                    c1.metric("Failed After", f"{row.fh_delta:.1f} FH")
+                    c2.metric("Fleet Median", f"{row.median_fh:.1f} FH")
+                    c3.metric("Deficit", f"{row.deficit_fh:.1f} FH", delta_color="inverse")
+                    st.caption(f"Robust z-score: {row.robust_z} · Reason: {getattr(row, 'removal_reason', '')}")
+
+            st.dataframe(
+                anomalies[["removal_date", "aircraft_reg", "ata_chapter", "component_name", "serial_number",
+                           "fh_delta", "median_fh", "mad_fh", "robust_z", "deficit_fh"]],
+                use_container_width=True, hide_index=True
+            )
         else:
             st.success("✅ No anomalies detected. All components are performing within normal limits.")
 
         # 5. Visualizing the Fleet
         st.subheader("Fleet Reliability Overview")
+        plot_df = filtered.assign(flagged=filtered["robust_z"] < threshold)
         fig = px.scatter(
-            filtered_df, 
-            x="aircraft_fh", 
-            y="component_name", 
-            color="aircraft_reg",
-            size="aircraft_fh",
-            hover_data=["removal_reason", "removal_date"],
-            title="Component Life Distribution (Flight Hours)"
+            plot_df,
+            x="fh_delta",
+            y="component_name",
+            color="flagged",
+            symbol="aircraft_reg",
+            hover_data=["serial_number", "robust_z", "removal_date"],
+            title="Component Interval Distribution (FH between removals of the same unit)"
         )
         st.plotly_chart(fig, use_container_width=True)
 else:
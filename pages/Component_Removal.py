@@ -3,7 +3,9 @@ import pandas as pd
 from datetime import date
 from utils.navbar import create_header
 from utils.footer import render_footer
-from utils.gsheet_loader import append_removal_event_gsheet, fetch_all_data
+from utils.gsheet_loader import append_removal_event_gsheet, fetch_reference_tables, invalidate_reference_tables
+from utils.write_queue import clear_dead_letters, get_dead_letters, get_queue_status
+from utils.counter_index import check_counters
 
 # 1. Page Config
 st.set_page_config(page_title="New Removal", layout="wide", initial_sidebar_state="collapsed")
@@ -12,14 +14,15 @@ create_header(current_page="New Entry")
 st.title("➕ New Component Removal")
 
 # --- 2. SMART DROPDOWN LOGIC (CACHED) ---
-@st.cache_data(ttl=300) # Cache for 5 minutes automatically
 def load_reference_data():
     """
-    Fetches Fleet and ATA data from Google Sheets to populate dropdowns.
+    Builds the Fleet and ATA dropdowns from the shared reference cache
+    (one batched Google Sheets request per 5 minutes for the whole app).
     """
     # Fetch DataFrames
-    df_fleet = fetch_all_data("aircraft_fleet")
-    df_ata = fetch_all_data("ata_chapters")
+    reference_tables = fetch_reference_tables()
+    df_fleet = reference_tables["aircraft_fleet"]
+    df_ata = reference_tables["ata_chapters"]
     
     # Process Fleet List
     if not df_fleet.empty and "Registration" in df_fleet.columns:
@@ -46,12 +49,32 @@ def load_reference_data():
 col_title, col_refresh = st.columns([4, 1])
 with col_refresh:
     if st.button("🔄 Refresh Lists"):
-        load_reference_data.clear() # Clears the cache
+        invalidate_reference_tables() # Clears the shared cache
         st.toast("Reference lists refreshed from Cloud!", icon="☁️")
 
 # Load the data
 aircraft_options, ata_options = load_reference_data()
 
+# Journaled entries waiting for (or rejected by) the cloud sheet
+queue_status = get_queue_status()
+if queue_status["pending"]:
+    st.caption(f"☁️ {queue_status['pending']} entries waiting to sync to the cloud.")
+if queue_status["last_error"]:
+    st.warning(f"Cloud sync is retrying: {queue_status['last_error']}. Entries are safely stored locally.")
+if queue_status["dead_letters"]:
+    st.error(f"❌ {queue_status['dead_letters']} entries were rejected by the cloud sheet and need to be entered again.")
+    with st.expander("Rejected entries"):
+        st.dataframe(
+            pd.DataFrame([
+                {"failed_at": d["failed_at"], "error": d["error"], "row": d["entry"].get("row", d["entry"].get("raw"))}
+                for d in get_dead_letters()
+            ]),
+            use_container_width=True, hide_index=True
+        )
+        if st.button("🗑️ Clear rejected entries"):
+            clear_dead_letters()
+            st.rerun()
+
 # --- 3. THE FORM ---
 st.markdown("Record an unscheduled component removal event.")
 
@@ -130,10 +153,16 @@ with st.form("removal_entry_form"):
                 "removal_reason": removal_reason
             }
             
-            # Save to Google Sheet
-            with st.spinner("Saving to Cloud Database..."):
-                if append_removal_event_gsheet(new_entry):
-                    st.success(f"✅ Event recorded for {comp_name} on {aircraft_reg}")
-                    st.balloons()
+            # FH/FC must fit between the aircraft's earlier and later removals
+            counter_problems = check_counters(new_entry)
+            for problem in counter_problems:
+                st.error(f"⚠️ {problem}")
+
+            # Queue for the Google Sheet (journaled locally, uploaded in batches)
+            if not counter_problems:
+                with st.spinner("Saving..."):
+                    if append_removal_event_gsheet(new_entry):
+                        st.success(f"✅ Event recorded for {comp_name} on {aircraft_reg}")
+                        st.balloons()
 
 render_footer()
@@ -1,7 +1,6 @@
 # pages/Connection_Test.py
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
+from utils.gsheet_loader import connect_to_sheet, get_connection_stats
 
 st.title("🔌 Google Sheet Connection Test")
 
@@ -15,22 +14,21 @@ else:
     st.error("❌ No 'gcp_service_account' section found in Secrets.")
     st.stop()
 
-# 2. Try Connecting
+# 2. Try Connecting (through the shared connection pool)
 try:
-    SCOPE = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-    creds = Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"], 
-        scopes=SCOPE
-    )
-    client = gspread.authorize(creds)
-    
-    # 3. Try Writing
-    sheet = client.open("MaintWatch_Data").worksheet("removal_events")
+    sheet = connect_to_sheet("removal_events")
+    if not sheet:
+        st.stop()
     st.success("✅ Successfully found the Sheet!")
-    
+
+    stats = get_connection_stats()
+    s1, s2, s3 = st.columns(3)
+    s1.metric("Connect Latency", f"{stats['connect_ms']} ms" if stats["connect_ms"] is not None else "n/a")
+    s2.metric("Worksheet Lookup", f"{stats['worksheet_ms'].get('removal_events', 0)} ms")
+    s3.metric("Pool Hits", stats["cache_hits"])
+    st.caption(f"Cached worksheets: {', '.join(stats['cached_worksheets']) or 'none'}")
+
+    # 3. Try Writing
     sheet.append_row(["TEST_CONNECTION", "If you see this", "It works!"])
     st.balloons()
     st.success("✅ Wrote a test row to the sheet. Check it now!")
@@ -2,7 +2,14 @@ import streamlit as st
 import pandas as pd
 from utils.navbar import create_header
 from utils.footer import render_footer
-from utils.gsheet_loader import fetch_all_data
+from utils.removal_sync import sync_notice, sync_removal_events, get_sync_status
+from utils.schema import apply_schema
+from utils.removal_events_loader import load_removal_events
+from utils.dataset_store import load_frame, publish, set_session_dataset
+from utils.component_master_loader import component_master
+from utils.dedupe_index import duplicate_events
+from utils.counter_index import counter_errors
+from validation.component_rules import REQUIRED_FIELDS, error_summary, row_errors, validate_removal_events
 
 # 1. Page Config
 st.set_page_config(page_title="Data Upload", layout="wide", initial_sidebar_state="collapsed")
@@ -12,20 +19,34 @@ st.title("📂 Data Management")
 st.markdown("Import historical maintenance records or sync with the cloud database.")
 
 # 2. SELECTION: Cloud vs Local
-tab1, tab2 = st.tabs(["☁️ Load from Google Sheet (Live)", "📄 Upload CSV (Legacy)"])
+tab1, tab2, tab3 = st.tabs(["☁️ Load from Google Sheet (Live)", "📄 Upload CSV (Legacy)", "🗄️ Local History"])
 
 # --- TAB 1: GOOGLE SHEET LOAD ---
 with tab1:
     st.subheader("Sync with Cloud Database")
     st.markdown("Pull the latest data from the **MaintWatch_Data** Google Sheet.")
-    
+    st.caption("The sheet is checked against the local mirror chunk by chunk; only new and edited rows are written, and a full reload runs automatically if rows were removed.")
+
+    full_reload = st.checkbox("Force full reload", value=False)
+
     if st.button("🔄 Fetch Data from Cloud", type="primary"):
+        # One shared fetch even if several users click at the same time
         with st.spinner("Connecting to Google Sheets..."):
-            df_cloud = fetch_all_data("removal_events")
-            
+            version, df_cloud = load_frame(
+                "removal_events",
+                lambda: sync_removal_events(full=full_reload),
+                key="removal_events:full" if full_reload else None
+            )
+        if sync_notice():
+            st.warning(sync_notice())
+
+        sync_status = get_sync_status()
+        if sync_status.get("synced_at"):
+            st.caption(f"Mirror synced to sheet row {sync_status.get('last_row')} at {sync_status.get('synced_at')}.")
+
         if not df_cloud.empty:
-            # Save to Session State
-            st.session_state["df"] = df_cloud
+            # The session keeps only a reference to the shared dataset
+            set_session_dataset(version)
             st.success(f"✅ Successfully loaded {len(df_cloud)} records from the cloud!")
             
             # Show Preview
@@ -45,11 +66,59 @@ with tab2:
 
     if uploaded_file:
         try:
-            df_local = pd.read_csv(uploaded_file)
-            st.session_state["df"] = df_local
+            df_local = apply_schema(pd.read_csv(uploaded_file), "removal_events")
+
+            # Removal-event exports are checked row by row against the
+            # removal-event rules and the FH/FC order of each aircraft's
+            # history; other uploads (e.g. maintenance logs) load unchanged
+            if set(REQUIRED_FIELDS).issubset(df_local.columns):
+                errors = pd.concat(
+                    [validate_removal_events(df_local, component_master().by_code), counter_errors(df_local)], axis=1
+                )
+                invalid = errors.any(axis=1).to_numpy()
+                if invalid.any():
+                    st.warning(f"⚠️ {int(invalid.sum())} of {len(df_local)} rows failed validation.")
+                    st.dataframe(error_summary(errors), hide_index=True)
+                    with st.expander("First failing rows"):
+                        st.dataframe(
+                            df_local[invalid].head(20).assign(errors=["; ".join(m) for m in row_errors(errors, 20).values()])
+                        )
+                    if not st.checkbox("Load the failing rows as well", value=False):
+                        df_local = df_local[~invalid].reset_index(drop=True)
+
+                # The same removal listed twice would count as two failures
+                repeated = duplicate_events(df_local)
+                if repeated.any():
+                    st.info(f"ℹ️ Dropped {int(repeated.sum())} repeated rows (same aircraft, serial number, date and FH).")
+                    df_local = df_local[~repeated].reset_index(drop=True)
+
+            set_session_dataset(publish(df_local, "removal_events:upload"))
             st.success(f"✅ Loaded {len(df_local)} records from CSV.")
             st.dataframe(df_local.head())
         except Exception as e:
             st.error(f"Error parsing CSV: {e}")
 
+# --- TAB 3: LOCAL HISTORY ---
+with tab3:
+    st.subheader("Load from Local Storage")
+    st.markdown("Load part of the removal history kept by this app's storage backend.")
+    st.caption("With the Parquet store enabled only the selected years and aircraft are read from disk.")
+
+    today = pd.Timestamp.today().date()
+    period = st.date_input("Removal Period", [today - pd.Timedelta(days=365), today])
+    aircraft_text = st.text_input("Aircraft (comma-separated, blank = all)", placeholder="e.g., 9N-AHA, 9N-AHB")
+
+    if st.button("📥 Load Local History"):
+        start, end = period if len(period) == 2 else (None, None)
+        aircraft = [a.strip() for a in aircraft_text.split(",") if a.strip()] or None
+        with st.spinner("Reading local history..."):
+            df_history = load_removal_events(start=start, end=end, aircraft=aircraft)
+
+        if not df_history.empty:
+            set_session_dataset(publish(apply_schema(df_history, "removal_events"), "removal_events:local"))
+            st.success(f"✅ Loaded {len(df_history)} records from local storage.")
+            st.dataframe(df_history.head())
+        else:
+            st.warning("⚠️ No local records match this selection.")
+
 render_footer()
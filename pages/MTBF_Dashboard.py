@@ -3,6 +3,15 @@ import pandas as pd
 import plotly.express as px
 from utils.navbar import create_header
 from utils.footer import render_footer
+from utils.dataset_store import session_dataset
+from utils.dashboard_dataset import dashboard_dataset, date_bounds
+from utils.mtbf_calculator import failure_intervals, mtbf_from_intervals
+from utils.mtbf_state import get_mtbf_snapshot
+from utils.mtbf_trends import TREND_WINDOWS, mtbf_trends
+from utils.reliability_stats import reliability_table
+from utils.utilization import utilization_index
+from utils.reliability_cube import reliability_cube
+from utils.rogue_units import ROGUE_MIN_REMOVALS, ROGUE_WINDOWS, rogue_windows, summarize_rogues
 
 # 1. Page Config
 st.set_page_config(page_title="Reliability Dashboard", layout="wide", initial_sidebar_state="collapsed")
@@ -12,33 +21,26 @@ st.title("📉 Reliability Control Board")
 st.markdown("Monitor fleet health, track repetitive defects, and analyze MTBF trends.")
 
 # 2. LOAD DATA
-if "df" not in st.session_state or st.session_state["df"].empty:
+# The session holds a version reference into the shared, read-only dataset store
+data_version, source_df = session_dataset()
+if source_df is None or source_df.empty:
     st.warning("⚠️ No data loaded.")
     st.info("Please go to **Admin Tools** -> **Testing Data** and click 'Generate 50 Smart Records' to see this dashboard in action.")
     render_footer()
     st.stop()
 
-df = st.session_state["df"].copy()
-
 # 3. NORMALIZE COLUMNS
-column_map = {
-    "removal_date": "Date",
-    "aircraft_reg": "Aircraft",
-    "ata_chapter": "ATA",
-    "component_name": "Component",
-    "part_number": "Part Number",
-    "aircraft_fh": "FH",
-    "removal_reason": "Reason",
-    "component_type": "Type"
-}
-df = df.rename(columns=column_map)
-
-# Data Type Enforcement
-df["Date"] = pd.to_datetime(df["Date"])
-df["FH"] = pd.to_numeric(df["FH"], errors='coerce').fillna(0)
-df["ATA"] = df["ATA"].astype(str)
-if "Aircraft" in df.columns:
-    df["Aircraft"] = df["Aircraft"].astype(str)
+# Prepared once per dataset version (utils/dashboard_dataset): typed, renamed,
+# sorted by date and indexed by aircraft / ATA / component
+dataset = dashboard_dataset(source_df, data_version)
+df = dataset.frame
+
+# Derived tables below are built from the typed frame with its original column names
+typed_df = dataset.typed
+
+# Failure intervals are built (and sorted) once per dataset version; every
+# MTBF view below is a groupby over this shared table.
+intervals = failure_intervals(typed_df, data_version)
 
 # 4. FILTERS (Restored Aircraft Filter)
 st.markdown("### 🔍 Scope of Analysis")
@@ -46,36 +48,40 @@ f1, f2, f3 = st.columns(3)
 
 with f1:
     # Aircraft Filter
-    avail_ac = sorted(df["Aircraft"].unique())
+    avail_ac = dataset.options("Aircraft")
     sel_ac = st.multiselect("Filter by Aircraft", avail_ac, default=avail_ac)
 
 with f2:
     # ATA Filter
-    avail_ata = sorted(df["ATA"].unique())
+    avail_ata = dataset.options("ATA")
     sel_ata = st.multiselect("Filter by ATA Chapter", avail_ata, default=avail_ata)
 
 with f3:
     # Date Filter
-    min_d, max_d = df["Date"].min().date(), df["Date"].max().date()
+    min_d, max_d = dataset.date_range()
     sel_date = st.date_input("Analysis Period", [min_d, max_d])
 
-# Apply Filters
-mask = (df["Aircraft"].isin(sel_ac)) & (df["ATA"].isin(sel_ata))
+# Apply Filters (index lookups + binary search on the sorted dates)
 if len(sel_date) == 2:
-    mask = mask & (df["Date"].dt.date >= sel_date[0]) & (df["Date"].dt.date <= sel_date[1])
-filtered_df = df[mask]
+    filtered_df = dataset.filter(sel_date[0], sel_date[1], Aircraft=sel_ac, ATA=sel_ata)
+    period_lower, period_upper = date_bounds(sel_date[0], sel_date[1])
+else:
+    filtered_df = dataset.filter(Aircraft=sel_ac, ATA=sel_ata)
 
 # 5. ENGINEERING LOGIC & KPI CALCULATION
-# Estimate Fleet Hours based on (Max FH - Min FH) per aircraft in selection
-fleet_hours = 0
-for ac in sel_ac:
-    ac_data = filtered_df[filtered_df["Aircraft"] == ac]
-    if not ac_data.empty:
-        delta = ac_data["FH"].max() - ac_data["FH"].min()
-        if delta == 0: delta = 10 # Minimal fallback to avoid div/0
-        fleet_hours += delta
-
-total_removals = len(filtered_df)
+# Fleet hours flown in the period, interpolated from dated FH readings per
+# aircraft (removal records + fleet tab), see utils/utilization
+period_start, period_end = sel_date if len(sel_date) == 2 else (min_d, max_d)
+fleet_hours = utilization_index(typed_df, data_version).fleet_hours(sel_ac, period_start, period_end)
+
+# Counts come from the month-grain reliability cube (utils/reliability_cube)
+cube = reliability_cube(typed_df, data_version)
+cube_scope = dict(aircraft=sel_ac, ata=sel_ata)
+if len(sel_date) == 2:
+    cube_scope.update(start=sel_date[0], end=sel_date[1])
+totals = cube.query([], **cube_scope)
+
+total_removals = int(totals["removals"].iloc[0])
 fleet_mtbf = int(fleet_hours / total_removals) if total_removals > 0 else 0
 reliability = round((1 - (total_removals / fleet_hours)) * 100, 2) if fleet_hours > 0 else 100
 
@@ -89,27 +95,38 @@ k3.metric("📈 Fleet MTBF", f"{fleet_mtbf} FH", help="Target: >500 FH",
 k4.metric("🛡️ Technical Dispatch", f"{reliability}%")
 
 # 7. 🚨 ALERT SECTION
-# Identify "Repetitive Defects" (Same Part removed > 2 times in period)
-rogues = filtered_df["Part Number"].value_counts()
-rogues = rogues[rogues > 2]
+# Identify rogue units: individual serials with repeated unscheduled removals
+# inside a sliding window (window counts are precomputed per dataset version)
+with st.expander("⚙️ Rogue unit criteria"):
+    r1, r2, r3 = st.columns(3)
+    rogue_min = r1.number_input("Removals (N or more)", min_value=2, value=ROGUE_MIN_REMOVALS, step=1)
+    rogue_basis = r2.radio("Window basis", ["Calendar days", "Flight hours"], horizontal=True)
+    basis = "days" if rogue_basis == "Calendar days" else "fh"
+    rogue_window = r3.number_input(f"Window ({rogue_basis.lower()})", min_value=1, value=ROGUE_WINDOWS[basis], step=50)
+
+rogue_rows = rogue_windows(typed_df, basis, rogue_window, data_version)
+if not rogue_rows.empty:
+    rogue_mask = rogue_rows["aircraft_reg"].isin(sel_ac) & rogue_rows["ata_chapter"].isin(sel_ata)
+    if len(sel_date) == 2:
+        rogue_dates = rogue_rows["removal_date"]
+        rogue_mask = rogue_mask & (rogue_dates >= period_lower) & (rogue_dates < period_upper)
+    rogues = summarize_rogues(rogue_rows[rogue_mask], rogue_min)
+else:
+    rogues = pd.DataFrame()
 
 if not rogues.empty:
-    st.error(f"⚠️ **ALERT: Repetitive Defects Detected**")
-    st.markdown("The following parts are failing repeatedly (Potential Rogue Units):")
-    # Create a clean little table for the rogues
-    rogue_list = []
-    for pn, count in rogues.items():
-        # Get Component Name
-        name = filtered_df[filtered_df["Part Number"] == pn]["Component"].iloc[0]
-        rogue_list.append({"Component": name, "P/N": pn, "Failures": count})
-    st.table(pd.DataFrame(rogue_list))
+    st.error(f"⚠️ **ALERT: {len(rogues)} Rogue Unit(s) Detected**")
+    st.markdown(f"The following serials had {rogue_min}+ unscheduled removals within {rogue_window} {rogue_basis.lower()}:")
+    st.dataframe(rogues, use_container_width=True, hide_index=True)
 else:
-    st.success("✅ No repetitive defects detected (Threshold: >2 removals in period).")
+    st.success(f"✅ No rogue units detected (Threshold: {rogue_min}+ removals within {rogue_window} {rogue_basis.lower()}).")
 
 # 8. ANALYTICAL CHARTS
 st.subheader("📊 Defect Analysis")
 
-tab_scatter, tab_pareto = st.tabs(["📍 Repetitive Defect Visualizer", "🏆 Top Offenders"])
+tab_scatter, tab_pareto, tab_mtbf, tab_trend = st.tabs(
+    ["📍 Repetitive Defect Visualizer", "🏆 Top Offenders", "📐 MTBF Breakdown", "📈 MTBF Trends"]
+)
 
 # CHART 1: SCATTER PLOT (The "Deep Think" Tool)
 # Visualizes CLUSTERS of failures.
@@ -137,9 +154,13 @@ with tab_scatter:
 with tab_pareto:
     st.markdown("**Which systems are consuming the most maintenance resources?**")
     
-    if not filtered_df.empty:
+    # Removal counts per component and ATA, summed from the cube
+    offenders = cube.query(["component_name", "ata_chapter"], **cube_scope)
+    offenders = offenders[offenders["removals"] > 0]
+
+    if not offenders.empty:
         # Group by Component AND ATA to give engineering context
-        top_offenders = filtered_df.groupby(["Component", "ATA"]).size().reset_index(name="Count")
+        top_offenders = offenders.rename(columns={"component_name": "Component", "ata_chapter": "ATA", "removals": "Count"})
         top_offenders = top_offenders.sort_values("Count", ascending=False).head(10)
         
         fig_bar = px.bar(
@@ -154,4 +175,106 @@ with tab_pareto:
         fig_bar.update_layout(yaxis={'categoryorder':'total ascending'})
         st.plotly_chart(fig_bar, use_container_width=True)
 
+        # Per-ATA summary for the same scope
+        ata_table = cube.query(["ata_chapter"], **cube_scope)
+        ata_table = ata_table[ata_table["removals"] > 0].rename(columns={"ata_chapter": "ATA"})
+        ata_table["removals_per_1000_fh"] = (ata_table["removals"] / fleet_hours * 1000).round(2) if fleet_hours > 0 else None
+        st.markdown("**Summary by ATA chapter**")
+        st.dataframe(
+            ata_table.sort_values("removals", ascending=False).drop(columns=["interval_fh"]),
+            use_container_width=True, hide_index=True
+        )
+
+# CHART 3: MTBF BY VIEW (from the shared failure-interval table)
+with tab_mtbf:
+    st.markdown("**Mean time between unscheduled removals of the same unit (FH, FC and calendar days).**")
+
+    mtbf_views = {
+        "Component": "component",
+        "ATA Chapter": "ata",
+        "Aircraft": "aircraft",
+        "Part Number": "part_number",
+        "Fleet": "fleet",
+    }
+    view = st.radio("Group MTBF by", list(mtbf_views), horizontal=True)
+
+    # Apply the same scope filters to the interval table (by the later removal of each pair)
+    if not intervals.empty:
+        iv_mask = intervals["aircraft_reg"].isin(sel_ac) & intervals["ata_chapter"].isin(sel_ata)
+        if len(sel_date) == 2:
+            iv_dates = intervals["removal_date"]
+            iv_mask = iv_mask & (iv_dates >= period_lower) & (iv_dates < period_upper)
+        mtbf_table = mtbf_from_intervals(intervals[iv_mask], mtbf_views[view])
+    else:
+        mtbf_table = pd.DataFrame()
+
+    if mtbf_table.empty:
+        st.info("Not enough repeat unscheduled removals of the same serial number to calculate MTBF.")
+    else:
+        st.dataframe(mtbf_table, use_container_width=True, hide_index=True)
+
+    # Running totals kept up to date on every saved removal (full history, no filters)
+    live_levels = {"Component": "component", "ATA Chapter": "ata", "Fleet": "fleet"}
+    if view in live_levels:
+        with st.expander("⚡ Live MTBF (all history, updated on every entry)"):
+            live_table = get_mtbf_snapshot(live_levels[view])
+            if live_table.empty:
+                st.caption("No live totals yet. Use Admin Tools → Danger Zone → Rebuild MTBF State.")
+            else:
+                st.dataframe(live_table, use_container_width=True, hide_index=True)
+
+    # Confidence bounds and Weibull fits for every component (cached per dataset version)
+    if view == "Component":
+        with st.expander("🎯 Confidence bounds & Weibull fit (all history)"):
+            st.caption(
+                "MTBF = total FH exposure / failures, where units still installed add the FH flown since "
+                "their last removal as censored time. β < 1: early-life failures, β ≈ 1: random, β > 1: wear-out."
+            )
+            confidence = st.select_slider("Confidence level", options=[0.80, 0.90, 0.95], value=0.90)
+            stats_table = reliability_table(typed_df, confidence, data_version)
+            if stats_table.empty:
+                st.caption("Not enough unscheduled removals to fit.")
+            else:
+                st.dataframe(stats_table, use_container_width=True, hide_index=True)
+
+# CHART 4: ROLLING MTBF TRENDS (whole fleet, cached per dataset version)
+with tab_trend:
+    st.markdown("**Rolling MTBF and unscheduled removal rate, evaluated at each month end.**")
+
+    t1, t2 = st.columns(2)
+    with t1:
+        trend_view = st.radio("Trend by", ["Component", "ATA Chapter"], horizontal=True)
+    with t2:
+        trend_window = st.selectbox("Rolling window (months)", TREND_WINDOWS, index=1)
+
+    trend_level = "component" if trend_view == "Component" else "ata"
+    trend_key = "component_code" if trend_level == "component" else "ata_chapter"
+    trends = mtbf_trends(typed_df, trend_level, data_version)
+
+    if trends.empty:
+        st.info("Not enough unscheduled removals to build trends.")
+    else:
+        trends = trends[trends["window_months"] == trend_window]
+        if len(sel_date) == 2:
+            trend_months = trends["month"].dt.date
+            trends = trends[(trend_months >= sel_date[0].replace(day=1)) & (trend_months <= sel_date[1])]
+
+        # Default to the keys with the most failures in the period
+        ranking = trends.groupby(trend_key)["removals"].sum().sort_values(ascending=False)
+        trend_keys = st.multiselect(f"{trend_view}s to plot", ranking.index.tolist(), default=ranking.index[:5].tolist())
+        plot_df = trends[trends[trend_key].isin(trend_keys)]
+
+        if not plot_df.empty:
+            fig_trend = px.line(
+                plot_df, x="month", y="mtbf_fh", color=trend_key, markers=True,
+                title=f"{trend_window}-Month Rolling MTBF (FH)"
+            )
+            st.plotly_chart(fig_trend, use_container_width=True)
+
+            fig_rate = px.line(
+                plot_df, x="month", y="removal_rate", color=trend_key,
+                title=f"{trend_window}-Month Unscheduled Removal Rate (per month)"
+            )
+            st.plotly_chart(fig_rate, use_container_width=True)
+
 render_footer()
@@ -1,26 +1,19 @@
 import streamlit as st
 import pandas as pd
+from utils.dataset_store import session_dataset
+from utils.data_loader import maintenance_summaries
 
-if "df" not in st.session_state:
+data_version, df = session_dataset()
+if df is None:
     st.warning("Please upload or load data from the Home page.")
     st.stop()
 
-df = st.session_state["df"]
-
-required_cols = {"pilot_name", "rank", "anomaly", "experience_years"}
-missing = required_cols - set(df.columns)
-if missing:
-    st.error(f"Missing columns: {missing}")
+# Materialized per dataset version; revisiting the page doesn't regroup the log
+summaries = maintenance_summaries(df, data_version)
+if "pilots" not in summaries:
+    st.error("Missing columns: the maintenance log needs 'pilot_name' and 'hours_since_last' (or 'anomaly').")
     st.stop()
 
 st.title("Pilot Performance")
 
-pilot_summary = df.groupby(["pilot_name", "rank"]).agg(
-    total_flights=("anomaly", "count"),
-    anomalies=("anomaly", "sum"),
-    avg_experience=("experience_years", "mean")
-).reset_index()
-
-pilot_summary["anomaly_rate (%)"] = (pilot_summary["anomalies"] / pilot_summary["total_flights"] * 100).round(1)
-
-st.dataframe(pilot_summary.sort_values("anomaly_rate (%)", ascending=False))
+st.dataframe(summaries["pilots"])
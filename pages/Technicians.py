@@ -1,20 +1,19 @@
 import streamlit as st
 import pandas as pd
+from utils.dataset_store import session_dataset
+from utils.data_loader import maintenance_summaries
 
-if "df" not in st.session_state:
+data_version, df = session_dataset()
+if df is None:
     st.warning("Please upload or load data from the Home page.")
     st.stop()
 
-df = st.session_state["df"]
+# Materialized per dataset version; revisiting the page doesn't regroup the log
+summaries = maintenance_summaries(df, data_version)
+if "technicians" not in summaries:
+    st.error("Missing columns: the maintenance log needs 'technician' and 'hours_since_last' (or 'anomaly').")
+    st.stop()
 
 st.title("Technician Performance")
 
-tech_summary = df.groupby(["technician", "certification"]).agg(
-    total_tasks=("anomaly", "count"),
-    anomalies=("anomaly", "sum"),
-    avg_experience=("experience_years", "mean")
-).reset_index()
-
-tech_summary["anomaly_rate (%)"] = (tech_summary["anomalies"] / tech_summary["total_tasks"] * 100).round(1)
-
-st.dataframe(tech_summary.sort_values("anomaly_rate (%)", ascending=False))
+st.dataframe(summaries["technicians"])
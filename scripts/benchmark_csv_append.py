@@ -0,0 +1,90 @@
+# /scripts/benchmark_csv_append.py
+#
+# Sustained local ingest rate of removal_events.csv appends:
+#   python -m scripts.benchmark_csv_append [rows] [threads]
+# Compares the old path (open, header check, append one row, close; no
+# lock, no fsync), the same path with an fsync per row (what durability
+# costs without grouping) and CsvAppender (group commit, file lock, fsync
+# per group), with `threads` sessions appending concurrently.
+
+import csv
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from utils.csv_appender import CsvAppender
+from utils.storage import TABLE_SCHEMAS
+
+FIELDNAMES = list(TABLE_SCHEMAS["removal_events"])
+
+
+def _record(i):
+    return {
+        "aircraft_reg": "9N-AHB", "component_code": f"C{i % 20:03d}", "component_name": "Fuel Pump",
+        "part_number": "PN-1", "serial_number": f"SN-{i}", "ata_chapter": "28",
+        "removal_date": "2025-01-01", "aircraft_fh": 1000 + i, "aircraft_fc": 500 + i,
+        "removal_type": "Unscheduled", "removal_reason": "Wear",
+    }
+
+
+def _legacy_append(path, record, sync=False):
+    header = None
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            header = next((row for row in csv.reader(f) if row), None)
+    except FileNotFoundError:
+        pass
+    with open(path, "a" if header else "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=header or FIELDNAMES, extrasaction="ignore")
+        if not header:
+            writer.writeheader()
+        writer.writerow(record)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _run(append, rows, threads):
+    per_thread = rows // threads
+
+    def worker(offset):
+        for i in range(per_thread):
+            append(_record(offset + i))
+
+    workers = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def _count_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return sum(1 for _ in csv.reader(f)) - 1
+
+
+def run_benchmark(rows=2000, threads=8):
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.csv")
+        legacy_rate = _run(lambda r: _legacy_append(legacy_path, r), rows, threads)
+
+        synced_path = os.path.join(tmp, "synced.csv")
+        synced_rate = _run(lambda r: _legacy_append(synced_path, r, sync=True), rows, threads)
+
+        group_path = os.path.join(tmp, "group.csv")
+        appender = CsvAppender(group_path, FIELDNAMES)
+        group_rate = _run(lambda r: appender.append([r]), rows, threads)
+
+        print(f"{rows} rows, {threads} concurrent writers")
+        print(f"  one open per row : {legacy_rate:10.0f} rows/s  ({_count_rows(legacy_path)} rows in file, no fsync)")
+        print(f"  ... with fsync   : {synced_rate:10.0f} rows/s  ({_count_rows(synced_path)} rows in file, fsync per row)")
+        print(f"  group commit     : {group_rate:10.0f} rows/s  ({_count_rows(group_path)} rows in file, fsync per group)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run_benchmark(*args)
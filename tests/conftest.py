@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app runs from the repository root (streamlit run Home.py), so its
+# packages are imported from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from utils.counter_index import FC_ORDER_RULE, FH_ORDER_RULE, CounterIndex, counter_errors
+
+
+def _removals(rows):
+    return pd.DataFrame(rows, columns=["aircraft_reg", "removal_date", "aircraft_fh", "aircraft_fc"])
+
+
+HISTORY = _removals([
+    ("9N-AHA", "2024-01-01", 100.0, 50),
+    ("9N-AHA", "2024-03-01", 300.0, 150),
+    ("9N-AHB", "2024-01-01", 5000.0, 2000),
+])
+
+
+def test_counter_errors_flags_readings_out_of_order_with_the_history():
+    upload = _removals([
+        ("9N-AHA", "2024-02-01", 200.0, 100),   # between its neighbours
+        ("9N-AHA", "2024-02-01", 90.0, 100),    # FH below the January reading
+        ("9N-AHA", "2024-02-01", 200.0, 160),   # FC above the March reading
+        ("9N-AHB", "2024-02-01", 100.0, 10),    # other aircraft's history
+    ])
+
+    errors = counter_errors(upload, CounterIndex(HISTORY))
+
+    assert errors[FH_ORDER_RULE].tolist() == [False, True, False, True]
+    assert errors[FC_ORDER_RULE].tolist() == [False, False, True, True]
+
+
+def test_counter_errors_checks_rows_of_the_same_upload_against_each_other():
+    upload = _removals([
+        ("9N-AIC", "2024-01-10", 700.0, 300),
+        ("9N-AIC", "2024-01-05", 800.0, 200),
+        ("9N-AIC", "2024-01-10", 650.0, 290),  # same day: not compared
+    ])
+
+    errors = counter_errors(upload, CounterIndex())
+
+    assert errors[FH_ORDER_RULE].tolist() == [True, True, True]
+    assert errors[FC_ORDER_RULE].tolist() == [False, False, False]
+
+
+def test_counter_errors_skips_rows_without_a_date_or_fh():
+    upload = _removals([
+        ("9N-AHA", None, 10.0, 5),
+        ("9N-AHA", "2024-02-01", None, 5),
+    ])
+
+    errors = counter_errors(upload, CounterIndex(HISTORY))
+
+    assert not errors.to_numpy().any()
+    assert list(errors.index) == list(upload.index)
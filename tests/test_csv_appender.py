@@ -0,0 +1,51 @@
+import csv
+
+import pytest
+
+from utils.csv_appender import CsvAppender
+
+FIELDS = ["a", "b"]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "table.csv")
+
+
+def _prepare(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+    with open(path, "a+b") as f:
+        header = CsvAppender(path, FIELDS)._prepare(f)
+    with open(path, "rb") as f:
+        return header, f.read()
+
+
+@pytest.mark.parametrize("content", [b"", b"\n\n", b"  \r\n"])
+def test_prepare_empties_a_blank_file(path, content):
+    assert _prepare(path, content) == (None, b"")
+
+
+def test_prepare_returns_the_existing_header(path):
+    assert _prepare(path, b"\n\xef\xbb\xbfb,a\n1,2\n") == (["b", "a"], b"\n\xef\xbb\xbfb,a\n1,2\n")
+
+
+def test_prepare_terminates_an_unterminated_last_row(path):
+    assert _prepare(path, b"a,b\n1,2") == (["a", "b"], b"a,b\n1,2\n")
+
+
+def test_append_follows_the_existing_header_and_keeps_the_last_row(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("b,a\n1,2")
+
+    CsvAppender(path, FIELDS).append([{"a": 3, "b": 4, "extra": 5}])
+
+    with open(path, newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [["b", "a"], ["1", "2"], ["4", "3"]]
+
+
+def test_append_starts_a_missing_file_with_the_header(path):
+    CsvAppender(path, FIELDS).append([{"a": 1, "b": 2}])
+
+    with open(path, newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [["a", "b"], ["1", "2"]]
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from utils.mtbf_calculator import component_key, interval_deltas
+
+
+def _removals(rows):
+    return pd.DataFrame(rows, columns=[
+        "component_code", "serial_number", "aircraft_reg", "removal_date", "aircraft_fh", "aircraft_fc",
+    ])
+
+
+def test_interval_deltas_pairs_consecutive_removals_of_a_unit():
+    events = _removals([
+        ("C1", "S1", "9N-AHA", "2024-03-01", 300.0, 150),
+        ("C1", "S1", "9N-AHA", "2024-01-01", 100.0, 50),
+        ("C1", "S2", "9N-AHA", "2024-02-01", 200.0, 90),
+        ("C1", "S1", "9N-AHA", "2024-02-01", 180.0, 80),
+    ])
+
+    intervals = interval_deltas(events)
+
+    assert intervals["serial_number"].tolist() == ["S1", "S1"]
+    assert intervals["fh_delta"].tolist() == [80.0, 120.0]
+    assert intervals["fc_delta"].tolist() == [30.0, 70.0]
+    assert intervals["days_delta"].tolist() == [31.0, 29.0]
+    # Index labels point at the removal that closed each interval
+    assert intervals.index.tolist() == [3, 0]
+
+
+def test_interval_deltas_drops_non_positive_gaps_and_unparseable_rows():
+    events = _removals([
+        ("C1", "S1", "9N-AHA", "2024-01-01", 100.0, 50),
+        ("C1", "S1", "9N-AHA", "2024-01-02", 100.0, 50),
+        ("C1", "S1", "9N-AHA", "not a date", 500.0, 60),
+        ("C1", "S1", "9N-AHA", "2024-01-03", None, 70),
+        ("C1", "S1", "9N-AHA", "2024-01-04", 140.0, 75),
+    ])
+
+    intervals = interval_deltas(events)
+
+    assert intervals["fh_delta"].tolist() == [40.0]
+    assert intervals.index.tolist() == [4]
+
+
+def test_interval_deltas_keeps_units_on_different_aircraft_apart():
+    events = _removals([
+        ("C1", "S1", "9N-AHA", "2024-01-01", 100.0, np.nan),
+        ("C1", "S1", "9N-AHB", "2024-02-01", 900.0, np.nan),
+    ])
+
+    assert interval_deltas(events).empty
+    assert interval_deltas(events.iloc[0:0]).empty
+
+
+def test_component_key_falls_back_to_the_name_for_placeholder_codes():
+    frame = pd.DataFrame({
+        "component_code": [" C1 ", "N/A", "", None],
+        "component_name": ["Main Wheel", " Brake Unit ", "Starter", "Valve"],
+    })
+
+    assert component_key(frame).tolist() == ["C1", "Brake Unit", "Starter", "Valve"]
+
+
+def test_component_key_without_a_code_column_uses_the_name():
+    frame = pd.DataFrame({"component_name": ["Main Wheel "]})
+
+    assert component_key(frame).tolist() == ["Main Wheel"]
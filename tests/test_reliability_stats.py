@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from utils.reliability_stats import chi2_quantile, fit_weibull, mtbf_bounds
+
+
+@pytest.mark.parametrize("p, dof, expected", [
+    (0.95, 2, 5.991465),
+    (0.05, 10, 3.940299),
+    (0.975, 40, 59.341707),
+    (0.95, 400, 447.632549),  # above EXACT_CHI2_MAX_DOF: approximation only
+])
+def test_chi2_quantile_matches_tables(p, dof, expected):
+    assert chi2_quantile(p, np.array([dof]))[0] == pytest.approx(expected, rel=1e-3)
+
+
+def test_mtbf_bounds_bracket_the_point_estimate():
+    lower, upper = mtbf_bounds(np.array([1000.0, 1000.0]), np.array([0, 5]), confidence=0.90)
+
+    assert lower[0] == pytest.approx(2000.0 / 5.991465, rel=1e-4)
+    assert np.isinf(upper[0])
+    assert lower[1] < 1000.0 / 5 < upper[1]
+    assert upper[1] == pytest.approx(2000.0 / 3.940299, rel=1e-4)
+
+
+def test_fit_weibull_recovers_shape_and_scale_with_censoring():
+    rng = np.random.default_rng(7)
+    times = 1000.0 * rng.weibull(2.0, 4000)
+    observed = (times < 1500.0).astype(float)
+    times = np.minimum(times, 1500.0)
+
+    beta, eta = fit_weibull(np.zeros(len(times), dtype=int), times, observed, 1)
+
+    assert beta[0] == pytest.approx(2.0, rel=0.05)
+    assert eta[0] == pytest.approx(1000.0, rel=0.05)
+
+
+def test_fit_weibull_needs_two_failures_per_group():
+    codes = np.array([0, 0, 0, 1, 1])
+    times = np.array([100.0, 200.0, 300.0, 150.0, 400.0])
+    observed = np.array([1, 1, 0, 1, 0])
+
+    beta, eta = fit_weibull(codes, times, observed, 2)
+
+    assert np.isfinite(beta[0]) and np.isfinite(eta[0])
+    assert np.isnan(beta[1]) and np.isnan(eta[1])
@@ -0,0 +1,102 @@
+# /utils/anomaly_engine.py
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset_version import cached_for_version, dataset_version
+from utils.mtbf_calculator import component_key, failure_intervals
+
+# Premature-failure scoring on per-serial failure intervals: each interval's
+# FH (time the unit flew since its previous unscheduled removal) is compared
+# with the component's fleet-wide median using the modified z-score
+#     z = 0.6745 * (x - median) / MAD
+# which, unlike mean/std, isn't dragged around by the outliers it is
+# looking for. Scores cover the whole history and are cached per dataset
+# version; page filters only slice them.
+
+# Iglewicz & Hoaglin's cut-off for the modified z-score
+ANOMALY_THRESHOLD = -3.5
+
+# Fewer intervals than this per component give no meaningful median/MAD
+ANOMALY_MIN_SAMPLES = 3
+
+_MAD_SCALE = 0.6745
+# When more than half the intervals are identical MAD is 0; the mean
+# absolute deviation (scaled to match a normal std) is used instead
+_MEANAD_SCALE = 1.253314
+
+SCORE_COLUMNS = ["median_fh", "mad_fh", "samples", "robust_z", "deficit_fh"]
+
+
+def robust_z(value: float, sample) -> tuple:
+    """
+    (median, MAD, modified z-score) of one interval within its component's
+    intervals `sample` (itself included), computed as build_anomaly_scores
+    does for the whole table. z is NaN when the intervals don't vary.
+    """
+    sample = np.asarray(sample, dtype="float64")
+    median = float(np.median(sample))
+    deviation = np.abs(sample - median)
+    mad = float(np.median(deviation))
+    if mad > 0:
+        z = _MAD_SCALE * (value - median) / mad
+    else:
+        mean_ad = float(deviation.mean())
+        z = (value - median) / (_MEANAD_SCALE * mean_ad) if mean_ad > 0 else np.nan
+    return median, mad, float(z)
+
+
+def build_anomaly_scores(df: pd.DataFrame, version: str = None) -> pd.DataFrame:
+    """
+    The failure-interval table with robust per-component statistics and a
+    modified z-score for every interval. Components with fewer than
+    ANOMALY_MIN_SAMPLES intervals get NaN scores.
+    """
+    intervals = failure_intervals(df, version)
+    if intervals.empty:
+        return pd.DataFrame()
+
+    scores = intervals.copy()
+    # Compared within component (name where the code is a placeholder), as
+    # the MTBF rollups pool them
+    key = component_key(scores)
+    groups = scores["fh_delta"].groupby(key, observed=True)
+
+    median = groups.transform("median")
+    deviation = (scores["fh_delta"] - median).abs()
+    by_component = deviation.groupby(key, observed=True)
+    mad = by_component.transform("median")
+    mean_ad = by_component.transform("mean")
+    samples = groups.transform("count")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(
+            mad > 0,
+            _MAD_SCALE * (scores["fh_delta"] - median) / mad,
+            (scores["fh_delta"] - median) / (_MEANAD_SCALE * mean_ad),
+        )
+    z = pd.Series(z, index=scores.index).replace([np.inf, -np.inf], np.nan)
+
+    scores["median_fh"] = median.round(1)
+    scores["mad_fh"] = mad.round(1)
+    scores["samples"] = samples
+    scores["robust_z"] = z.where(samples >= ANOMALY_MIN_SAMPLES).round(2)
+    scores["deficit_fh"] = (scores["fh_delta"] - median).round(1)
+    return scores
+
+
+def anomaly_scores(df: pd.DataFrame, version: str = None) -> pd.DataFrame:
+    """
+    Cached build_anomaly_scores, built once per dataset version.
+    """
+    version = version or dataset_version(df)
+    return cached_for_version("anomaly_scores", version, lambda: build_anomaly_scores(df, version))
+
+
+def premature_failures(scores: pd.DataFrame, threshold: float = ANOMALY_THRESHOLD) -> pd.DataFrame:
+    """
+    Intervals scoring below `threshold`, most severe first.
+    """
+    if scores.empty:
+        return scores
+    return scores[scores["robust_z"] < threshold].sort_values("robust_z")
@@ -1,10 +1,88 @@
 # /utils/component_master_loader.py
 
+import hashlib
+import os
+import threading
+import time
+from io import BytesIO
+
 import pandas as pd
 
 COMPONENTS_PATH = "data/components.csv"
 
+# The file is stat'ed at most this often; between checks every caller gets
+# the cached master without touching the disk
+CHECK_INTERVAL = 2.0
+
+_LOCK = threading.Lock()
+_STATE = {"master": None, "stamp": None, "digest": None, "checked_at": 0.0}
+
+
+class ComponentMaster:
+    """
+    The component catalogue with its lookups built once per file version:
+    `by_code` and `by_label` map to row dicts, `by_ata` maps an ATA chapter
+    to its sorted labels and `labels` is the sorted "CODE | Name" list the
+    entry form offers.
+    """
+
+    def __init__(self, df):
+        self.frame = df
+        if df.empty or not {"component_code", "component_name"} <= set(df.columns):
+            self.labels, self.by_code, self.by_label, self.by_ata = [], {}, {}, {}
+            return
+
+        labels = df["component_code"].astype(str) + " | " + df["component_name"].astype(str)
+        records = df.to_dict("records")
+        self.by_code = dict(zip(df["component_code"].astype(str), records))
+        self.by_label = dict(zip(labels, records))
+        self.labels = sorted(self.by_label)
+
+        self.by_ata = {}
+        if "ata_chapter" in df.columns:
+            ordered = labels.sort_values(kind="stable")
+            for ata, group in ordered.groupby(df["ata_chapter"].astype(str).reindex(ordered.index), sort=True):
+                self.by_ata[ata] = group.tolist()
+
+
+def _file_stamp(path):
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+
+def component_master() -> ComponentMaster:
+    """
+    The cached ComponentMaster. The file is re-read only when its mtime or
+    size changed, and the lookups are rebuilt only when its content hash did.
+    """
+    with _LOCK:
+        now = time.monotonic()
+        state = _STATE
+        if state["master"] is not None and now - state["checked_at"] < CHECK_INTERVAL:
+            return state["master"]
+        state["checked_at"] = now
+
+        stamp = _file_stamp(COMPONENTS_PATH)
+        if state["master"] is not None and stamp == state["stamp"]:
+            return state["master"]
+
+        if stamp is None:
+            state.update(master=ComponentMaster(pd.DataFrame()), stamp=None, digest=None)
+            return state["master"]
+
+        with open(COMPONENTS_PATH, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        if state["master"] is None or digest != state["digest"]:
+            # Parse the bytes already read so the hash and content agree
+            state["master"] = ComponentMaster(pd.read_csv(BytesIO(raw)))
+            state["digest"] = digest
+        state["stamp"] = stamp
+        return state["master"]
+
 
 def load_component_master():
-    df = pd.read_csv(COMPONENTS_PATH)
-    return df
+    return component_master().frame
@@ -0,0 +1,220 @@
+# /utils/counter_index.py
+
+import threading
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+# Per-aircraft (date, FH, FC) history kept sorted by date, for catching
+# counters that go backwards before they are saved: a removal's FH/FC must
+# not be below the aircraft's last reading on an earlier day, nor above its
+# first reading on a later day. Same-day readings aren't compared (their
+# order within the day is unknown). Single entries are checked with a
+# binary search; uploads with merge_asof over the whole frame.
+FH_ORDER_RULE = "Aircraft FH is out of order with the aircraft's other removals"
+FC_ORDER_RULE = "Aircraft FC is out of order with the aircraft's other removals"
+
+_LOCK = threading.Lock()
+_STATE = {"index": None}
+
+
+def _day(value):
+    """
+    Date as an integer day number (NaT/unparseable -> None).
+    """
+    ts = pd.to_datetime(value, errors="coerce")
+    if pd.isna(ts):
+        return None
+    return int(ts.value // 86_400_000_000_000)
+
+
+def _readings(df):
+    """
+    Valid (aircraft_reg, day, fh, fc) rows of a removal frame.
+    """
+    if df.empty or not {"aircraft_reg", "removal_date", "aircraft_fh"} <= set(df.columns):
+        return pd.DataFrame({"aircraft_reg": pd.Series(dtype="string"), "day": pd.Series(dtype="int64"),
+                             "fh": pd.Series(dtype="float64"), "fc": pd.Series(dtype="float64")})
+    dates = pd.to_datetime(df["removal_date"], errors="coerce")
+    readings = pd.DataFrame({
+        "aircraft_reg": df["aircraft_reg"].astype("string").str.strip(),
+        "day": dates.to_numpy(dtype="datetime64[D]").astype("int64"),
+        "fh": pd.to_numeric(df["aircraft_fh"], errors="coerce").astype("float64"),
+        "fc": (pd.to_numeric(df["aircraft_fc"], errors="coerce").astype("float64")
+               if "aircraft_fc" in df.columns else np.nan),
+    }, index=df.index)
+    return readings[dates.notna().to_numpy() & readings["fh"].notna().to_numpy() & readings["aircraft_reg"].notna().to_numpy()]
+
+
+class CounterIndex:
+    """
+    aircraft_reg -> parallel lists (days, fh, fc) sorted by (day, fh).
+    """
+
+    def __init__(self, df=None):
+        self.aircraft = {}
+        readings = _readings(df if df is not None else pd.DataFrame())
+        readings = readings.sort_values(["aircraft_reg", "day", "fh"], kind="stable")
+        for reg, group in readings.groupby("aircraft_reg", sort=False, observed=True):
+            self.aircraft[reg] = (group["day"].tolist(), group["fh"].tolist(), group["fc"].tolist())
+
+    def add(self, record):
+        """
+        Inserts one saved removal, keeping the aircraft's lists sorted.
+        """
+        reg = str(record.get("aircraft_reg", "")).strip()
+        day = _day(record.get("removal_date"))
+        fh = pd.to_numeric(record.get("aircraft_fh"), errors="coerce")
+        if not reg or day is None or pd.isna(fh):
+            return
+        fc = pd.to_numeric(record.get("aircraft_fc"), errors="coerce")
+        days, fhs, fcs = self.aircraft.setdefault(reg, ([], [], []))
+        pos = bisect_right(days, day)
+        days.insert(pos, day)
+        fhs.insert(pos, float(fh))
+        fcs.insert(pos, float(fc) if pd.notna(fc) else np.nan)
+
+    def extend(self, df):
+        """
+        Merges a frame of saved removals into the index (bulk uploads).
+        """
+        readings = _readings(df)
+        for reg, group in readings.groupby("aircraft_reg", sort=False, observed=True):
+            days, fhs, fcs = self.aircraft.get(reg, ([], [], []))
+            rows = sorted(
+                zip(days + group["day"].tolist(), fhs + group["fh"].tolist(), fcs + group["fc"].tolist()),
+                key=lambda row: (row[0], row[1])
+            )
+            self.aircraft[reg] = tuple(list(values) for values in zip(*rows))
+
+    def check(self, record):
+        """
+        Error messages for one entry against its neighbours (empty if fine).
+        """
+        reg = str(record.get("aircraft_reg", "")).strip()
+        day = _day(record.get("removal_date"))
+        fh = pd.to_numeric(record.get("aircraft_fh"), errors="coerce")
+        fc = pd.to_numeric(record.get("aircraft_fc"), errors="coerce")
+        if reg not in self.aircraft or day is None or pd.isna(fh):
+            return []
+
+        days, fhs, fcs = self.aircraft[reg]
+        before = bisect_left(days, day) - 1   # last reading on an earlier day
+        after = bisect_right(days, day)       # first reading on a later day
+        errors = []
+        for value, values, rule in [(fh, fhs, FH_ORDER_RULE), (fc, fcs, FC_ORDER_RULE)]:
+            if pd.isna(value):
+                continue
+            if before >= 0 and values[before] > value:
+                errors.append(f"{rule}: {value:g} is below {values[before]:g} recorded on {_date(days[before])}")
+            elif after < len(days) and values[after] < value:
+                errors.append(f"{rule}: {value:g} is above {values[after]:g} recorded on {_date(days[after])}")
+        return errors
+
+    def latest(self, reg):
+        """
+        (last date, highest FH, highest FC) recorded for an aircraft, or None.
+        """
+        if not self.aircraft.get(reg, ([],))[0]:
+            return None
+        days, fhs, fcs = self.aircraft[reg]
+        return pd.Timestamp(_date(days[-1])), max(fhs), float(np.nanmax(fcs)) if pd.notna(fcs).any() else np.nan
+
+    def frame(self):
+        """
+        All indexed readings as one frame.
+        """
+        parts = [
+            pd.DataFrame({"aircraft_reg": reg, "day": days, "fh": fhs, "fc": fcs})
+            for reg, (days, fhs, fcs) in self.aircraft.items()
+        ]
+        return pd.concat(parts, ignore_index=True) if parts else _readings(pd.DataFrame())
+
+
+def _date(day):
+    return str(np.datetime64(day, "D"))
+
+
+def counter_errors(df, index=None):
+    """
+    Boolean error matrix (columns FH_ORDER_RULE, FC_ORDER_RULE) for a whole
+    frame, checked against the index and the frame's own rows together.
+    Joins the validate_removal_events matrix with pd.concat(axis=1).
+    """
+    if index is None:
+        index = counter_index()
+    errors = pd.DataFrame(False, index=df.index, columns=[FH_ORDER_RULE, FC_ORDER_RULE])
+    incoming = _readings(df)
+    if incoming.empty:
+        return errors
+
+    reference = pd.concat([index.frame(), incoming], ignore_index=True)
+    reference["aircraft_reg"] = reference["aircraft_reg"].astype("string")
+    incoming = incoming.assign(row=np.arange(len(incoming)), aircraft_reg=incoming["aircraft_reg"].astype("string"))
+
+    # Last reading on an earlier day (highest FH/FC that day) and first on a later day
+    per_day = reference.groupby(["aircraft_reg", "day"], as_index=False).agg(
+        prev_fh=("fh", "max"), prev_fc=("fc", "max"), next_fh=("fh", "min"), next_fc=("fc", "min")
+    ).sort_values("day", kind="stable")
+    probe = incoming.sort_values("day", kind="stable")
+    probe = pd.merge_asof(probe, per_day[["aircraft_reg", "day", "prev_fh", "prev_fc"]], on="day",
+                          by="aircraft_reg", direction="backward", allow_exact_matches=False)
+    probe = pd.merge_asof(probe, per_day[["aircraft_reg", "day", "next_fh", "next_fc"]], on="day",
+                          by="aircraft_reg", direction="forward", allow_exact_matches=False)
+    probe = probe.sort_values("row")
+
+    fh_bad = (probe["prev_fh"] > probe["fh"]) | (probe["next_fh"] < probe["fh"])
+    fc_bad = (probe["prev_fc"] > probe["fc"]) | (probe["next_fc"] < probe["fc"])
+    errors.loc[incoming.index, FH_ORDER_RULE] = fh_bad.fillna(False).to_numpy(dtype=bool)
+    errors.loc[incoming.index, FC_ORDER_RULE] = fc_bad.fillna(False).to_numpy(dtype=bool)
+    return errors
+
+
+def counter_index():
+    """
+    The process-wide CounterIndex, built from the local removal mirror on
+    first use (no Google Sheets call).
+    """
+    with _LOCK:
+        if _STATE["index"] is None:
+            # Imported here: removal_sync depends on gsheet_loader, which uses this module
+            from utils.removal_sync import load_mirror
+            _STATE["index"] = CounterIndex(load_mirror())
+        return _STATE["index"]
+
+
+def refresh_counter_index(df):
+    """
+    Replaces the index with one built from `df` (after a sync).
+    """
+    index = CounterIndex(df)
+    with _LOCK:
+        _STATE["index"] = index
+
+
+def record_counters(record):
+    """
+    Adds a saved removal to the index.
+    """
+    index = counter_index()
+    with _LOCK:
+        index.add(record)
+
+
+def record_counter_rows(df):
+    """
+    Adds a frame of saved removals to the index.
+    """
+    index = counter_index()
+    with _LOCK:
+        index.extend(df)
+
+
+def check_counters(record):
+    """
+    Error messages for one entry (binary search on its aircraft's readings).
+    """
+    index = counter_index()
+    with _LOCK:
+        return index.check(record)
@@ -0,0 +1,131 @@
+# /utils/csv_appender.py
+
+import csv
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl  # POSIX; without it only threads of this process are serialised
+except ImportError:
+    fcntl = None
+
+# Group-commit appends to a CSV file. Rows that arrive while a write is in
+# progress are queued and written together by the next write: one write()
+# and one fsync() per group, under an exclusive lock on "<file>.lock" so
+# several app processes can append to the same file. A lone writer doesn't
+# wait for company. The header check runs under that lock too: an empty (or
+# blank) file gets the header, and a last row without a line break is
+# terminated before new rows are added, so appended rows never join it.
+
+
+class _Batch:
+    def __init__(self):
+        self.records = []
+        self.done = threading.Event()
+        self.error = None
+
+
+class CsvAppender:
+    """
+    Appender for one CSV file. `fieldnames` is used when the file has no
+    header yet; an existing header decides the column order otherwise.
+    """
+
+    def __init__(self, path, fieldnames):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self._batch = None
+        self._batch_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive access to the file across threads and processes (for
+        rewrites such as updates or clearing the table).
+        """
+        with self._write_lock:
+            with open(self.path + ".lock", "a") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def append(self, records):
+        """
+        Appends dict rows (extra keys are ignored). Returns once they are on
+        disk; raises if the write failed.
+        """
+        if not records:
+            return True
+
+        with self._batch_lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            batch.records.extend(records)
+
+        if not leader:
+            batch.done.wait()
+        else:
+            try:
+                # Waiting here for the previous group's write is what lets
+                # this group fill up
+                with self.locked():
+                    with self._batch_lock:
+                        self._batch = None  # later rows start the next group
+                    self._write(batch.records)
+            except Exception as e:
+                with self._batch_lock:
+                    if self._batch is batch:
+                        self._batch = None
+                batch.error = e
+            finally:
+                batch.done.set()
+
+        if batch.error is not None:
+            raise batch.error
+        return True
+
+    def _write(self, records):
+        with open(self.path, "a+b") as f:
+            header = self._prepare(f)
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=header or self.fieldnames, extrasaction="ignore")
+            if not header:
+                writer.writeheader()
+            writer.writerows(records)
+            f.write(buffer.getvalue().encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _prepare(self, f):
+        """
+        Returns the file's header (None if it needs one, after truncating a
+        blank file) and terminates an unterminated last line.
+        """
+        f.seek(0)
+        first = b""
+        for line in f:
+            if line.strip():
+                first = line
+                break
+        if not first:
+            f.truncate(0)
+            return None
+
+        size = f.seek(0, os.SEEK_END)
+        f.seek(size - 1)
+        if f.read(1) != b"\n":
+            # Last row saved without a line break (e.g. by a spreadsheet
+            # editor): end it so appended rows start on a line of their own
+            f.seek(size)
+            f.write(b"\n")
+
+        return next(csv.reader([first.decode("utf-8-sig")]))
@@ -1,36 +1,44 @@
 # /utils/csv_writer.py
 
-import csv
-import os
+import logging
+
+from utils.dedupe_index import claim_event, release_events
+from utils.online_anomaly import alert_message
+from utils.removal_hooks import after_removal_saved
+from utils.storage import TABLE_SCHEMAS, get_storage_backend
 
 CSV_PATH = "data/removal_events.csv"
 
-# Updated to include 'removal_type'
-FIELDNAMES = [
-    "aircraft_reg",
-    "component_code",
-    "component_name",
-    "part_number",
-    "serial_number",
-    "ata_chapter",
-    "category",
-    "criticality",
-    "removal_date",
-    "aircraft_fh",
-    "aircraft_fc",
-    "removal_type",   # <--- ADDED THIS (matches the form)
-    "removal_reason",
-    "station",
-    "remarks"
-]
+# Column order of removal_events.csv (includes 'removal_type', matching the form).
+# Defined with the other table schemas in utils/storage.
+FIELDNAMES = list(TABLE_SCHEMAS["removal_events"])
+
+logger = logging.getLogger(__name__)
 
 def append_removal_event(record):
-    file_exists = os.path.isfile(CSV_PATH)
-
-    # extrasaction='ignore' is a safety net: if the form sends extra data 
-    # that isn't in FIELDNAMES, it won't crash the app.
-    with open(CSV_PATH, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction='ignore')
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(record)
+    # Routed through the configured storage backend (CSV by default, where
+    # concurrent sessions' rows share one locked, fsynced group write).
+    # Extra keys that aren't in FIELDNAMES are ignored, so the form can
+    # send additional data without crashing the app.
+    backend = get_storage_backend()
+    if backend.name == "sheets":
+        # append_removal_event_gsheet runs the dedupe, MTBF and anomaly hooks itself
+        return backend.append_rows("removal_events", [record])
+
+    # Same aircraft, serial, date and FH as a saved removal: don't save twice
+    is_new, key = claim_event(record)
+    if not is_new:
+        logger.info("Duplicate removal not saved (%s S/N %s)", record.get("aircraft_reg"), record.get("serial_number"))
+        return False
+
+    saved = backend.append_rows("removal_events", [record])
+
+    if not saved:
+        release_events([key])
+    else:
+        # Running MTBF totals, anomaly statistics and counter index
+        alert = after_removal_saved(record)
+        if alert:
+            logger.warning(alert_message(alert))
+
+    return saved
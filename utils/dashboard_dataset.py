@@ -0,0 +1,140 @@
+# /utils/dashboard_dataset.py
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset_version import cached_for_version, dataset_version
+from utils.schema import apply_schema
+
+# Display names used by the dashboard
+DISPLAY_COLUMNS = {
+    "removal_date": "Date",
+    "aircraft_reg": "Aircraft",
+    "ata_chapter": "ATA",
+    "component_name": "Component",
+    "part_number": "Part Number",
+    "aircraft_fh": "FH",
+    "removal_reason": "Reason",
+    "component_type": "Type",
+}
+
+# Dimensions with an inverted index (value -> sorted row positions)
+INDEXED_DIMENSIONS = ["Aircraft", "ATA", "Component"]
+
+
+def date_bounds(start, end):
+    """
+    [start, end + 1 day) as Timestamps, for comparing datetime columns
+    against a pair of dates without converting every row to .dt.date.
+    """
+    return pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)
+
+
+class DashboardDataset:
+    """
+    Removal events prepared once per dataset version: typed (`typed`, with
+    the original column names, for derived tables) and renamed and sorted by
+    date (`frame`, for display). Filters resolve to row positions: a binary
+    search on the sorted dates, then the posting lists of the most selective
+    dimension, checked against code lookups for the others.
+    """
+
+    def __init__(self, df):
+        self.typed = apply_schema(df, "removal_events")
+
+        frame = self.typed.rename(columns=DISPLAY_COLUMNS)
+        if "FH" in frame.columns:
+            frame["FH"] = frame["FH"].fillna(0)
+        if "Date" in frame.columns:
+            frame = frame.sort_values("Date", kind="stable", na_position="last")
+        self.frame = frame.reset_index(drop=True)
+
+        # Sorted dates of the dated rows (undated rows sit at the end)
+        if "Date" in self.frame.columns:
+            dates = self.frame["Date"]
+            self.dates = dates[dates.notna()].to_numpy(dtype="datetime64[ns]")
+        else:
+            self.dates = np.array([], dtype="datetime64[ns]")
+
+        self.postings = {}
+        self.codes = {}
+        self.complete = {}
+        for dim in INDEXED_DIMENSIONS:
+            if dim not in self.frame.columns:
+                continue
+            values = self.frame[dim].astype("string")
+            codes, uniques = pd.factorize(values, sort=True)
+            self.codes[dim] = (pd.Index(uniques), codes)
+            self.postings[dim] = {
+                uniques[code]: positions
+                for code, positions in pd.Series(np.arange(len(codes))).groupby(codes).indices.items()
+                if code >= 0
+            }
+            self.complete[dim] = bool((codes >= 0).all())
+
+    def options(self, dim):
+        return list(self.codes[dim][0]) if dim in self.codes else []
+
+    def date_range(self):
+        if not len(self.dates):
+            return None, None
+        return pd.Timestamp(self.dates[0]).date(), pd.Timestamp(self.dates[-1]).date()
+
+    def select(self, start=None, end=None, **selections) -> np.ndarray:
+        """
+        Row positions (into `frame`) matching every given filter. Keyword
+        filters are dimension names (Aircraft=[...], ATA=[...], Component=[...]);
+        None means "no filter". Dates are inclusive; undated rows only match
+        when no date filter is given.
+        """
+        if start is not None and end is not None:
+            lower, upper = date_bounds(start, end)
+            lo = int(np.searchsorted(self.dates, lower.to_datetime64(), side="left"))
+            hi = int(np.searchsorted(self.dates, upper.to_datetime64(), side="left"))
+        else:
+            lo, hi = 0, len(self.frame)
+
+        constrained = []
+        for dim, selected in selections.items():
+            if selected is None or dim not in self.codes:
+                continue
+            uniques, _ = self.codes[dim]
+            wanted = uniques.get_indexer(pd.Index([str(v) for v in selected]).unique())
+            wanted = wanted[wanted >= 0]
+            if len(wanted) == len(uniques) and self.complete[dim]:
+                continue  # every value selected: no constraint
+            postings = self.postings[dim]
+            size = sum(len(postings[uniques[c]]) for c in wanted)
+            constrained.append((size, dim, wanted))
+
+        if not constrained:
+            return np.arange(lo, hi)
+
+        # Drive from the smallest posting set, restricted to the date range
+        constrained.sort(key=lambda item: item[0])
+        _, dim, wanted = constrained[0]
+        uniques, _ = self.codes[dim]
+        parts = []
+        for c in wanted:
+            posting = self.postings[dim][uniques[c]]
+            parts.append(posting[np.searchsorted(posting, lo):np.searchsorted(posting, hi)])
+        positions = np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.int64)
+
+        for _, dim, wanted in constrained[1:]:
+            uniques, codes = self.codes[dim]
+            allowed = np.zeros(len(uniques) + 1, dtype=bool)
+            allowed[wanted] = True
+            positions = positions[allowed[codes[positions]]]  # code -1 hits the False sentinel
+
+        return positions
+
+    def filter(self, start=None, end=None, **selections) -> pd.DataFrame:
+        return self.frame.take(self.select(start, end, **selections))
+
+
+def dashboard_dataset(df, version: str = None) -> DashboardDataset:
+    """
+    DashboardDataset for `df`, built once per dataset version.
+    """
+    version = version or dataset_version(df)
+    return cached_for_version("dashboard_dataset", version, lambda: DashboardDataset(df))
@@ -1,23 +1,167 @@
+import os
+
+import numpy as np
 import pandas as pd
 
+from utils.dataset_version import cached_for_version, dataset_version
+
+REFERENCE_FILES = {
+    "components": "data/components.csv",
+    "technicians": "data/ames.csv",  # Updated filename
+    "pilots": "data/pilots.csv",
+}
+
+# Dimension joins of the maintenance log: (log column, reference table,
+# key column in the table, suffix for table columns the log already has)
+DIMENSIONS = [
+    ("component", "components", "component_name", "component"),
+    ("technician", "technicians", "technician_name", "technician"),
+    ("pilot_name", "pilots", "pilot_name", "pilot"),
+]
+
+# |z| above this (within the same component) flags an anomaly
+ANOMALY_Z = 2
+
 def load_data():
-    components = pd.read_csv("data/components.csv")
-    technicians = pd.read_csv("data/ames.csv")  # Updated filename
-    pilots = pd.read_csv("data/pilots.csv")
+    components = pd.read_csv(REFERENCE_FILES["components"])
+    technicians = pd.read_csv(REFERENCE_FILES["technicians"])
+    pilots = pd.read_csv(REFERENCE_FILES["pilots"])
     return components, technicians, pilots
 
+def reference_version():
+    """
+    Changes whenever one of the reference CSVs is edited.
+    """
+    stamps = [str(os.stat(p).st_mtime_ns) if os.path.exists(p) else "-" for p in REFERENCE_FILES.values()]
+    return "ref-" + "-".join(stamps)
+
+def load_reference_tables():
+    """
+    load_data(), read again only when a reference file changes.
+    """
+    return cached_for_version("reference_tables", reference_version(), load_data)
+
 def load_maintenance(uploaded_file=None):
     if uploaded_file:
         return pd.read_csv(uploaded_file)
     return pd.read_csv("data/sample_maintenance.csv")
 
-def merge_data(df, components, technicians, pilots):
-    df = df.merge(components, left_on="component", right_on="component_name", how="left")
-    df = df.merge(technicians, left_on="technician", right_on="technician_name", how="left")
-    df = df.merge(pilots, left_on="pilot_name", right_on="pilot_name", how="left")
-    return df
+def encode_dimensions(df, components, technicians, pilots):
+    """
+    Dictionary-encodes the log's dimension columns against the reference
+    tables: {log column: (deduplicated table, int codes into it, -1 = no match)}.
+    """
+    tables = {"components": components, "technicians": technicians, "pilots": pilots}
+    encoded = {}
+    for log_col, table_name, key, _ in DIMENSIONS:
+        table = tables[table_name]
+        if log_col not in df.columns or key not in table.columns:
+            continue
+        table = table.drop_duplicates(key).reset_index(drop=True)
+        # Match each distinct value once, then broadcast through the log's own codes
+        log_codes, uniques = pd.factorize(df[log_col])
+        table_codes = pd.Index(table[key].astype(str)).get_indexer(pd.Index(uniques).astype(str))
+        codes = np.append(table_codes, -1)[log_codes]  # log code -1 (NaN) picks the trailing -1
+        encoded[log_col] = (table, codes)
+    return encoded
+
+def merge_data(df, components, technicians, pilots, encoded=None):
+    """
+    The log with every dimension's attributes attached, in one pass: each
+    table is gathered by integer code and the pieces are concatenated once.
+    Attribute names the frame already has get the dimension as a suffix
+    (e.g. the pilot's experience_years becomes experience_years_pilot).
+    """
+    encoded = encoded or encode_dimensions(df, components, technicians, pilots)
+    pieces = [df]
+    taken = set(df.columns)
+    for log_col, _, key, suffix in DIMENSIONS:
+        if log_col not in encoded:
+            continue
+        table, codes = encoded[log_col]
+        # Code -1 isn't in the RangeIndex, so unmatched rows come back as NaN
+        attrs = table.reindex(codes)
+        attrs.index = df.index
+        if key == log_col:
+            attrs = attrs.drop(columns=[key])
+        attrs = attrs.rename(columns={c: f"{c}_{suffix}" for c in attrs.columns if c in taken})
+        attrs[f"{suffix}_id"] = codes
+        taken.update(attrs.columns)
+        pieces.append(attrs)
+    return pd.concat(pieces, axis=1)
+
+def detect_anomalies(df, by="component"):
+    """
+    Flags hours_since_last values more than ANOMALY_Z standard deviations
+    from the mean of the same component (`by`); a single fleet-wide mean
+    would flag whole component types instead of unusual removals.
+    """
+    hours = pd.to_numeric(df["hours_since_last"], errors="coerce")
+    if by in df.columns:
+        codes, _ = pd.factorize(df[by])
+        groups = hours.where(codes >= 0).groupby(codes)
+        mean, std = groups.transform("mean"), groups.transform("std")
+    else:
+        mean, std = hours.mean(), hours.std()
+    z_score = (hours - mean) / std
+    return df.assign(z_score=z_score, anomaly=z_score.abs() > ANOMALY_Z)
+
+def _summary(table, codes, anomaly, columns, count_name):
+    """
+    Per-row-of-`table` event and anomaly counts from integer codes.
+    """
+    valid = codes >= 0
+    total = np.bincount(codes[valid], minlength=len(table))
+    flagged = np.bincount(codes[valid], weights=anomaly[valid], minlength=len(table))
+    summary = table[columns].assign(**{count_name: total, "anomalies": flagged.astype(int)})
+    summary = summary[summary[count_name] > 0]
+    summary["anomaly_rate (%)"] = (summary["anomalies"] / summary[count_name] * 100).round(1)
+    return summary.sort_values("anomaly_rate (%)", ascending=False, kind="stable").reset_index(drop=True)
+
+def build_summaries(df, components, technicians, pilots):
+    """
+    Pilot, technician and ATA chapter anomaly summaries of a maintenance log,
+    aggregated on the dimension codes. Keys: "pilots", "technicians", "ata"
+    (a summary is missing when the log lacks its column).
+    """
+    if "anomaly" not in df.columns and "hours_since_last" not in df.columns:
+        return {}
+    encoded = encode_dimensions(df, components, technicians, pilots)
+    if "anomaly" not in df.columns:
+        df = detect_anomalies(df)
+    anomaly = df["anomaly"].fillna(False).astype(float).to_numpy()
+
+    summaries = {}
+    if "pilot_name" in encoded:
+        table, codes = encoded["pilot_name"]
+        summaries["pilots"] = _summary(
+            table.rename(columns={"experience_years": "avg_experience"}), codes, anomaly,
+            ["pilot_name", "rank", "avg_experience"], "total_flights"
+        )[["pilot_name", "rank", "total_flights", "anomalies", "avg_experience", "anomaly_rate (%)"]]
+    if "technician" in encoded:
+        table, codes = encoded["technician"]
+        summaries["technicians"] = _summary(
+            table.rename(columns={"technician_name": "technician", "experience_years": "avg_experience"}),
+            codes, anomaly, ["technician", "certification", "avg_experience"], "total_tasks"
+        )[["technician", "certification", "total_tasks", "anomalies", "avg_experience", "anomaly_rate (%)"]]
+    if "component" in encoded:
+        # ATA chapter of each component, then one more level of codes
+        table, codes = encoded["component"]
+        ata_codes, chapters = pd.factorize(table["ata_chapter"].astype("string"), sort=True)
+        row_ata = np.where(codes >= 0, ata_codes[np.maximum(codes, 0)], -1)
+        summaries["ata"] = _summary(
+            pd.DataFrame({"ata_chapter": chapters}), row_ata, anomaly, ["ata_chapter"], "total_events"
+        )
+    return summaries
 
-def detect_anomalies(df):
-    df["z_score"] = (df["hours_since_last"] - df["hours_since_last"].mean()) / df["hours_since_last"].std()
-    df["anomaly"] = df["z_score"].abs() > 2
-    return df
+def maintenance_summaries(df, version=None):
+    """
+    Cached build_summaries against the reference tables, rebuilt only when
+    the log (its dataset version) or a reference file changes.
+    """
+    version = version or dataset_version(df)
+    components, technicians, pilots = load_reference_tables()
+    return cached_for_version(
+        "maintenance_summaries", f"{version}:{reference_version()}",
+        lambda: build_summaries(df, components, technicians, pilots)
+    )
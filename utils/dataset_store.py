@@ -0,0 +1,144 @@
+# /utils/dataset_store.py
+
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+from utils.dataset_version import dataset_version
+
+# Process-wide store of loaded datasets. Each distinct dataset is held once,
+# keyed by its content version, and shared read-only by every session; a
+# session only keeps the version string in st.session_state. Loads with the
+# same key are coalesced (single-flight): while one fetch runs, every other
+# caller waits for it and gets the same version.
+SESSION_KEY = "dataset_version"
+
+# Versions kept in memory; the most recent version of each dataset name is
+# always kept. A session whose version was evicted is asked to reload.
+MAX_VERSIONS = 4
+
+_LOCK = threading.Lock()
+_FRAMES = OrderedDict()   # version -> DataFrame
+_LATEST = {}              # name -> (version, published_at)
+_INFLIGHT = {}            # load key -> _Flight
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.version = None
+        self.error = None
+
+
+def publish(df, name="removal_events"):
+    """
+    Stores `df` as the latest version of dataset `name` and returns its
+    version. Publishing identical data again reuses the stored frame.
+    The frame must not be modified afterwards.
+    """
+    version = dataset_version(df)
+    with _LOCK:
+        if version not in _FRAMES:
+            _FRAMES[version] = df
+        _FRAMES.move_to_end(version)
+        _LATEST[name] = (version, time.monotonic())
+
+        keep = {v for v, _ in _LATEST.values()}
+        for old in list(_FRAMES):
+            if len(_FRAMES) <= MAX_VERSIONS:
+                break
+            if old not in keep:
+                del _FRAMES[old]
+    return version
+
+
+def clear_datasets():
+    """
+    Drops every stored dataset (after the underlying data was wiped).
+    Sessions still pointing at one are asked to reload.
+    """
+    with _LOCK:
+        _FRAMES.clear()
+        _LATEST.clear()
+
+
+def get_dataset(version):
+    """
+    The shared frame for `version`, or None if it is unknown or evicted.
+    """
+    with _LOCK:
+        return _FRAMES.get(version)
+
+
+def load_dataset(name, loader, max_age=0, key=None):
+    """
+    Loads dataset `name` with `loader()` and publishes it. Concurrent calls
+    with the same `key` (default: the name) share a single loader run. With
+    `max_age` (seconds), a version published that recently is returned
+    without loading at all.
+    """
+    key = key or name
+    with _LOCK:
+        entry = _LATEST.get(name)
+        if max_age and entry and time.monotonic() - entry[1] <= max_age and entry[0] in _FRAMES:
+            return entry[0]
+
+        flight = _INFLIGHT.get(key)
+        leader = flight is None
+        if leader:
+            flight = _INFLIGHT[key] = _Flight()
+
+    if leader:
+        try:
+            flight.version = publish(loader(), name)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with _LOCK:
+                _INFLIGHT.pop(key, None)
+            flight.done.set()
+    else:
+        flight.done.wait()
+
+    if flight.error is not None:
+        raise flight.error
+    return flight.version
+
+
+def load_frame(name, loader, max_age=0, key=None):
+    """
+    load_dataset followed by get_dataset: returns (version, DataFrame). If
+    the version is evicted before it is read (other sessions published in
+    between), the dataset is loaded again.
+    """
+    for _ in range(3):
+        version = load_dataset(name, loader, max_age, key)
+        df = get_dataset(version)
+        if df is not None:
+            return version, df
+        max_age = 0
+    raise RuntimeError(f"Dataset '{name}' was unloaded before it could be read; please try again.")
+
+
+def set_session_dataset(version):
+    """
+    Points the current session at a stored dataset version.
+    """
+    st.session_state[SESSION_KEY] = version
+
+
+def session_dataset():
+    """
+    (version, DataFrame) for the current session. (None, None) when nothing
+    has been loaded yet, or when the session's version was evicted: the
+    user is told to reload rather than silently shown another dataset
+    (e.g. the cloud data in place of their upload).
+    """
+    version = st.session_state.get(SESSION_KEY)
+    df = get_dataset(version) if version else None
+    if df is None and version:
+        del st.session_state[SESSION_KEY]
+        st.warning("⚠️ The data this session was viewing has been unloaded to free memory. Please load it again.")
+    return (version, df) if df is not None else (None, None)
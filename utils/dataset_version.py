@@ -0,0 +1,55 @@
+# /utils/dataset_version.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Small process-wide cache for derived tables (failure intervals, trends,
+# indexes...). Entries are keyed by (name, dataset version) so a derived
+# table is built once per version of the data and shared by every rerun.
+MAX_ENTRIES = 32
+
+_CACHE = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def dataset_version(df):
+    """
+    Content fingerprint of a DataFrame: row count + hash of all values and
+    column names. Equal data gives an equal version across sessions.
+    """
+    if df is None or df.empty:
+        return "empty"
+
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha1(row_hashes.tobytes())
+    digest.update("|".join(map(str, df.columns)).encode("utf-8"))
+    return f"{len(df)}-{digest.hexdigest()[:16]}"
+
+
+def cached_for_version(name, version, builder):
+    """
+    Returns the cached result of builder() for (name, version), building it
+    on first use. Results are shared, so callers must treat them as read-only.
+    """
+    key = (name, version)
+    with _LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            return _CACHE[key]
+
+    result = builder()
+
+    with _LOCK:
+        _CACHE[key] = result
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > MAX_ENTRIES:
+            _CACHE.popitem(last=False)
+    return result
+
+
+def clear_version_cache():
+    with _LOCK:
+        _CACHE.clear()
@@ -0,0 +1,150 @@
+# /utils/dedupe_index.py
+
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Persistent index of removal events already saved, keyed by a 64-bit hash
+# of the fields that identify a removal. A double-clicked submit, a
+# re-uploaded file or a repeated generator run hashes to keys that are
+# already present and is dropped before it reaches storage. Single entries
+# cost one primary-key insert; a bulk upload is hashed in one vectorised
+# pass and checked with a single join. A new index starts from the local
+# removal mirror, so removals synced before it existed are caught too.
+INDEX_PATH = "data/removal_dedupe.sqlite"
+
+IDENTITY_FIELDS = ["aircraft_reg", "serial_number", "removal_date", "aircraft_fh"]
+
+_LOCK = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS event_keys (
+    key INTEGER PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(INDEX_PATH)
+    created = not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'event_keys'").fetchone()
+    conn.executescript(_SCHEMA)
+    if created:
+        # Imported here: removal_sync depends on gsheet_loader, which uses this module
+        from utils.removal_sync import load_mirror
+        history = load_mirror()
+        if not history.empty:
+            conn.executemany(
+                "INSERT OR IGNORE INTO event_keys (key) VALUES (?)",
+                ((int(k),) for k in np.unique(event_keys(history)))
+            )
+        conn.commit()
+    return conn
+
+
+def event_keys(df):
+    """
+    Identity hash of every row: registration and serial (trimmed, upper
+    case), removal date (day) and FH (0.1 h). Same event, same key, however
+    it was typed or parsed.
+    """
+    def text(field):
+        if field not in df.columns:
+            return pd.Series("", index=df.index)
+        return df[field].astype("string").str.strip().str.upper().fillna("")
+
+    if "removal_date" in df.columns:
+        dates = pd.to_datetime(df["removal_date"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+    else:
+        dates = pd.Series("", index=df.index)
+    if "aircraft_fh" in df.columns:
+        fh = pd.to_numeric(df["aircraft_fh"], errors="coerce").astype("float64").round(1)
+    else:
+        fh = pd.Series(np.nan, index=df.index)
+
+    identity = pd.DataFrame({
+        "aircraft_reg": text("aircraft_reg"),
+        "serial_number": text("serial_number"),
+        "removal_date": dates.astype("string"),
+        "aircraft_fh": fh,
+    })
+    # SQLite integers are signed 64-bit
+    return pd.util.hash_pandas_object(identity, index=False).to_numpy().view(np.int64)
+
+
+def duplicate_events(df):
+    """
+    Rows repeating an earlier row of the same frame.
+    """
+    return pd.Series(event_keys(df)).duplicated().to_numpy()
+
+
+def claim_event(record):
+    """
+    Registers one event. Returns (True, key) if it wasn't recorded before,
+    (False, key) if it is a duplicate.
+    """
+    key = int(event_keys(pd.DataFrame([record]))[0])
+    with _LOCK:
+        conn = _connect()
+        try:
+            cur = conn.execute("INSERT OR IGNORE INTO event_keys (key) VALUES (?)", (key,))
+            conn.commit()
+            return cur.rowcount == 1, key
+        finally:
+            conn.close()
+
+
+def claim_events(df):
+    """
+    Registers every new event of `df` at once. Returns (mask, keys): mask
+    marks rows that are new (not in the index and not repeating an earlier
+    row of the frame); keys are the claimed keys, for release_events.
+    """
+    keys = event_keys(df)
+    first = ~pd.Series(keys).duplicated().to_numpy()
+    with _LOCK:
+        conn = _connect()
+        try:
+            conn.execute("CREATE TEMP TABLE incoming (key INTEGER PRIMARY KEY) WITHOUT ROWID")
+            conn.executemany("INSERT INTO incoming (key) VALUES (?)", ((int(k),) for k in keys[first]))
+            seen = np.fromiter(
+                (row[0] for row in conn.execute("SELECT key FROM incoming JOIN event_keys USING (key)")),
+                dtype=np.int64
+            )
+            conn.execute("INSERT INTO event_keys (key) SELECT key FROM incoming WHERE key NOT IN (SELECT key FROM event_keys)")
+            conn.commit()
+        finally:
+            conn.close()
+    new = first & ~np.isin(keys, seen)
+    return new, keys[new]
+
+
+def release_events(keys):
+    """
+    Forgets claimed keys again (the write they were claimed for failed).
+    """
+    with _LOCK:
+        conn = _connect()
+        try:
+            conn.executemany("DELETE FROM event_keys WHERE key = ?", ((int(k),) for k in keys))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def rebuild_dedupe_index(df):
+    """
+    Recomputes the index from removal history (after deletions, a wipe or
+    when switching on an existing install).
+    """
+    keys = np.unique(event_keys(df)) if not df.empty else np.array([], dtype=np.int64)
+    with _LOCK:
+        conn = _connect()
+        try:
+            conn.execute("DELETE FROM event_keys")
+            conn.executemany("INSERT INTO event_keys (key) VALUES (?)", ((int(k),) for k in keys))
+            conn.commit()
+        finally:
+            conn.close()
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from utils.defect_store import open_defects
+
 DEFECT_PATH = "data/defect_log.csv"
 
 
@@ -7,16 +9,13 @@ def load_open_defects(aircraft_reg):
     if not aircraft_reg:
         return pd.DataFrame()
 
-    df = pd.read_csv(DEFECT_PATH)
+    # Served from the partial index of open defects (utils/defect_store)
+    df = open_defects(aircraft_reg)
 
     if df.empty:
         return df
 
-    df = df[df["status"] == "Open"]
-    df = df[df["aircraft_reg"] == aircraft_reg]
-
-    if df.empty:
-        return df
+    df = df.copy()
 
     df["label"] = (
         df["defect_id"].astype(str)
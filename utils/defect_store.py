@@ -0,0 +1,180 @@
+# /utils/defect_store.py
+
+import json
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from utils.storage import TABLE_SCHEMAS, get_storage_backend
+
+# An indexed SQLite copy of the defect log. Listing an aircraft's open
+# defects is one SELECT answered from a partial index over the open defects
+# only, so its cost follows the number of open defects rather than the
+# length of the log. The configured storage backend's 'defect_log' table
+# (data/defect_log.csv by default) is the record of the defects themselves:
+# the copy is reloaded whenever the backend's stamp changes (every
+# RESEED_TTL seconds for Google Sheets, which has none). Closes are recorded
+# here only, in the 'closures' table, and applied again after each reload,
+# so closing a defect is one indexed write and never rewrites the log.
+DEFECTS_PATH = "data/defects.sqlite"
+
+RESEED_TTL = 300  # seconds
+
+DEFECT_COLUMNS = list(TABLE_SCHEMAS["defect_log"])
+
+# Columns compared as text; stored normalised so lookups are plain equality
+_KEY_COLUMNS = ["aircraft_reg", "ata_chapter", "status"]
+
+_LOCK = threading.Lock()
+_READY = set()
+
+
+def _schema():
+    cols = ",\n    ".join(
+        f'"{c}" INTEGER PRIMARY KEY' if c == "defect_id" else f'"{c}" {t}'
+        for c, t in TABLE_SCHEMAS["defect_log"].items()
+    )
+    return f"""
+CREATE TABLE IF NOT EXISTS defects (
+    {cols}
+);
+CREATE INDEX IF NOT EXISTS idx_defects_reg_ata_status ON defects (aircraft_reg, ata_chapter, status);
+CREATE INDEX IF NOT EXISTS idx_defects_open ON defects (aircraft_reg, ata_chapter) WHERE status = 'Open';
+CREATE TABLE IF NOT EXISTS closures (defect_id INTEGER PRIMARY KEY, closure_date TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _text(value):
+    """
+    Key value as stored: trimmed text, whole numbers without '.0'.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _rows(records):
+    columns = DEFECT_COLUMNS
+    rows = []
+    for record in records:
+        row = []
+        for c in columns:
+            value = record.get(c)
+            if c in _KEY_COLUMNS:
+                value = _text(value)
+            elif value is not None and not isinstance(value, str) and pd.isna(value):
+                value = None
+            elif hasattr(value, "item"):
+                value = value.item()
+            if value is not None and not isinstance(value, (int, float, str, bytes)):
+                value = str(value)
+            row.append(value)
+        rows.append(row)
+    return columns, rows
+
+
+def _source_stamp(backend):
+    stamp = backend.stamp("defect_log")
+    if stamp is None:
+        stamp = ["ttl", int(time.time() // RESEED_TTL)]
+    return json.dumps([backend.name, stamp])
+
+
+def _meta(conn, key):
+    row = conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def _connect():
+    """
+    Connection to the copy, reloaded first if the backend's log changed.
+    """
+    conn = sqlite3.connect(DEFECTS_PATH)
+    if DEFECTS_PATH not in _READY:
+        conn.executescript(_schema())
+        _READY.add(DEFECTS_PATH)
+
+    backend = get_storage_backend()
+    stamp = _source_stamp(backend)
+    if _meta(conn, "source") != stamp:
+        seed = backend.read_table("defect_log")
+        # An empty read from Sheets may be a failed request: keep the copy
+        if not seed.empty or backend.name != "sheets":
+            conn.execute("DELETE FROM defects")
+            _insert(conn, seed.to_dict("records"))
+            _apply_closures(conn)
+        _set_meta(conn, "source", stamp)
+        conn.commit()
+    return conn
+
+
+def _apply_closures(conn):
+    """
+    Marks the defects closed here as closed in a freshly loaded copy.
+    """
+    conn.execute(
+        """
+        UPDATE defects SET
+            status = 'Closed',
+            closure_date = (SELECT closure_date FROM closures WHERE closures.defect_id = defects.defect_id)
+        WHERE status = 'Open' AND defect_id IN (SELECT defect_id FROM closures)
+        """
+    )
+
+
+def _insert(conn, records):
+    columns, rows = _rows(records)
+    col_list = ", ".join(f'"{c}"' for c in columns)
+    placeholders = ", ".join("?" * len(columns))
+    conn.executemany(f"INSERT OR REPLACE INTO defects ({col_list}) VALUES ({placeholders})", rows)
+
+
+def open_defects(aircraft_reg):
+    """
+    Open defects of one aircraft, oldest first.
+    """
+    with _LOCK:
+        conn = _connect()
+        try:
+            return pd.read_sql(
+                "SELECT * FROM defects WHERE aircraft_reg = ? AND status = 'Open' ORDER BY defect_id",
+                conn, params=[_text(aircraft_reg)]
+            )
+        finally:
+            conn.close()
+
+
+def close_defects(aircraft_reg, ata_chapter, closure_date):
+    """
+    Closes the open defects for an aircraft and ATA chapter. Returns the
+    number of defects closed.
+    """
+    with _LOCK:
+        conn = _connect()
+        try:
+            ids = [row[0] for row in conn.execute(
+                "SELECT defect_id FROM defects WHERE aircraft_reg = ? AND ata_chapter = ? AND status = 'Open'",
+                (_text(aircraft_reg), _text(ata_chapter))
+            )]
+            conn.executemany(
+                "INSERT OR REPLACE INTO closures (defect_id, closure_date) VALUES (?, ?)",
+                [(defect_id, str(closure_date)) for defect_id in ids]
+            )
+            conn.executemany(
+                "UPDATE defects SET status = 'Closed', closure_date = ? WHERE defect_id = ?",
+                [(str(closure_date), defect_id) for defect_id in ids]
+            )
+            conn.commit()
+            return len(ids)
+        finally:
+            conn.close()
+
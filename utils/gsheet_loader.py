@@ -1,17 +1,111 @@
+import logging
+import threading
+import time
+
 import streamlit as st
 import gspread
 import pandas as pd
 from google.oauth2.service_account import Credentials
 
+from utils.schema import frame_from_values
+
 SCOPE = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive"
 ]
 
+SPREADSHEET_NAME = "MaintWatch_Data"
+
+# Small lookup tabs shared by every page (dropdowns, Admin views)
+REFERENCE_SHEETS = ["aircraft_fleet", "ata_chapters"]
+REFERENCE_TTL = 300  # seconds
+
+logger = logging.getLogger(__name__)
+
+# --- PROCESS-WIDE CONNECTION POOL ---
+# One authorized client + spreadsheet handle is shared by every session in this
+# Streamlit process. gspread wraps the service account credentials in an
+# AuthorizedSession, which refreshes the access token by itself when it expires,
+# so the handle stays valid across reruns.
+_POOL_LOCK = threading.Lock()
+_POOL = {
+    "spreadsheet": None,
+    "worksheets": {},   # worksheet_name -> gspread.Worksheet
+}
+_CONNECTION_STATS = {
+    "connect_ms": None,      # Latency of the last client authorize + open
+    "worksheet_ms": {},      # Latency of the last lookup per worksheet
+    "connects": 0,
+    "cache_hits": 0,
+    "invalidations": 0,
+}
+
+
+def _get_spreadsheet():
+    """
+    Returns the pooled 'MaintWatch_Data' spreadsheet, authorizing on first use.
+    Caller must hold _POOL_LOCK.
+    """
+    if _POOL["spreadsheet"] is None:
+        start = time.perf_counter()
+        creds_dict = dict(st.secrets["gcp_service_account"])
+        creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPE)
+        client = gspread.authorize(creds)
+        _POOL["spreadsheet"] = client.open(SPREADSHEET_NAME)
+        _CONNECTION_STATS["connect_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        _CONNECTION_STATS["connects"] += 1
+    return _POOL["spreadsheet"]
+
+
+def invalidate_connection(worksheet_name=None):
+    """
+    Drops cached handles so the next call reconnects.
+    With a worksheet name only that handle is dropped; without one the whole
+    pool (client, spreadsheet and all worksheets) is discarded.
+    """
+    with _POOL_LOCK:
+        if worksheet_name is None:
+            _POOL["spreadsheet"] = None
+            _POOL["worksheets"].clear()
+        else:
+            _POOL["worksheets"].pop(worksheet_name, None)
+        _CONNECTION_STATS["invalidations"] += 1
+
+
+def get_connection_stats():
+    """
+    Returns a snapshot of pool latency and hit counters (for Connection_Test).
+    """
+    with _POOL_LOCK:
+        stats = dict(_CONNECTION_STATS)
+        stats["worksheet_ms"] = dict(_CONNECTION_STATS["worksheet_ms"])
+        stats["cached_worksheets"] = sorted(_POOL["worksheets"].keys())
+    return stats
+
+
+def _handle_api_error(error, worksheet_name):
+    """
+    Invalidates pooled handles that an API error shows to be stale.
+    401 means the credentials/session are bad, so the whole pool goes;
+    404 means the worksheet was deleted or renamed.
+    """
+    if isinstance(error, gspread.WorksheetNotFound):
+        invalidate_connection(worksheet_name)
+        return
+
+    if isinstance(error, gspread.exceptions.APIError):
+        status = getattr(error.response, "status_code", None)
+        if status == 401:
+            invalidate_connection()
+        elif status == 404:
+            invalidate_connection(worksheet_name)
+
+
 def connect_to_sheet(worksheet_name="removal_events"):
     """
     Connects to a specific worksheet in the 'MaintWatch_Data' Google Sheet.
     Default worksheet is 'removal_events'.
+    Handles are pooled per process, so a warm call makes no API requests.
     """
     try:
         # Check for credentials in Streamlit Secrets
@@ -19,58 +113,123 @@ def connect_to_sheet(worksheet_name="removal_events"):
             st.error("Missing 'gcp_service_account' in Streamlit Secrets.")
             return None
 
-        # Authenticate using Service Account
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPE)
-        client = gspread.authorize(creds)
-        
-        # Open the specific Google Sheet file
-        sheet_file = client.open("MaintWatch_Data")
-        
-        # Try to open the specific worksheet
-        try:
-            return sheet_file.worksheet(worksheet_name)
-        except gspread.WorksheetNotFound:
-            st.error(f"Worksheet '{worksheet_name}' not found. Please check your Google Sheet tabs.")
+        with _POOL_LOCK:
+            sheet = _POOL["worksheets"].get(worksheet_name)
+            if sheet is not None:
+                _CONNECTION_STATS["cache_hits"] += 1
+                return sheet
+
+            sheet_file = _get_spreadsheet()
+
+            # Try to open the specific worksheet
+            start = time.perf_counter()
+            try:
+                sheet = sheet_file.worksheet(worksheet_name)
+            except gspread.WorksheetNotFound:
+                st.error(f"Worksheet '{worksheet_name}' not found. Please check your Google Sheet tabs.")
+                return None
+
+            _CONNECTION_STATS["worksheet_ms"][worksheet_name] = round((time.perf_counter() - start) * 1000, 1)
+            _POOL["worksheets"][worksheet_name] = sheet
+            return sheet
+
+    except Exception as e:
+        _handle_api_error(e, worksheet_name)
+        st.error(f"Failed to connect to Google Sheet: {e}")
+        return None
+
+def connect_to_spreadsheet():
+    """
+    Returns the pooled 'MaintWatch_Data' spreadsheet handle (for requests
+    that span several worksheets).
+    """
+    try:
+        if "gcp_service_account" not in st.secrets:
+            st.error("Missing 'gcp_service_account' in Streamlit Secrets.")
             return None
-            
+
+        with _POOL_LOCK:
+            return _get_spreadsheet()
+
     except Exception as e:
+        _handle_api_error(e, None)
         st.error(f"Failed to connect to Google Sheet: {e}")
         return None
 
+@st.cache_data(ttl=REFERENCE_TTL, show_spinner=False)
+def _fetch_reference_values():
+    """
+    One values.batchGet for every reference tab. Cached process-wide, so all
+    sessions share it. Raises on failure so errors are never cached.
+    """
+    sheet_file = connect_to_spreadsheet()
+    if not sheet_file:
+        raise ConnectionError("Could not connect to the Google Sheet.")
+
+    # A bare (quoted) sheet name as the range returns the whole tab
+    ranges = [f"'{name}'" for name in REFERENCE_SHEETS]
+    response = sheet_file.values_batch_get(ranges)
+    value_ranges = response.get("valueRanges", [])
+    values = {name: vr.get("values", []) for name, vr in zip(REFERENCE_SHEETS, value_ranges)}
+
+    # Log the fleet's current FH/FC as dated utilization readings (once per fetch)
+    try:
+        # Imported here, like the other local stores this module feeds, so
+        # connecting to the sheet doesn't load them all
+        from utils.utilization import record_fleet_snapshots
+        record_fleet_snapshots(frame_from_values(values.get("aircraft_fleet", []), "aircraft_fleet"))
+    except Exception as e:
+        logger.warning("Fleet utilization not recorded: %s", e)
+
+    return values
+
+def fetch_reference_tables():
+    """
+    Returns {'aircraft_fleet': DataFrame, 'ata_chapters': DataFrame}.
+    At most one API round-trip per REFERENCE_TTL for the whole app; writes
+    through write_data_to_sheet invalidate it immediately.
+    """
+    try:
+        values = _fetch_reference_values()
+    except Exception as e:
+        _handle_api_error(e, None)
+        st.error(f"Error reading reference data from Google Sheet: {e}")
+        values = {}
+
+    return {name: frame_from_values(values.get(name, []), name) for name in REFERENCE_SHEETS}
+
+def invalidate_reference_tables():
+    """
+    Drops the shared reference cache (after a new aircraft/ATA chapter is saved).
+    """
+    _fetch_reference_values.clear()
+
 def fetch_all_data(worksheet_name="removal_events"):
     """
     Reads all data from the Google Sheet and returns a Pandas DataFrame.
     Used by the Dashboard to pull live data.
+    Raw values come back in one call and are typed column-by-column using
+    the declared schema in utils/schema (dates, floats, categoricals).
     """
     sheet = connect_to_sheet(worksheet_name)
     if not sheet:
         return pd.DataFrame()
 
     try:
-        # Get all records (returns a list of dictionaries)
-        data = sheet.get_all_records()
-        
-        if not data:
-            return pd.DataFrame()
-            
-        df = pd.DataFrame(data)
-        return df
+        # Get all values (header row + raw cell strings)
+        values = sheet.get_all_values()
+        return frame_from_values(values, worksheet_name)
         
     except Exception as e:
+        _handle_api_error(e, worksheet_name)
         st.error(f"Error reading data from Google Sheet: {e}")
         return pd.DataFrame()
 
-def write_data_to_sheet(data_dict, target_sheet):
+def build_sheet_row(data_dict, target_sheet):
     """
-    Generic function to append a single dictionary row to a specific sheet.
-    Handles 'aircraft_fleet', 'ata_chapters', and 'removal_events'.
+    Converts a record dictionary into a list in the column order of the
+    target sheet. Returns None for an unknown sheet.
     """
-    sheet = connect_to_sheet(target_sheet)
-    if not sheet:
-        return False
-
-    # Define column order based on the target sheet
     if target_sheet == "aircraft_fleet":
         row_data = [
             data_dict.get("Registration"),
@@ -100,30 +259,104 @@ def write_data_to_sheet(data_dict, target_sheet):
             data_dict.get("removal_reason")
         ]
     else:
+        return None
+
+    return row_data
+
+def write_data_to_sheet(data_dict, target_sheet):
+    """
+    Generic function to append a single dictionary row to a specific sheet.
+    Handles 'aircraft_fleet', 'ata_chapters', and 'removal_events'.
+    """
+    row_data = build_sheet_row(data_dict, target_sheet)
+    if row_data is None:
         st.error(f"Unknown target sheet: {target_sheet}")
         return False
-    
+
+    sheet = connect_to_sheet(target_sheet)
+    if not sheet:
+        return False
+
     try:
         sheet.append_row(row_data)
+        if target_sheet in REFERENCE_SHEETS:
+            invalidate_reference_tables()
         return True
     except Exception as e:
+        _handle_api_error(e, target_sheet)
         st.error(f"Error saving to {target_sheet}: {e}")
         return False
 
 def append_removal_event_gsheet(record):
     """
     Wrapper function for backward compatibility with the New Entry form.
+    The record is journaled locally and uploaded in batches by the
+    write-behind queue (utils/write_queue), so this returns immediately.
     """
-    return write_data_to_sheet(record, "removal_events")
+    # Imported here: write_queue itself depends on this module, and the
+    # local stores are only needed when a removal is saved
+    from utils.write_queue import enqueue_removal_event
+    from utils.dedupe_index import claim_event, release_events
+    from utils.online_anomaly import alert_message
+    from utils.removal_hooks import after_removal_saved
+
+    # Same aircraft, serial, date and FH as a saved removal: don't save twice
+    is_new, key = claim_event(record)
+    if not is_new:
+        st.warning("⚠️ This removal is already recorded (same aircraft, serial number, date and FH).")
+        return False
+
+    try:
+        queued = enqueue_removal_event(record)
+    except OSError as e:
+        release_events([key])
+        st.error(f"Error queueing removal event: {e}")
+        return False
+
+    # Running MTBF totals, anomaly statistics and counter index; an interval
+    # far shorter than the component's usual one is flagged on the form
+    alert = after_removal_saved(record)
+    if alert:
+        st.warning(alert_message(alert))
+    return queued
 
 def write_bulk_data(df):
     """
     Appends a PANDAS DATAFRAME to 'removal_events'.
     Used by Admin Tools (Dummy Data Generator).
+    Rows failing the removal-event rules or already recorded are not
+    uploaded. Returns the rows written (possibly none), or None on failure.
     """
+    # Imported here: the local stores are only needed when removals are saved
+    from utils.component_master_loader import component_master
+    from utils.counter_index import counter_errors
+    from utils.dedupe_index import claim_events, release_events
+    from utils.removal_hooks import after_removals_saved
+    from validation.component_rules import error_summary, validate_removal_events
+
+    # Whole-frame validation (vectorised, so large backfills stay fast),
+    # including FH/FC order against the aircraft's history
+    errors = pd.concat([validate_removal_events(df, component_master().by_code), counter_errors(df)], axis=1)
+    invalid = errors.any(axis=1).to_numpy()
+    if invalid.any():
+        st.warning(f"⚠️ {int(invalid.sum())} of {len(df)} rows failed validation and were not uploaded.")
+        st.dataframe(error_summary(errors), hide_index=True)
+        df = df[~invalid]
+        if df.empty:
+            return None
+
+    # Drop rows already saved (or repeated within the frame) in one pass
+    is_new, claimed = claim_events(df)
+    if not is_new.all():
+        st.info(f"ℹ️ Skipped {int((~is_new).sum())} rows that are already recorded.")
+        df = df[is_new]
+        if df.empty:
+            return df
+
     sheet = connect_to_sheet("removal_events")
     if not sheet:
-        return False
+        release_events(claimed)
+        return None
 
     try:
         df_export = df.copy()
@@ -141,10 +374,15 @@ def write_bulk_data(df):
         
         # Append all rows at once
         sheet.append_rows(data_to_upload)
-        return True
     except Exception as e:
+        release_events(claimed)
+        _handle_api_error(e, "removal_events")
         st.error(f"Error writing bulk data: {e}")
-        return False
+        return None
+
+    # Running MTBF totals, anomaly statistics and counter index
+    after_removals_saved(df)
+    return df
 
 def clear_worksheet_data(target_sheet="removal_events"):
     """
@@ -170,5 +408,6 @@ def clear_worksheet_data(target_sheet="removal_events"):
             return True
             
     except Exception as e:
+        _handle_api_error(e, target_sheet)
         st.error(f"Error clearing sheet: {e}")
         return False
@@ -1,13 +1,28 @@
 # /utils/migrate_removal_events.py
 
+import logging
+
 import pandas as pd
 
+from utils.removal_events_loader import refresh_removal_events_store
+from utils.storage import get_storage_backend
+
 REMOVALS_PATH = "data/removal_events.csv"
 COMPONENTS_PATH = "data/components.csv"
 
+logger = logging.getLogger(__name__)
+
 
 def migrate_removal_events():
-    removals = pd.read_csv(REMOVALS_PATH)
+    # Rewritten under the appender's file lock, so rows saved by a running
+    # app wait for the migration instead of landing in the replaced file
+    backend = get_storage_backend("csv")
+    with backend.appender("removal_events").locked():
+        _migrate(backend)
+
+
+def _migrate(backend):
+    removals = pd.read_csv(backend.path("removal_events"))
     components = pd.read_csv(COMPONENTS_PATH)
 
     # Normalize for matching
@@ -31,7 +46,7 @@ def migrate_removal_events():
 
     missing = merged["component_code"].isna().sum()
     if missing > 0:
-        print(f"WARNING: {missing} rows could not be mapped to component master")
+        logger.warning("%s rows could not be mapped to component master", missing)
 
     # Drop helper column
     merged.drop(columns=["component_name_norm"], inplace=True)
@@ -60,5 +75,9 @@ def migrate_removal_events():
     final_cols = [c for c in ordered_cols if c in merged.columns]
     merged = merged[final_cols]
 
-    merged.to_csv(REMOVALS_PATH, index=False)
-    print("Migration complete. removal_events.csv updated.")
+    merged.to_csv(backend.path("removal_events"), index=False)
+    logger.info("Migration complete. removal_events.csv updated.")
+
+    # The rewrite changed rows in place: the store is rebuilt
+    if refresh_removal_events_store(backend):
+        logger.info("Parquet store rebuilt.")
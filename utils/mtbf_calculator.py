@@ -1,75 +1,163 @@
 # /utils/mtbf_calculator.py
 
+import numpy as np
 import pandas as pd
 
-
-def calculate_mtbf_by_component(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-
-    df = df[df["removal_reason"] == "Unscheduled Failure"]
-    if df.empty:
+from utils.dataset_version import cached_for_version, dataset_version
+from utils.schema import UNSPECIFIED_CODES
+
+# A failure interval is the gap between two consecutive unscheduled
+# removals of the same unit (component + serial on the same aircraft).
+# Removals without a parseable date or FH don't take part, and gaps of zero
+# or negative FH (repeated or out-of-order readings) are not intervals.
+# Every MTBF, trend, Weibull and anomaly view relies on this rule.
+INTERVAL_KEYS = ["component_code", "serial_number", "aircraft_reg"]
+
+# Descriptive columns carried into the interval table when present
+INTERVAL_ATTRIBUTES = ["component_name", "category", "criticality", "ata_chapter", "part_number", "removal_reason"]
+
+# Grouping columns for each MTBF view
+MTBF_LEVELS = {
+    "component": ["component_code", "component_name", "category", "criticality"],
+    "ata": ["ata_chapter"],
+    "aircraft": ["aircraft_reg"],
+    "part_number": ["part_number", "component_name"],
+    "fleet": [],
+}
+
+
+def unscheduled_mask(df: pd.DataFrame) -> pd.Series:
+    """
+    Rows that count as failures: removal_type 'Unscheduled' (entry forms and
+    the Google Sheet) or removal_reason 'Unscheduled Failure' (legacy CSV).
+    """
+    mask = pd.Series(False, index=df.index)
+    if "removal_type" in df.columns:
+        mask |= df["removal_type"].astype(str) == "Unscheduled"
+    if "removal_reason" in df.columns:
+        mask |= df["removal_reason"].astype(str) == "Unscheduled Failure"
+    return mask
+
+
+def component_key(frame: pd.DataFrame) -> pd.Series:
+    """
+    The component a removal or interval belongs to when pooling across
+    units: its component_code, or its component_name where the code is a
+    placeholder (the quick entry page saves "N/A" for every removal, which
+    would pool unrelated parts).
+    """
+    names = frame["component_name"].astype("string").str.strip() if "component_name" in frame else pd.NA
+    if "component_code" not in frame:
+        return pd.Series(names, index=frame.index, dtype="string")
+    codes = frame["component_code"].astype("string").str.strip()
+    return codes.where(codes.notna() & ~codes.isin(UNSPECIFIED_CODES), names)
+
+
+def build_failure_intervals(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per consecutive unscheduled removal pair of the same unit, with
+    FH, FC and calendar-day deltas. The row carries the later removal's
+    date and counters, and fh_delta is always positive. Sorted once here;
+    every MTBF view groups this table.
+    """
+    required = INTERVAL_KEYS + ["removal_date", "aircraft_fh"]
+    if df.empty or any(c not in df.columns for c in required):
         return pd.DataFrame()
 
-    df["removal_date"] = pd.to_datetime(df["removal_date"])
+    return interval_deltas(df[unscheduled_mask(df)]).reset_index(drop=True)
 
-    df = df.sort_values(
-        ["component_code", "serial_number", "aircraft_reg", "removal_date"]
-    )
 
-    df["fh_delta"] = df.groupby(
-        ["component_code", "serial_number", "aircraft_reg"]
-    )["aircraft_fh"].diff()
+def interval_deltas(events: pd.DataFrame) -> pd.DataFrame:
+    """
+    The interval rows of a frame of unscheduled removals (the second half
+    of build_failure_intervals, also used by mtbf_state on one unit's
+    removals so its running totals follow the same rule).
+    """
+    if events.empty:
+        return pd.DataFrame()
 
-    valid = df.dropna(subset=["fh_delta"])
-    if valid.empty:
+    keep = INTERVAL_KEYS + ["removal_date", "aircraft_fh"]
+    keep += [c for c in INTERVAL_ATTRIBUTES + ["aircraft_fc"] if c in events.columns]
+    events = events[keep].copy()
+    events["removal_date"] = pd.to_datetime(events["removal_date"], errors="coerce")
+    events["aircraft_fh"] = pd.to_numeric(events["aircraft_fh"], errors="coerce")
+    if "aircraft_fc" in events.columns:
+        events["aircraft_fc"] = pd.to_numeric(events["aircraft_fc"], errors="coerce")
+    events = events[events["removal_date"].notna() & events["aircraft_fh"].notna()]
+
+    events = events.sort_values(INTERVAL_KEYS + ["removal_date", "aircraft_fh"], kind="stable")
+
+    # After the sort each unit's removals are contiguous, so a delta is valid
+    # wherever a row belongs to the same unit as the row before it.
+    unit = events.groupby(INTERVAL_KEYS, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+    same_unit = np.r_[False, unit[1:] == unit[:-1]]
+
+    fh = events["aircraft_fh"].to_numpy(dtype="float64")
+    events["fh_delta"] = np.where(same_unit, np.r_[np.nan, np.diff(fh)], np.nan)
+
+    if "aircraft_fc" in events.columns:
+        fc = events["aircraft_fc"].to_numpy(dtype="float64", na_value=np.nan)
+        events["fc_delta"] = np.where(same_unit, np.r_[np.nan, np.diff(fc)], np.nan)
+
+    dates = events["removal_date"].to_numpy(dtype="datetime64[ns]")
+    days = np.r_[np.nan, (np.diff(dates) / np.timedelta64(1, "D")).astype("float64")]
+    events["days_delta"] = np.where(same_unit, days, np.nan)
+
+    # Index labels are kept so callers can tell which removal closed each interval
+    return events[same_unit & (events["fh_delta"] > 0).to_numpy()]
+
+
+def failure_intervals(df: pd.DataFrame, version: str = None) -> pd.DataFrame:
+    """
+    Cached build_failure_intervals: built once per dataset version and
+    shared. Pass `version` when the caller already knows it; otherwise it
+    is derived from the frame's content.
+    """
+    version = version or dataset_version(df)
+    return cached_for_version("failure_intervals", version, lambda: build_failure_intervals(df))
+
+
+def mtbf_from_intervals(intervals: pd.DataFrame, level: str = "component") -> pd.DataFrame:
+    """
+    MTBF for one view ('component', 'ata', 'aircraft', 'part_number', 'fleet')
+    as a groupby over a failure-interval table.
+    """
+    if intervals.empty:
         return pd.DataFrame()
 
-    mtbf = (
-        valid.groupby(
-            ["component_code", "component_name", "category", "criticality"]
+    group_cols = [c for c in MTBF_LEVELS[level] if c in intervals.columns]
+
+    aggregations = {
+        "mtbf_fh": ("fh_delta", "mean"),
+        "failure_count": ("fh_delta", "count"),
+        "mtbf_days": ("days_delta", "mean"),
+    }
+    if "fc_delta" in intervals.columns:
+        aggregations["mtbf_fc"] = ("fc_delta", "mean")
+
+    if group_cols:
+        mtbf = (
+            intervals.groupby(group_cols, observed=True, dropna=False)
+            .agg(**aggregations)
+            .reset_index()
         )
-        .agg(
-            mtbf_fh=("fh_delta", "mean"),
-            failure_count=("fh_delta", "count")
-        )
-        .reset_index()
-    )
+    else:
+        mtbf = pd.DataFrame({name: [getattr(intervals[col], func)()] for name, (col, func) in aggregations.items()})
 
-    mtbf["mtbf_fh"] = mtbf["mtbf_fh"].round(1)
+    for col in ["mtbf_fh", "mtbf_fc", "mtbf_days"]:
+        if col in mtbf.columns:
+            mtbf[col] = mtbf[col].round(1)
 
     return mtbf.sort_values("mtbf_fh", ascending=False)
 
 
-def calculate_mtbf_by_ata(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-
-    df = df[df["removal_reason"] == "Unscheduled Failure"]
-    if df.empty:
-        return pd.DataFrame()
-
-    df["removal_date"] = pd.to_datetime(df["removal_date"])
-
-    df = df.sort_values(
-        ["ata_chapter", "serial_number", "aircraft_reg", "removal_date"]
-    )
-
-    df["fh_delta"] = df.groupby(
-        ["ata_chapter", "serial_number", "aircraft_reg"]
-    )["aircraft_fh"].diff()
+def calculate_mtbf(df: pd.DataFrame, level: str = "component", version: str = None) -> pd.DataFrame:
+    return mtbf_from_intervals(failure_intervals(df, version), level)
 
-    valid = df.dropna(subset=["fh_delta"])
-    if valid.empty:
-        return pd.DataFrame()
 
-    mtbf = (
-        valid.groupby("ata_chapter")
-        .agg(
-            mtbf_fh=("fh_delta", "mean"),
-            failure_count=("fh_delta", "count")
-        )
-        .reset_index()
-    )
+def calculate_mtbf_by_component(df: pd.DataFrame, version: str = None) -> pd.DataFrame:
+    return calculate_mtbf(df, "component", version)
 
-    mtbf["mtbf_fh"] = mtbf["mtbf_fh"].round(1)
 
-    return mtbf.sort_values("mtbf_fh", ascending=False)
+def calculate_mtbf_by_ata(df: pd.DataFrame, version: str = None) -> pd.DataFrame:
+    return calculate_mtbf(df, "ata", version)
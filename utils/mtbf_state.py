@@ -0,0 +1,325 @@
+# /utils/mtbf_state.py
+
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.mtbf_calculator import INTERVAL_ATTRIBUTES, INTERVAL_KEYS, component_key, interval_deltas, unscheduled_mask
+
+# Running MTBF aggregates, updated as each removal is saved instead of
+# rescanning the history. Each unit (component_code, serial_number,
+# aircraft_reg, the same key as mtbf_calculator's failure intervals) keeps
+# its last removal's date, FH and FC plus the running count, sum and sum of
+# squares of its FH deltas; the same sums are kept per component
+# (mtbf_calculator.component_key), ATA chapter and fleet. A new removal is
+# one interval against its unit's last removal, so a save costs O(1)
+# whatever the unit's history. Intervals follow mtbf_calculator's rule (FH
+# gap > 0). A removal dated before its unit's last one can't be placed
+# without the history: it is left out of the running totals until
+# rebuild_mtbf_state() recomputes everything from history.
+STATE_PATH = "data/mtbf_state.sqlite"
+
+ROLLUP_LEVELS = ["component", "ata", "fleet"]
+
+SUM_COLUMNS = ["n", "sum_fh", "sumsq_fh", "sum_fc", "sum_days"]
+
+_LOCK = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS unit_state (
+    component_code TEXT NOT NULL,
+    serial_number TEXT NOT NULL,
+    aircraft_reg TEXT NOT NULL,
+    component_key TEXT,
+    ata_chapter TEXT,
+    last_fh REAL,
+    last_fc REAL,
+    last_date TEXT,
+    n INTEGER NOT NULL DEFAULT 0,
+    sum_fh REAL NOT NULL DEFAULT 0,
+    sumsq_fh REAL NOT NULL DEFAULT 0,
+    sum_fc REAL NOT NULL DEFAULT 0,
+    sum_days REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (component_code, serial_number, aircraft_reg)
+);
+CREATE TABLE IF NOT EXISTS rollup_state (
+    level TEXT NOT NULL,
+    key TEXT NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    sum_fh REAL NOT NULL DEFAULT 0,
+    sumsq_fh REAL NOT NULL DEFAULT 0,
+    sum_fc REAL NOT NULL DEFAULT 0,
+    sum_days REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (level, key)
+);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(STATE_PATH)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _events(df):
+    """
+    The unscheduled removals of `df` that can form intervals, with text
+    unit keys and the source row's position in 'row'.
+    """
+    if df.empty or any(c not in df.columns for c in INTERVAL_KEYS + ["removal_date", "aircraft_fh"]):
+        return pd.DataFrame()
+
+    unscheduled = unscheduled_mask(df).to_numpy()
+    events = df[unscheduled]
+    events = pd.DataFrame({
+        "component_code": events["component_code"].fillna("").astype(str),
+        "serial_number": events["serial_number"].fillna("").astype(str),
+        "aircraft_reg": events["aircraft_reg"].fillna("").astype(str),
+        "component_key": component_key(events).fillna("").astype(str),
+        "ata_chapter": events["ata_chapter"].fillna("").astype(str) if "ata_chapter" in events else "",
+        "removal_date": pd.to_datetime(events["removal_date"], errors="coerce").dt.normalize(),
+        "aircraft_fh": pd.to_numeric(events["aircraft_fh"], errors="coerce").astype("float64"),
+        "aircraft_fc": (pd.to_numeric(events["aircraft_fc"], errors="coerce").astype("float64")
+                        if "aircraft_fc" in events else np.nan),
+        "row": np.flatnonzero(unscheduled),
+    })
+    valid = (events["serial_number"] != "") & events["removal_date"].notna() & events["aircraft_fh"].notna()
+    return events[valid]
+
+
+def _sums(intervals, units):
+    """
+    Running-sum columns of an interval table, per unit and per rollup key.
+    """
+    if intervals.empty:
+        keys = pd.MultiIndex.from_arrays([[], []], names=["level", "key"])
+        return pd.DataFrame(0, index=units, columns=SUM_COLUMNS), pd.DataFrame(0, index=keys, columns=SUM_COLUMNS)
+
+    iv = pd.DataFrame({
+        "component_code": intervals["component_code"],
+        "serial_number": intervals["serial_number"],
+        "aircraft_reg": intervals["aircraft_reg"],
+        "component_key": intervals["component_key"],
+        "ata_chapter": intervals["ata_chapter"],
+        "n": 1,
+        "sum_fh": intervals["fh_delta"],
+        "sumsq_fh": intervals["fh_delta"] ** 2,
+        "sum_fc": intervals["fc_delta"].fillna(0) if "fc_delta" in intervals else 0.0,
+        "sum_days": intervals["days_delta"].fillna(0),
+    })
+    unit_sums = iv.groupby(INTERVAL_KEYS)[SUM_COLUMNS].sum()
+    rollups = pd.concat([
+        iv.assign(level="component", key=iv["component_key"]),
+        iv.assign(level="ata", key=iv["ata_chapter"]),
+        iv.assign(level="fleet", key="fleet"),
+    ]).groupby(["level", "key"])[SUM_COLUMNS].sum()
+    return unit_sums.reindex(units, fill_value=0), rollups
+
+
+def _baselines(conn, units):
+    """
+    The stored last removal of each of `units` (those seen before), as
+    removal rows.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS touched_units (component_code TEXT, serial_number TEXT, aircraft_reg TEXT)")
+    conn.execute("DELETE FROM touched_units")
+    conn.executemany("INSERT INTO touched_units VALUES (?, ?, ?)", units.itertuples(index=False))
+    base = pd.read_sql(
+        """
+        SELECT component_code, serial_number, aircraft_reg, component_key, ata_chapter,
+               last_date AS removal_date, last_fh AS aircraft_fh, last_fc AS aircraft_fc
+        FROM unit_state JOIN touched_units USING (component_code, serial_number, aircraft_reg)
+        WHERE last_date IS NOT NULL AND last_fh IS NOT NULL
+        """,
+        conn
+    )
+    base["removal_date"] = pd.to_datetime(base["removal_date"], errors="coerce")
+    base["aircraft_fh"] = base["aircraft_fh"].astype("float64")
+    base["aircraft_fc"] = base["aircraft_fc"].astype("float64")
+    return base
+
+
+def _apply(conn, events):
+    """
+    Adds removals to the state: each one closes an interval against its
+    unit's previous removal (the stored last one, or an earlier one in the
+    same batch). Removals dated before their unit's stored last removal are
+    skipped. Returns the intervals closed (with their 'row').
+    """
+    if events.empty:
+        return pd.DataFrame()
+
+    base = _baselines(conn, events[INTERVAL_KEYS].drop_duplicates())
+    after_base = events.merge(
+        base[INTERVAL_KEYS + ["removal_date", "aircraft_fh"]], on=INTERVAL_KEYS, how="left", suffixes=("", "_base")
+    )
+    in_order = (
+        after_base["removal_date_base"].isna()
+        | (after_base["removal_date"] > after_base["removal_date_base"])
+        | ((after_base["removal_date"] == after_base["removal_date_base"])
+           & (after_base["aircraft_fh"] >= after_base["aircraft_fh_base"]))
+    ).to_numpy()
+    events = events[in_order]
+    if events.empty:
+        return pd.DataFrame()
+
+    # Baselines first, so labels >= len(base) are the added removals
+    combined = pd.concat([base, events.drop(columns="row")], ignore_index=True)
+    intervals = interval_deltas(combined)
+    intervals = intervals.assign(component_key=combined.loc[intervals.index, "component_key"])
+
+    units = pd.MultiIndex.from_frame(events[INTERVAL_KEYS].drop_duplicates())
+    unit_sums, rollups = _sums(intervals, units)
+
+    conn.executemany(
+        """
+        INSERT INTO rollup_state (level, key, n, sum_fh, sumsq_fh, sum_fc, sum_days)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (level, key) DO UPDATE SET
+            n = n + excluded.n,
+            sum_fh = sum_fh + excluded.sum_fh,
+            sumsq_fh = sumsq_fh + excluded.sumsq_fh,
+            sum_fc = sum_fc + excluded.sum_fc,
+            sum_days = sum_days + excluded.sum_days
+        """,
+        [(r.level, r.key, int(r.n), r.sum_fh, r.sumsq_fh, r.sum_fc, r.sum_days)
+         for r in rollups.reset_index().itertuples(index=False)]
+    )
+
+    # Each unit's latest removal becomes the baseline for its next interval
+    last = (
+        combined.sort_values(["removal_date", "aircraft_fh"], kind="stable")
+        .groupby(INTERVAL_KEYS, sort=False).tail(1)
+        .set_index(INTERVAL_KEYS).reindex(units)
+    )
+    unit_rows = unit_sums.assign(
+        component_key=last["component_key"],
+        ata_chapter=last["ata_chapter"],
+        last_fh=last["aircraft_fh"],
+        last_fc=last["aircraft_fc"].astype(object).where(last["aircraft_fc"].notna(), None),
+        last_date=last["removal_date"].dt.strftime("%Y-%m-%d"),
+    ).reset_index()
+    conn.executemany(
+        """
+        INSERT INTO unit_state
+            (component_code, serial_number, aircraft_reg, component_key, ata_chapter, last_fh, last_fc, last_date,
+             n, sum_fh, sumsq_fh, sum_fc, sum_days)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (component_code, serial_number, aircraft_reg) DO UPDATE SET
+            component_key = excluded.component_key,
+            ata_chapter = excluded.ata_chapter,
+            last_fh = excluded.last_fh,
+            last_fc = excluded.last_fc,
+            last_date = excluded.last_date,
+            n = n + excluded.n,
+            sum_fh = sum_fh + excluded.sum_fh,
+            sumsq_fh = sumsq_fh + excluded.sumsq_fh,
+            sum_fc = sum_fc + excluded.sum_fc,
+            sum_days = sum_days + excluded.sum_days
+        """,
+        [(r.component_code, r.serial_number, r.aircraft_reg, r.component_key, r.ata_chapter,
+          r.last_fh, r.last_fc, r.last_date, int(r.n), r.sum_fh, r.sumsq_fh, r.sum_fc, r.sum_days)
+         for r in unit_rows.itertuples(index=False)]
+    )
+
+    closed = intervals[intervals.index >= len(base)]
+    return closed.assign(row=events["row"].to_numpy()[closed.index - len(base)])
+
+
+def record_removals(df):
+    """
+    Applies saved removals (a frame of removal_events rows) to the running
+    state. Returns the failure intervals they close, with the removal's
+    descriptive columns and its row label in 'row' (empty if none).
+    """
+    events = _events(df)
+    if events.empty:
+        return pd.DataFrame()
+
+    with _LOCK:
+        conn = _connect()
+        try:
+            closed = _apply(conn, events)
+            conn.commit()
+        finally:
+            conn.close()
+
+    if not closed.empty:
+        source = df.iloc[closed["row"].to_numpy()]
+        extra = [c for c in INTERVAL_ATTRIBUTES if c in df.columns and c not in closed.columns]
+        closed = closed.assign(**{c: source[c].to_numpy() for c in extra}, row=source.index)
+    return closed
+
+
+def record_removal(record):
+    """
+    Applies one saved removal to the running state. Returns the FH since the
+    unit's previous unscheduled removal on the same aircraft (None if this is
+    its first there, it is dated before that one, or it isn't a failure).
+    """
+    closed = record_removals(pd.DataFrame([record]))
+    return float(closed["fh_delta"].iloc[0]) if not closed.empty else None
+
+
+def rebuild_mtbf_state(df):
+    """
+    Recomputes the whole state from removal history (after corrections,
+    deletions or a bulk upload).
+    """
+    events = _events(df)
+    with _LOCK:
+        conn = _connect()
+        try:
+            conn.execute("DELETE FROM unit_state")
+            conn.execute("DELETE FROM rollup_state")
+            _apply(conn, events)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def get_mtbf_snapshot(level="component"):
+    """
+    Current MTBF per key for a rollup level ('component', 'ata', 'fleet'),
+    read straight from the running sums.
+    """
+    conn = _connect()
+    try:
+        df = pd.read_sql(
+            "SELECT key, n, sum_fh, sumsq_fh, sum_fc, sum_days FROM rollup_state WHERE level = ? AND n > 0",
+            conn, params=[level]
+        )
+    finally:
+        conn.close()
+
+    if df.empty:
+        return pd.DataFrame()
+
+    mean = df["sum_fh"] / df["n"]
+    var = (df["sumsq_fh"] - df["n"] * mean ** 2) / (df["n"] - 1)
+    return pd.DataFrame({
+        level: df["key"],
+        "mtbf_fh": mean.round(1),
+        "std_fh": np.sqrt(var.clip(lower=0)).where(df["n"] > 1).round(1),
+        "mtbf_fc": (df["sum_fc"] / df["n"]).round(1),
+        "mtbf_days": (df["sum_days"] / df["n"]).round(1),
+        "failure_count": df["n"],
+    }).sort_values("mtbf_fh", ascending=False)
+
+
+def get_unit_state(component_code, serial_number, aircraft_reg):
+    """
+    Returns the stored state for one unit on one aircraft as a dict, or None.
+    """
+    conn = _connect()
+    try:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(
+            "SELECT * FROM unit_state WHERE component_code = ? AND serial_number = ? AND aircraft_reg = ?",
+            (str(component_code), str(serial_number), str(aircraft_reg))
+        ).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
@@ -0,0 +1,130 @@
+# /utils/mtbf_trends.py
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset_version import cached_for_version, dataset_version
+from utils.mtbf_calculator import failure_intervals, unscheduled_mask
+
+TREND_WINDOWS = (3, 6, 12)  # months
+
+TREND_LEVELS = {
+    "component": "component_code",
+    "ata": "ata_chapter",
+}
+
+
+def _prefix_index(group_codes, days, values, max_day):
+    """
+    Sorts rows once on a composite key group * span + day, so each group's
+    events sit in their own contiguous, date-sorted block, and returns the
+    key with a cumulative sum of `values` for O(log n) window queries.
+    Days are shifted by one so slot 0 of every block stays empty; window
+    starts before the first event clamp to it instead of reaching into the
+    previous group.
+    """
+    span = int(max(days.max() if len(days) else 0, max_day)) + 2
+    order = np.lexsort((days, group_codes))
+    composite = group_codes[order].astype(np.int64) * span + days[order] + 1
+    csum = np.r_[0.0, np.cumsum(values[order])]
+    return composite, csum, span
+
+
+def _window_sums(index, n_groups, point_days, start_days):
+    """
+    Sum and count per group inside (start, point] for every (group, point)
+    pair, by binary search on the prefix index.
+    """
+    composite, csum, span = index
+    g = np.arange(n_groups, dtype=np.int64)[:, None] * span
+    hi = np.searchsorted(composite, g + (point_days + 1)[None, :], side="right")
+    lo = np.searchsorted(composite, g + np.maximum(start_days + 1, 0)[None, :], side="right")
+    return csum[hi] - csum[lo], hi - lo
+
+
+def build_mtbf_trends(df: pd.DataFrame, level: str = "component", windows=TREND_WINDOWS, version: str = None) -> pd.DataFrame:
+    """
+    Rolling MTBF (FH) and unscheduled removal rate per component or ATA
+    chapter, evaluated at every month end for each window length.
+
+    Returns a long table: key, month, window_months, mtbf_fh, failures
+    (intervals ending in the window), removals and removal_rate (unscheduled
+    removals per month).
+    """
+    key_col = TREND_LEVELS[level]
+    intervals = failure_intervals(df, version)
+    if df.empty or key_col not in df.columns or "removal_date" not in df.columns:
+        return pd.DataFrame()
+
+    events = df[unscheduled_mask(df)]
+    event_dates = pd.to_datetime(events["removal_date"], errors="coerce")
+    events = events[event_dates.notna()]
+    event_dates = event_dates[event_dates.notna()]
+    if events.empty:
+        return pd.DataFrame()
+
+    # One integer code per key shared by the event and interval tables
+    keys = pd.Index(pd.unique(events[key_col].astype(str)))
+    event_codes = keys.get_indexer(events[key_col].astype(str))
+
+    epoch = event_dates.min().to_period("M").to_timestamp()
+
+    # NaT must never reach this: it casts to a huge negative day that breaks
+    # the composite keys of every group, not only its own
+    def to_days(dates):
+        return ((dates - epoch) / pd.Timedelta(days=1)).to_numpy(dtype="float64").astype(np.int64)
+
+    # Month-end evaluation points: the first day of the following month (exclusive)
+    months = pd.period_range(event_dates.min(), event_dates.max(), freq="M")
+    month_starts = months.to_timestamp()
+    next_month = (months + 1).to_timestamp()
+    point_days = to_days(pd.Series(next_month)) - 1
+
+    if not intervals.empty and key_col in intervals.columns:
+        iv_codes = keys.get_indexer(intervals[key_col].astype(str))
+        valid = (iv_codes >= 0) & intervals["removal_date"].notna().to_numpy()
+        iv_codes = iv_codes[valid]
+        iv_days = to_days(intervals["removal_date"][valid])
+        iv_fh = intervals["fh_delta"].to_numpy(dtype="float64")[valid]
+    else:
+        iv_codes = np.array([], dtype=np.int64)
+        iv_days = np.array([], dtype=np.int64)
+        iv_fh = np.array([], dtype="float64")
+
+    ev_days = to_days(event_dates)
+
+    # Sorted once; each window below is only a pair of searchsorted calls
+    max_day = point_days.max()
+    interval_index = _prefix_index(iv_codes, iv_days, iv_fh, max_day)
+    event_index = _prefix_index(event_codes, ev_days, np.ones(len(ev_days)), max_day)
+
+    frames = []
+    for window in windows:
+        start_days = to_days(pd.Series((months + 1 - window).to_timestamp())) - 1
+
+        fh_sum, failures = _window_sums(interval_index, len(keys), point_days, start_days)
+        _, removals = _window_sums(event_index, len(keys), point_days, start_days)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mtbf = np.where(failures > 0, fh_sum / failures, np.nan)
+
+        frames.append(pd.DataFrame({
+            "key": np.repeat(keys.to_numpy(), len(months)),
+            "month": np.tile(month_starts.to_numpy(), len(keys)),
+            "window_months": window,
+            "mtbf_fh": mtbf.ravel().round(1),
+            "failures": failures.ravel(),
+            "removals": removals.ravel(),
+            "removal_rate": (removals.ravel() / window).round(2),
+        }))
+
+    trends = pd.concat(frames, ignore_index=True)
+    return trends.rename(columns={"key": key_col})
+
+
+def mtbf_trends(df: pd.DataFrame, level: str = "component", version: str = None) -> pd.DataFrame:
+    """
+    Cached build_mtbf_trends, built once per dataset version and level.
+    """
+    version = version or dataset_version(df)
+    return cached_for_version(f"mtbf_trends:{level}", version, lambda: build_mtbf_trends(df, level, version=version))
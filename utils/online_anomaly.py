@@ -0,0 +1,173 @@
+# /utils/online_anomaly.py
+
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from utils.anomaly_engine import ANOMALY_MIN_SAMPLES, ANOMALY_THRESHOLD, robust_z
+from utils.mtbf_calculator import build_failure_intervals, component_key
+
+# Entry-time premature-failure detection. Every saved unscheduled removal
+# that closes a failure interval (see mtbf_state.record_removal) is added to
+# its component's interval store and scored with the batch engine's
+# statistic (anomaly_engine: modified z-score against the component's
+# median/MAD, same threshold and minimum sample count), so an entry alert
+# and the Anomalies page agree. Intervals are kept per component
+# (mtbf_calculator.component_key) in an index ordered by FH, so a save reads
+# only its own component's intervals and never rescans the history.
+ALERTS_PATH = "data/anomaly_alerts.sqlite"
+
+_LOCK = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS component_intervals (
+    component_key TEXT NOT NULL,
+    fh_delta REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_component_intervals ON component_intervals (component_key, fh_delta);
+CREATE TABLE IF NOT EXISTS anomaly_alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    component_code TEXT,
+    component_name TEXT,
+    serial_number TEXT,
+    aircraft_reg TEXT,
+    ata_chapter TEXT,
+    removal_date TEXT,
+    fh_delta REAL,
+    typical_fh REAL,
+    z_score REAL
+);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(ALERTS_PATH)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _text(value):
+    return "" if value is None or (not isinstance(value, str) and pd.isna(value)) else str(value)
+
+
+def score_intervals(intervals):
+    """
+    Adds failure intervals (rows with fh_delta and the removal's columns,
+    such as those returned by mtbf_state.record_removals) to their
+    components' stores in order and scores each against its component's
+    intervals so far, itself included. Returns the list of alert dicts
+    raised.
+    """
+    if intervals.empty or "fh_delta" not in intervals.columns:
+        return []
+
+    fh = pd.to_numeric(intervals["fh_delta"], errors="coerce")
+    keys = component_key(intervals)
+    scored = intervals[(fh > 0).to_numpy() & keys.notna().to_numpy()]
+    alerts = []
+
+    with _LOCK:
+        conn = _connect()
+        try:
+            for (_, record), key, fh_delta in zip(scored.iterrows(), keys[scored.index], fh[scored.index]):
+                conn.execute(
+                    "INSERT INTO component_intervals (component_key, fh_delta) VALUES (?, ?)", (key, float(fh_delta))
+                )
+                sample = [r[0] for r in conn.execute(
+                    "SELECT fh_delta FROM component_intervals WHERE component_key = ? ORDER BY fh_delta", (key,)
+                )]
+                if len(sample) < ANOMALY_MIN_SAMPLES:
+                    continue
+
+                median, _, z = robust_z(fh_delta, sample)
+                if not z < ANOMALY_THRESHOLD:
+                    continue
+                alert = {
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    "component_code": _text(record.get("component_code")),
+                    "component_name": _text(record.get("component_name")),
+                    "serial_number": _text(record.get("serial_number")),
+                    "aircraft_reg": _text(record.get("aircraft_reg")),
+                    "ata_chapter": _text(record.get("ata_chapter")),
+                    "removal_date": _text(record.get("removal_date"))[:10],
+                    "fh_delta": float(fh_delta),
+                    "typical_fh": round(median, 1),
+                    "z_score": round(z, 2),
+                }
+                conn.execute(
+                    f"INSERT INTO anomaly_alerts ({', '.join(alert)}) VALUES ({', '.join('?' * len(alert))})",
+                    list(alert.values())
+                )
+                alerts.append(alert)
+            conn.commit()
+        finally:
+            conn.close()
+
+    return alerts
+
+
+def score_removal(record, fh_delta):
+    """
+    Scores one interval (FH since the unit's previous unscheduled removal,
+    as returned by record_removal) and adds it to the component's store.
+    Returns the alert dict when the interval is flagged, otherwise None.
+    """
+    if fh_delta is None or fh_delta <= 0:
+        return None
+    alerts = score_intervals(pd.DataFrame([{**record, "fh_delta": fh_delta}]))
+    return alerts[0] if alerts else None
+
+
+def alert_message(alert):
+    """
+    One-line description of an alert for the entry pages.
+    """
+    name = alert["component_name"] or alert["component_code"]
+    return (
+        f"🚨 Possible premature failure: {name} S/N {alert['serial_number']} on {alert['aircraft_reg']} flew "
+        f"{alert['fh_delta']:,.0f} FH since its last unscheduled removal; the fleet median for this component "
+        f"is {alert['typical_fh']:,.0f} FH (robust z = {alert['z_score']})."
+    )
+
+
+def rebuild_online_stats(df):
+    """
+    Recomputes the per-component interval stores from removal history (after
+    corrections, deletions or a bulk upload) and clears the alerts, which
+    may refer to removals that no longer exist.
+    """
+    intervals = build_failure_intervals(df)
+    stored = pd.DataFrame(columns=["component_key", "fh_delta"])
+    if not intervals.empty:
+        stored = pd.DataFrame({"component_key": component_key(intervals), "fh_delta": intervals["fh_delta"]})
+        stored = stored[stored["component_key"].notna().to_numpy()]
+
+    with _LOCK:
+        conn = _connect()
+        try:
+            conn.execute("DELETE FROM component_intervals")
+            conn.execute("DELETE FROM anomaly_alerts")
+            if not stored.empty:
+                conn.executemany(
+                    "INSERT INTO component_intervals (component_key, fh_delta) VALUES (?, ?)",
+                    stored.astype({"component_key": object}).itertuples(index=False, name=None)
+                )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def get_recent_alerts(limit=50):
+    """
+    Most recent entry-time alerts, newest first.
+    """
+    conn = _connect()
+    try:
+        return pd.read_sql(
+            "SELECT * FROM anomaly_alerts ORDER BY id DESC LIMIT ?", conn, params=[limit]
+        )
+    finally:
+        conn.close()
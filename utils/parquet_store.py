@@ -0,0 +1,312 @@
+# /utils/parquet_store.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from io import BytesIO
+
+import pandas as pd
+import streamlit as st
+
+from utils.schema import apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # optional: without pyarrow the loaders read the CSV/backend
+    pa = None
+    ds = None
+
+try:
+    import fcntl  # POSIX; without it only threads of this process are serialised
+except ImportError:
+    fcntl = None
+
+# Optional columnar copy of removal_events: Parquet files partitioned as
+# year=YYYY/aircraft_reg=XXX, rows sorted by date inside each file. Reads
+# with a date range or aircraft list open only the matching partition
+# directories, and the date filter is also checked against row-group
+# statistics, so a quarter of a ten-year history reads a small fraction of
+# the bytes; a column list reads only those column chunks. The store is a
+# read copy of the configured backend. For the CSV file, which is only ever
+# appended to between rewrites, the rows added since the last refresh are
+# written as new files into their partitions; the store is rebuilt when the
+# file was rewritten (its header or the bytes before the stored offset
+# changed), every MAX_APPENDS appends to merge the small files, and for the
+# other backends whenever their stamp changes. Writers hold an exclusive
+# lock on "<store>.lock" and reads a shared one, so concurrent sessions
+# never change the directory under each other.
+# Enable with MAINTWATCH_PARQUET=1 or in secrets.toml:
+#   [storage]
+#   parquet = true
+PARQUET_DIR = "data/removal_events_parquet"
+STAMP_FILE = "_source.json"
+
+ROW_GROUP_SIZE = 50_000
+
+# Bytes before the stored CSV offset that must be unchanged for an append
+CHECK_BYTES = 65_536
+MAX_APPENDS = 200
+
+_LOCK = threading.Lock()
+
+
+def parquet_available():
+    return ds is not None
+
+
+def parquet_enabled():
+    if not parquet_available():
+        return False
+    flag = os.environ.get("MAINTWATCH_PARQUET")
+    if flag is None:
+        try:
+            flag = st.secrets.get("storage", {}).get("parquet")
+        except Exception:
+            flag = None
+    return str(flag).strip().lower() in ("1", "true", "yes", "on")
+
+
+@contextmanager
+def _store_lock(exclusive):
+    if fcntl is None:
+        with _LOCK:
+            yield
+        return
+    os.makedirs(os.path.dirname(PARQUET_DIR) or ".", exist_ok=True)
+    with open(PARQUET_DIR + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _partitioning():
+    # Explicit types: a store whose year partitions are all null (no parsed
+    # dates) couldn't have them inferred
+    return ds.partitioning(pa.schema([("year", pa.int64()), ("aircraft_reg", pa.string())]), flavor="hive")
+
+
+def _stored_meta():
+    try:
+        with open(os.path.join(PARQUET_DIR, STAMP_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_meta(directory, meta):
+    tmp_path = os.path.join(directory, f"{STAMP_FILE}.{uuid.uuid4().hex[:8]}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(directory, STAMP_FILE))
+
+
+def stored_stamp():
+    """
+    Source stamp the store was built from (None if there is no store).
+    """
+    return _stored_meta().get("source")
+
+
+def refresh_parquet_store(source, read, csv_path=None):
+    """
+    Brings the store up to date with `source`, unless it already is. With
+    `csv_path` the rows are read from that CSV file, and only the rows
+    appended since the last refresh if it wasn't rewritten; otherwise the
+    store is rebuilt from read(). Returns False when there is nothing to
+    store (no rows, or no removal_date column).
+    """
+    if stored_stamp() == source:
+        return True
+    with _store_lock(exclusive=True):
+        meta = _stored_meta()
+        if meta.get("source") == source:
+            return True  # refreshed by another session while we waited
+        if csv_path is not None:
+            if _append_csv_tail(csv_path, meta, source):
+                return True
+            df, tail = _read_csv(csv_path)
+        else:
+            df, tail = read(), None
+        if df.empty or "removal_date" not in df.columns:
+            return False
+        _write(df, source, tail)
+    return True
+
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _read_csv(path):
+    """
+    The CSV file's complete rows and the position after them (a row still
+    being written is left for the next refresh).
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return pd.DataFrame(), None
+    end = data.rfind(b"\n") + 1
+    try:
+        df = pd.read_csv(BytesIO(data[:end]))
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame(), None
+    header = data[:data.find(b"\n") + 1]
+    tail = {
+        "offset": end,
+        "header": header.decode("utf-8", "replace"),
+        "check": _digest(data[max(0, end - CHECK_BYTES):end]),
+    }
+    return df, tail
+
+
+def _append_csv_tail(path, meta, source):
+    """
+    Writes the rows appended to the CSV file since the store was last
+    refreshed. Returns False if the store has to be rebuilt instead.
+    """
+    tail = meta.get("tail")
+    if not tail or meta.get("appends", 0) >= MAX_APPENDS:
+        return False
+    offset = tail["offset"]
+    try:
+        with open(path, "rb") as f:
+            header = f.readline()
+            size = f.seek(0, os.SEEK_END)
+            if header.decode("utf-8", "replace") != tail["header"] or size < offset:
+                return False
+            f.seek(max(0, offset - CHECK_BYTES))
+            before = f.read(offset - max(0, offset - CHECK_BYTES))
+            if _digest(before) != tail["check"]:
+                return False
+            added = f.read(size - offset)
+    except FileNotFoundError:
+        return False
+
+    end = added.rfind(b"\n") + 1
+    meta = dict(meta, source=source, tail=dict(
+        tail, offset=offset + end, check=_digest((before + added[:end])[-CHECK_BYTES:])
+    ))
+    if end:
+        df = pd.read_csv(BytesIO(header + added[:end]))
+        if not _append(df):
+            return False
+        meta["rows"] = meta.get("rows", 0) + len(df)
+        meta["appends"] = meta.get("appends", 0) + 1
+    _write_meta(PARQUET_DIR, meta)
+    return True
+
+
+def _table(df):
+    typed = apply_schema(df, "removal_events")
+    for col in typed.columns:
+        # Arrow dictionary columns would make every file carry its own dictionary
+        if isinstance(typed[col].dtype, pd.CategoricalDtype):
+            typed[col] = typed[col].astype("string")
+    typed["removal_date"] = pd.to_datetime(typed["removal_date"], errors="coerce")
+    typed = typed.assign(
+        year=typed["removal_date"].dt.year.astype("Int64"),
+    ).sort_values(["aircraft_reg", "removal_date"], kind="stable")
+    return pa.Table.from_pandas(typed, preserve_index=False)
+
+
+def _write_files(table, directory, token):
+    ds.write_dataset(
+        table,
+        directory,
+        format="parquet",
+        partitioning=_partitioning(),
+        basename_template=f"part-{token}-{{i}}.parquet",
+        max_rows_per_group=ROW_GROUP_SIZE,
+        min_rows_per_group=min(ROW_GROUP_SIZE, 1024),
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def _write(df, source, tail=None):
+    table = _table(df)
+    tmp_dir = f"{PARQUET_DIR}.tmp-{uuid.uuid4().hex[:8]}"
+    _write_files(table, tmp_dir, "0")
+    _write_meta(tmp_dir, {"source": source, "rows": table.num_rows, "tail": tail, "appends": 0})
+
+    old_dir = None
+    if os.path.exists(PARQUET_DIR):
+        old_dir = f"{PARQUET_DIR}.old-{uuid.uuid4().hex[:8]}"
+        os.replace(PARQUET_DIR, old_dir)
+    os.replace(tmp_dir, PARQUET_DIR)
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _append(df):
+    """
+    Adds the rows of `df` to the store as new files. Returns False if they
+    don't fit the stored schema.
+    """
+    schema = _dataset().schema
+    try:
+        table = _table(df).select(schema.names).cast(schema)
+    except (KeyError, ValueError, pa.ArrowException):
+        return False
+
+    token = uuid.uuid4().hex[:8]
+    tmp_dir = f"{PARQUET_DIR}.tmp-{token}"
+    _write_files(table, tmp_dir, token)
+    # Until the new stamp is written the store counts as out of date, so
+    # files moved in before an interruption are never counted twice
+    _write_meta(PARQUET_DIR, {"source": None})
+    for root, _, files in os.walk(tmp_dir):
+        target = os.path.join(PARQUET_DIR, os.path.relpath(root, tmp_dir))
+        os.makedirs(target, exist_ok=True)
+        for name in files:
+            os.replace(os.path.join(root, name), os.path.join(target, name))
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return True
+
+
+def read_parquet_store(start=None, end=None, aircraft=None, columns=None):
+    """
+    Removal events from the store. `start`/`end` are inclusive dates,
+    `aircraft` a list of registrations and `columns` the columns to
+    return (None = all); each filter prunes partitions before any read.
+    """
+    with _store_lock(exclusive=False):
+        return _read(start, end, aircraft, columns)
+
+
+def _dataset():
+    return ds.dataset(PARQUET_DIR, format="parquet", partitioning=_partitioning(), ignore_prefixes=[".", "_"])
+
+
+def _read(start, end, aircraft, columns):
+    dataset = _dataset()
+
+    date_type = dataset.schema.field("removal_date").type
+    conditions = []
+    if start is not None:
+        lower = pd.Timestamp(start)
+        conditions += [ds.field("year") >= lower.year,
+                       ds.field("removal_date") >= pa.scalar(lower.to_pydatetime(), date_type)]
+    if end is not None:
+        upper = pd.Timestamp(end) + pd.Timedelta(days=1)
+        conditions += [ds.field("year") <= pd.Timestamp(end).year,
+                       ds.field("removal_date") < pa.scalar(upper.to_pydatetime(), date_type)]
+    if aircraft is not None:
+        conditions.append(ds.field("aircraft_reg").isin([str(a) for a in aircraft]))
+
+    expr = None
+    for condition in conditions:
+        expr = condition if expr is None else expr & condition
+
+    names = dataset.schema.names
+    if columns is None:
+        columns = [c for c in names if c != "year"]
+    return dataset.to_table(columns=[c for c in columns if c in names], filter=expr).to_pandas()
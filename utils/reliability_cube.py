@@ -0,0 +1,141 @@
+# /utils/reliability_cube.py
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset_version import cached_for_version, dataset_version
+from utils.mtbf_calculator import failure_intervals, unscheduled_mask
+
+# Removal counts and failure-interval sums materialized at
+# (aircraft, ATA, component, month) grain, rebuilt once per dataset version.
+# Queries add up whole months from the cube and only touch raw rows for the
+# partial months at either end of the date range, so results are exact for
+# any day-level period while the cost follows the cube size.
+CUBE_KEYS = ["aircraft_reg", "ata_chapter", "component_name"]
+
+
+def _month_start(ts):
+    return pd.Timestamp(ts).to_period("M").to_timestamp()
+
+
+class _CubeLayer:
+    """
+    One event source: its rows sorted by date (for the edge months) and the
+    month-grain cells summed from them.
+    """
+
+    def __init__(self, rows, measures):
+        self.measures = measures
+        rows = rows.dropna(subset=["removal_date"]).sort_values("removal_date", kind="stable")
+        self.rows = rows.reset_index(drop=True)
+        self.dates = self.rows["removal_date"].to_numpy(dtype="datetime64[ns]")
+
+        month = self.rows["removal_date"].dt.to_period("M").dt.to_timestamp()
+        self.cells = (
+            self.rows.assign(month=month)
+            .groupby(CUBE_KEYS + ["month"], observed=True, dropna=False)[measures]
+            .sum()
+            .reset_index()
+        )
+
+    def _rows_between(self, lower, upper):
+        lo = np.searchsorted(self.dates, pd.Timestamp(lower).to_datetime64(), side="left")
+        hi = np.searchsorted(self.dates, pd.Timestamp(upper).to_datetime64(), side="left")
+        return self.rows.iloc[lo:hi]
+
+    def parts(self, start=None, end=None):
+        """
+        Frames (cube cells and raw edge rows) that together cover [start, end].
+        """
+        if start is None or end is None:
+            return [self.cells]
+
+        lower = pd.Timestamp(start)
+        upper = pd.Timestamp(end) + pd.Timedelta(days=1)
+        first_full = _month_start(lower) if lower == _month_start(lower) else _month_start(lower) + pd.offsets.MonthBegin(1)
+        last_full_end = _month_start(upper)
+
+        if first_full >= last_full_end:
+            return [self._rows_between(lower, upper)]
+
+        months = self.cells["month"]
+        return [
+            self._rows_between(lower, first_full),
+            self.cells[(months >= first_full) & (months < last_full_end)],
+            self._rows_between(last_full_end, upper),
+        ]
+
+
+class ReliabilityCube:
+    """
+    Removal layer (removals, unscheduled) and interval layer (failures,
+    interval_fh, by the later removal of each pair) over the same keys.
+    """
+
+    def __init__(self, df, intervals):
+        rows = self._keys(df).assign(
+            removal_date=pd.to_datetime(df["removal_date"], errors="coerce").to_numpy(),
+            removals=1,
+            unscheduled=unscheduled_mask(df).astype(int).to_numpy(),
+        )
+        self.removals = _CubeLayer(rows, ["removals", "unscheduled"])
+
+        if intervals.empty:
+            iv_rows = pd.DataFrame(columns=CUBE_KEYS + ["removal_date", "failures", "interval_fh"])
+            iv_rows["removal_date"] = pd.to_datetime(iv_rows["removal_date"])
+        else:
+            iv_rows = self._keys(intervals).assign(
+                removal_date=intervals["removal_date"].to_numpy(),
+                failures=1,
+                interval_fh=intervals["fh_delta"].to_numpy(dtype="float64"),
+            )
+        self.intervals = _CubeLayer(iv_rows, ["failures", "interval_fh"])
+
+    @staticmethod
+    def _keys(frame):
+        # Categorical keys keep the grouping and the isin filters cheap
+        return pd.DataFrame({
+            key: frame[key].astype("category").reset_index(drop=True) if key in frame.columns else pd.NA
+            for key in CUBE_KEYS
+        })
+
+    def query(self, by, aircraft=None, ata=None, start=None, end=None) -> pd.DataFrame:
+        """
+        Measures summed over `by` (a list of CUBE_KEYS, may be empty) for the
+        selected aircraft / ATA chapters and inclusive date range. Returns
+        removals, unscheduled, failures, interval_fh and mtbf_fh.
+        """
+        results = []
+        for layer in (self.removals, self.intervals):
+            frames = []
+            for part in layer.parts(start, end):
+                mask = pd.Series(True, index=part.index)
+                if aircraft is not None:
+                    mask &= part["aircraft_reg"].isin([str(a) for a in aircraft])
+                if ata is not None:
+                    mask &= part["ata_chapter"].isin([str(a) for a in ata])
+                frames.append(part.loc[mask, by + layer.measures])
+            selected = pd.concat(frames, ignore_index=True)
+            if by:
+                results.append(selected.groupby(by, observed=True, dropna=False)[layer.measures].sum())
+            else:
+                results.append(selected[layer.measures].sum().to_frame().T)
+
+        table = results[0].join(results[1], how="outer") if by else pd.concat(results, axis=1)
+        table = table.fillna(0)
+        for col in ["removals", "unscheduled", "failures"]:
+            table[col] = table[col].astype(int)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table["mtbf_fh"] = (table["interval_fh"] / table["failures"]).where(table["failures"] > 0).round(1)
+        return table.reset_index() if by else table.reset_index(drop=True)
+
+
+def reliability_cube(df: pd.DataFrame, version: str = None) -> ReliabilityCube:
+    """
+    ReliabilityCube for `df`, built once per dataset version.
+    """
+    version = version or dataset_version(df)
+    return cached_for_version(
+        "reliability_cube", version,
+        lambda: ReliabilityCube(df, failure_intervals(df, version))
+    )
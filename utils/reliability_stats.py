@@ -0,0 +1,226 @@
+# /utils/reliability_stats.py
+
+from math import lgamma
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset_version import cached_for_version, dataset_version
+from utils.mtbf_calculator import INTERVAL_KEYS, failure_intervals, unscheduled_mask
+
+# Reliability statistics for every component in one vectorized pass:
+# chi-square confidence bounds on MTBF and a right-censored Weibull fit.
+# Units still installed contribute censored time (FH since their last
+# removal, up to the aircraft's latest recorded FH) rather than being dropped.
+DEFAULT_CONFIDENCE = 0.90
+
+# Chi-square quantiles start from Wilson-Hilferty and are refined with Newton
+# steps on the exact CDF up to this many degrees of freedom; above it the
+# approximation alone is accurate to well under 0.1 %.
+EXACT_CHI2_MAX_DOF = 200
+
+WEIBULL_ITERATIONS = 50
+WEIBULL_BETA_RANGE = (0.05, 20.0)
+
+
+def _chi2_cdf_even(x, k):
+    """
+    CDF of chi-square with 2k degrees of freedom (integer k >= 1) via the
+    Poisson sum 1 - sum_{i<k} e^(-x/2) (x/2)^i / i!, vectorized over x and k.
+    """
+    half = x / 2.0
+    term = np.exp(-half)
+    total = term.copy()
+    for i in range(1, int(k.max()) if len(k) else 1):
+        term = term * half / i
+        total += np.where(i < k, term, 0.0)
+    return 1.0 - total
+
+
+def chi2_quantile(p, dof):
+    """
+    Quantile p of chi-square for an array of even degrees of freedom.
+    NumPy + statistics only (no SciPy dependency).
+    """
+    dof = np.asarray(dof, dtype="float64")
+    z = NormalDist().inv_cdf(p)
+    h = 2.0 / (9.0 * dof)
+    x = dof * np.clip(1.0 - h + z * np.sqrt(h), 1e-3, None) ** 3
+
+    small = dof <= EXACT_CHI2_MAX_DOF
+    if small.any():
+        k = np.round(dof[small] / 2.0)
+        xs = x[small]
+        log_norm = k * np.log(2.0) + np.array([lgamma(v) for v in k])
+        for _ in range(8):
+            pdf = np.exp((k - 1) * np.log(xs) - xs / 2.0 - log_norm)
+            xs = np.clip(xs - (_chi2_cdf_even(xs, k) - p) / pdf, 1e-9, None)
+        x[small] = xs
+    return x
+
+
+def mtbf_bounds(exposure, failures, confidence=DEFAULT_CONFIDENCE):
+    """
+    Two-sided time-terminated confidence bounds on MTBF for arrays of total
+    exposure T and failure counts r:
+        lower = 2T / chi2(1 - a/2; 2r + 2),  upper = 2T / chi2(a/2; 2r)
+    The upper bound is undefined (inf) when r = 0.
+    """
+    exposure = np.asarray(exposure, dtype="float64")
+    failures = np.asarray(failures, dtype="float64")
+    alpha = 1.0 - confidence
+
+    lower = 2.0 * exposure / chi2_quantile(1.0 - alpha / 2.0, 2.0 * failures + 2.0)
+
+    upper = np.full(len(failures), np.inf)
+    has_failures = failures > 0
+    if has_failures.any():
+        upper[has_failures] = 2.0 * exposure[has_failures] / chi2_quantile(alpha / 2.0, 2.0 * failures[has_failures])
+    return lower, upper
+
+
+def fit_weibull(codes, times, observed, n_groups):
+    """
+    Right-censored Weibull MLE for many groups at once. `codes` assigns each
+    time to a group, `observed` is 1 for a failure and 0 for a censored time.
+    Newton iterations on the shape run for all groups together, with every
+    per-group sum an np.bincount. Times that aren't positive are ignored
+    (their log is undefined). Returns (beta, eta); NaN where a group has
+    fewer than two failures or no spread in its times.
+    """
+    times = np.asarray(times, dtype="float64")
+    positive = times > 0
+    codes = np.asarray(codes, dtype=np.int64)[positive]
+    observed = np.asarray(observed, dtype="float64")[positive]
+    times = times[positive]
+
+    def group_sum(weights):
+        return np.bincount(codes, weights=weights, minlength=n_groups)
+
+    # Times are scaled by each group's maximum so t^beta stays in [0, 1]
+    scale = np.zeros(n_groups)
+    np.maximum.at(scale, codes, times)
+    scale[scale <= 0] = 1.0
+    log_t = np.log(times / scale[codes])
+
+    failures = group_sum(observed)
+    mean_log_failure = group_sum(observed * log_t) / np.where(failures > 0, failures, 1.0)
+
+    beta = np.ones(n_groups)
+    low, high = WEIBULL_BETA_RANGE
+    for _ in range(WEIBULL_ITERATIONS):
+        t_beta = np.exp(beta[codes] * log_t)
+        b = group_sum(t_beta)
+        a = group_sum(t_beta * log_t)
+        c = group_sum(t_beta * log_t * log_t)
+
+        # Profile score in beta and its derivative
+        score = a / b - 1.0 / beta - mean_log_failure
+        slope = (c * b - a * a) / (b * b) + 1.0 / (beta * beta)
+        step = score / slope
+        beta = np.clip(beta - step, low, high)
+        if np.all(np.abs(step) < 1e-6 * beta):
+            break
+
+    t_beta = np.exp(beta[codes] * log_t)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eta = scale * (group_sum(t_beta) / failures) ** (1.0 / beta)
+
+    spread = np.zeros(n_groups)
+    np.maximum.at(spread, codes, np.abs(log_t))
+    valid = (failures >= 2) & (spread > 0) & (beta > low) & (beta < high)
+    return np.where(valid, beta, np.nan), np.where(valid, eta, np.nan)
+
+
+def censored_times(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per unit (component, serial, aircraft) with the FH flown since
+    its last unscheduled removal, measured up to the aircraft's highest
+    recorded FH in the dataset. Units with no time since then are dropped.
+    """
+    required = INTERVAL_KEYS + ["aircraft_fh"]
+    if df.empty or any(c not in df.columns for c in required):
+        return pd.DataFrame()
+
+    fh = pd.to_numeric(df["aircraft_fh"], errors="coerce")
+    current_fh = fh.groupby(df["aircraft_reg"].astype(str)).max()
+
+    events = df.loc[unscheduled_mask(df), INTERVAL_KEYS].assign(aircraft_fh=fh)
+    events = events.dropna(subset=["aircraft_fh"])
+    if events.empty:
+        return pd.DataFrame()
+
+    last = events.groupby(INTERVAL_KEYS, observed=True).agg(last_fh=("aircraft_fh", "max")).reset_index()
+    last["censored_fh"] = last["aircraft_reg"].astype(str).map(current_fh).to_numpy(dtype="float64") - last["last_fh"]
+    return last[last["censored_fh"] > 0].reset_index(drop=True)
+
+
+def build_reliability_table(df: pd.DataFrame, confidence: float = DEFAULT_CONFIDENCE, version: str = None) -> pd.DataFrame:
+    """
+    Per component: failures, total exposure FH (failure intervals plus
+    censored time of units still installed), MTBF = exposure / failures with
+    chi-square bounds, and Weibull shape (beta) / scale (eta) in FH.
+    """
+    intervals = failure_intervals(df, version)
+    censored = censored_times(df)
+    if intervals.empty and censored.empty:
+        return pd.DataFrame()
+
+    iv_codes = intervals["component_code"].astype(str) if not intervals.empty else pd.Series(dtype=str)
+    cs_codes = censored["component_code"].astype(str) if not censored.empty else pd.Series(dtype=str)
+    keys = pd.Index(pd.unique(pd.concat([iv_codes, cs_codes], ignore_index=True)))
+
+    codes = np.r_[keys.get_indexer(iv_codes), keys.get_indexer(cs_codes)]
+    times = np.r_[
+        intervals["fh_delta"].to_numpy(dtype="float64") if not intervals.empty else [],
+        censored["censored_fh"].to_numpy(dtype="float64") if not censored.empty else [],
+    ]
+    observed = np.r_[np.ones(len(iv_codes)), np.zeros(len(cs_codes))]
+
+    # Zero or negative times would reduce exposure and break the Weibull fit
+    positive = times > 0
+    codes, times, observed = codes[positive], times[positive], observed[positive]
+
+    n = len(keys)
+    failures = np.bincount(codes, weights=observed, minlength=n)
+    exposure = np.bincount(codes, weights=times, minlength=n)
+    lower, upper = mtbf_bounds(exposure, failures, confidence)
+    beta, eta = fit_weibull(codes, times, observed, n)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mtbf = np.where(failures > 0, exposure / failures, np.nan)
+
+    table = pd.DataFrame({
+        "component_code": keys,
+        "failures": failures.astype(int),
+        "censored_units": np.bincount(codes, weights=1.0 - observed, minlength=n).astype(int),
+        "exposure_fh": exposure.round(1),
+        "mtbf_fh": mtbf.round(1),
+        "mtbf_lower_fh": lower.round(1),
+        "mtbf_upper_fh": np.where(np.isinf(upper), np.nan, upper).round(1),
+        "weibull_beta": beta.round(2),
+        "weibull_eta_fh": eta.round(1),
+    })
+
+    if "component_name" in df.columns:
+        names = (
+            df.assign(component_code=df["component_code"].astype(str))
+            .drop_duplicates("component_code")
+            .set_index("component_code")["component_name"]
+        )
+        table.insert(1, "component_name", table["component_code"].map(names))
+
+    return table.sort_values(["failures", "mtbf_fh"], ascending=[False, False]).reset_index(drop=True)
+
+
+def reliability_table(df: pd.DataFrame, confidence: float = DEFAULT_CONFIDENCE, version: str = None) -> pd.DataFrame:
+    """
+    Cached build_reliability_table, built once per dataset version and
+    confidence level.
+    """
+    version = version or dataset_version(df)
+    return cached_for_version(
+        f"reliability_table:{confidence}", version,
+        lambda: build_reliability_table(df, confidence, version)
+    )
@@ -1,18 +1,65 @@
 # /utils/removal_events_loader.py
 
 import pandas as pd
-import os
+
+from utils.dashboard_dataset import date_bounds
+from utils.parquet_store import parquet_enabled, read_parquet_store, refresh_parquet_store
+from utils.storage import get_storage_backend
 
 CSV_PATH = "data/removal_events.csv"
 
 
-def load_removal_events():
-    if not os.path.isfile(CSV_PATH):
-        return pd.DataFrame()
+def _source_stamp(backend):
+    """
+    Identifies the current version of the backend's removal_events data,
+    or None when the backend can't tell cheaply (Google Sheets).
+    """
+    stamp = backend.stamp("removal_events")
+    return None if stamp is None else [backend.name, stamp]
+
+
+def refresh_removal_events_store(backend=None):
+    """
+    Brings the Parquet store up to date with the backend's removal_events
+    (only the appended rows, for the CSV file). Returns False when there is
+    no store to read: it is disabled, the backend can't tell when its data
+    changed (Google Sheets) or there are no rows.
+    """
+    backend = backend or get_storage_backend()
+    if not parquet_enabled():
+        return False
+    stamp = _source_stamp(backend)
+    if stamp is None:
+        return False
+    csv_path = backend.path("removal_events") if backend.name == "csv" else None
+    return refresh_parquet_store(stamp, lambda: backend.read_table("removal_events"), csv_path)
+
 
-    df = pd.read_csv(CSV_PATH)
+def load_removal_events(start=None, end=None, aircraft=None, columns=None):
+    """
+    Removal events, optionally limited to a date range (inclusive dates),
+    a list of aircraft and a list of columns. With the Parquet store enabled
+    (utils/parquet_store) only the matching partitions and columns are read;
+    the store is refreshed first if the backend's data changed since.
+    """
+    backend = get_storage_backend()
+
+    if refresh_removal_events_store(backend):
+        return read_parquet_store(start, end, aircraft, columns)
+
+    df = backend.read_table("removal_events")
+    if df.empty:
+        return pd.DataFrame()
 
     if "removal_date" in df.columns:
         df["removal_date"] = pd.to_datetime(df["removal_date"], errors="coerce")
 
+    if "removal_date" in df.columns and (start is not None or end is not None):
+        lower, upper = date_bounds(start or df["removal_date"].min(), end or df["removal_date"].max())
+        df = df[(df["removal_date"] >= lower) & (df["removal_date"] < upper)]
+    if aircraft is not None and "aircraft_reg" in df.columns:
+        df = df[df["aircraft_reg"].astype(str).isin([str(a) for a in aircraft])]
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+
     return df
@@ -0,0 +1,65 @@
+# /utils/removal_hooks.py
+
+import logging
+
+from utils.counter_index import record_counter_rows, record_counters
+from utils.mtbf_state import record_removal, record_removals
+from utils.online_anomaly import score_intervals, score_removal
+
+# Local stores kept current as removals are saved, whichever backend saved
+# them: running MTBF totals, entry-time anomaly statistics and the FH/FC
+# counter index. A failure here is logged and doesn't undo the save; Rebuild
+# MTBF State (Admin Tools) recomputes them from history.
+logger = logging.getLogger(__name__)
+
+
+def after_removal_saved(record):
+    """
+    Applies one saved removal to the side stores. Returns the entry-time
+    anomaly alert (dict) when the interval it closes is flagged, else None.
+    """
+    # Running MTBF totals (only this unit is recomputed)
+    fh_delta = None
+    try:
+        fh_delta = record_removal(record)
+    except Exception as e:
+        logger.warning("MTBF state not updated: %s", e)
+
+    # Score the new interval against the component's intervals
+    alert = None
+    try:
+        alert = score_removal(record, fh_delta)
+    except Exception as e:
+        logger.warning("Anomaly score not recorded: %s", e)
+
+    # Later entries for this aircraft are checked against these counters
+    try:
+        record_counters(record)
+    except Exception as e:
+        logger.warning("Counter index not updated: %s", e)
+
+    return alert
+
+
+def after_removals_saved(df):
+    """
+    Applies a frame of saved removals (bulk upload) to the side stores.
+    """
+    closed = None
+    try:
+        closed = record_removals(df)
+    except Exception as e:
+        logger.warning("MTBF state not updated: %s", e)
+
+    # Score the intervals the upload closed against their components
+    try:
+        if closed is not None:
+            score_intervals(closed)
+    except Exception as e:
+        logger.warning("Anomaly scores not recorded: %s", e)
+
+    # Later entries for these aircraft are checked against their counters
+    try:
+        record_counter_rows(df)
+    except Exception as e:
+        logger.warning("Counter index not updated: %s", e)
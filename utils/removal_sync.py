@@ -0,0 +1,322 @@
+# /utils/removal_sync.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from utils.counter_index import refresh_counter_index
+from utils.gsheet_loader import connect_to_sheet
+from utils.schema import frame_from_values
+
+MIRROR_PATH = "data/removal_events_mirror.sqlite"
+WORKSHEET_NAME = "removal_events"
+
+# Every sync hashes the whole synced prefix in fixed-size chunks of rows and
+# compares them with the chunk hashes stored at the last sync, so an edit to
+# any earlier row is found. Only changed chunks and new rows are written to
+# the mirror; a full reload runs when the header changed or rows were removed.
+CHUNK_ROWS = 500
+
+# Column names the mirror adds to every row
+_RESERVED = ("_row", "_hash")
+
+_SYNC_LOCK = threading.Lock()
+
+# Warning about the last sync in this process. Pages show it after loading,
+# so every session served a shared (single-flight) sync sees it, not just
+# the one that ran the sync.
+_LAST_SYNC = {"notice": None}
+
+
+def _row_hash(values):
+    """
+    Stable hash of one sheet row. Trailing blanks are dropped because the
+    Sheets API trims them differently depending on the requested range.
+    """
+    values = [str(v) for v in values]
+    while values and values[-1] == "":
+        values.pop()
+    return hashlib.sha256(json.dumps(values).encode("utf-8")).hexdigest()
+
+
+def _chain_checksum(checksum, row_hashes):
+    """
+    Extends the running content checksum with new row hashes (hash chain).
+    """
+    for h in row_hashes:
+        checksum = hashlib.sha256((checksum + h).encode("utf-8")).hexdigest()
+    return checksum
+
+
+def _chunk_hashes(row_hashes):
+    """
+    One hash per CHUNK_ROWS consecutive rows (the last chunk may be shorter).
+    """
+    return [
+        hashlib.sha256("".join(row_hashes[i:i + CHUNK_ROWS]).encode("utf-8")).hexdigest()
+        for i in range(0, len(row_hashes), CHUNK_ROWS)
+    ]
+
+
+def _column_names(header):
+    """
+    Mirror column names for a sheet header. Blank names become column_<n>
+    and repeated ones get a _2, _3... suffix; SQLite compares column names
+    case-insensitively, so duplicates are found that way too.
+    """
+    names, seen = [], {n.lower() for n in _RESERVED}
+    for position, name in enumerate(header, start=1):
+        base = str(name).strip() or "column_%d" % position
+        name, suffix = base, 1
+        while name.lower() in seen:
+            suffix += 1
+            name = "%s_%d" % (base, suffix)
+        seen.add(name.lower())
+        names.append(name)
+    return names
+
+
+def _quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+def _connect_mirror():
+    # Autocommit mode: sync writes run inside explicit BEGIN/COMMIT blocks, so
+    # the table swap, row changes and bookkeeping land together or not at all.
+    conn = sqlite3.connect(MIRROR_PATH, isolation_level=None)
+    conn.execute("CREATE TABLE IF NOT EXISTS sync_meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS sync_chunks (chunk INTEGER PRIMARY KEY, hash TEXT)")
+    return conn
+
+
+def _read_meta(conn):
+    return dict(conn.execute("SELECT key, value FROM sync_meta").fetchall())
+
+
+def _write_meta(conn, meta):
+    conn.executemany(
+        "INSERT OR REPLACE INTO sync_meta (key, value) VALUES (?, ?)",
+        [(k, str(v)) for k, v in meta.items()]
+    )
+
+
+def _write_chunks(conn, chunk_hashes, first=0):
+    """
+    Stores chunk hashes from chunk `first` on and drops any stored beyond them.
+    """
+    conn.execute("DELETE FROM sync_chunks WHERE chunk >= ?", (first,))
+    conn.executemany(
+        "INSERT INTO sync_chunks (chunk, hash) VALUES (?, ?)",
+        list(enumerate(chunk_hashes[first:], start=first))
+    )
+
+
+def _rows_to_frame(columns, rows, row_hashes, first_row_number):
+    """
+    Pads/trims raw sheet rows to the header width and tags each with its
+    sheet row number (_row) and hash (_hash) so later syncs can verify it.
+    """
+    width = len(columns)
+    padded = [(list(r) + [""] * width)[:width] for r in rows]
+    df = pd.DataFrame(padded, columns=columns, dtype=str)
+    df.insert(0, "_row", range(first_row_number, first_row_number + len(df)))
+    df.insert(1, "_hash", row_hashes)
+    return df
+
+
+def _insert_rows(conn, df):
+    """
+    Inserts mirror rows inside the caller's transaction (to_sql would commit).
+    """
+    conn.executemany(
+        "INSERT INTO removal_events (%s) VALUES (%s)" % (
+            ", ".join(_quote(c) for c in df.columns), ", ".join("?" * len(df.columns))
+        ),
+        df.itertuples(index=False, name=None)
+    )
+
+
+def _sync_meta(header, row_hashes):
+    return {
+        "header_hash": _row_hash(header),
+        "last_row": 1 + len(row_hashes) if header else 0,
+        "checksum": _chain_checksum("", row_hashes),
+    }
+
+
+def _full_reload(conn, all_values):
+    """
+    Rebuilds the mirror from the whole worksheet. The new table is built
+    aside and swapped in within one transaction, so a failure leaves the
+    previous mirror in place.
+    """
+    conn.execute("DROP TABLE IF EXISTS removal_events_staging")
+    header = all_values[0] if all_values else []
+    rows = all_values[1:]
+    row_hashes = [_row_hash(r) for r in rows]
+    if header:
+        df = _rows_to_frame(_column_names(header), rows, row_hashes, first_row_number=2)
+        df.to_sql("removal_events_staging", conn, index=False)
+
+    full_reloads = int(_read_meta(conn).get("full_reloads", 0)) + 1
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("DROP TABLE IF EXISTS removal_events")
+    if header:
+        conn.execute("ALTER TABLE removal_events_staging RENAME TO removal_events")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_removal_events_row ON removal_events (_row)")
+    _write_chunks(conn, _chunk_hashes(row_hashes))
+    _write_meta(conn, {
+        **_sync_meta(header, row_hashes),
+        "full_reloads": full_reloads,
+        "full_reload_at": datetime.now().isoformat(timespec="seconds"),
+        "synced_at": datetime.now().isoformat(timespec="seconds"),
+    })
+    conn.execute("COMMIT")
+
+
+def _incremental_sync(conn, all_values, meta):
+    """
+    Applies changed chunks and new rows to the mirror. Returns False when the
+    mirror can't be patched in place (header changed, rows were removed) and
+    a full reload is needed.
+    """
+    synced = int(meta["last_row"]) - 1
+    header = all_values[0] if all_values else []
+    rows = all_values[1:]
+    if not header or _row_hash(header) != meta.get("header_hash") or len(rows) < synced:
+        return False
+
+    row_hashes = [_row_hash(r) for r in rows]
+    stored = dict(conn.execute("SELECT chunk, hash FROM sync_chunks").fetchall())
+    synced_chunks = _chunk_hashes(row_hashes[:synced])
+    changed = [i for i, h in enumerate(synced_chunks) if stored.get(i) != h]
+    if not changed and len(rows) == synced:
+        _write_meta(conn, {"synced_at": datetime.now().isoformat(timespec="seconds")})
+        return True
+
+    columns = _column_names(header)
+    conn.execute("BEGIN IMMEDIATE")
+    # Edited rows: the chunks that differ are replaced as a whole
+    for chunk in changed:
+        start = chunk * CHUNK_ROWS
+        end = min(start + CHUNK_ROWS, synced)
+        conn.execute("DELETE FROM removal_events WHERE _row BETWEEN ? AND ?", (start + 2, end + 1))
+        _insert_rows(conn, _rows_to_frame(columns, rows[start:end], row_hashes[start:end], start + 2))
+
+    # Rows appended since the last sync
+    _insert_rows(conn, _rows_to_frame(columns, rows[synced:], row_hashes[synced:], synced + 2))
+
+    chunk_hashes = _chunk_hashes(row_hashes)
+    _write_chunks(conn, chunk_hashes, min(changed + [synced // CHUNK_ROWS]))
+    _write_meta(conn, {
+        "last_row": 1 + len(rows),
+        "checksum": (
+            _chain_checksum(meta.get("checksum", ""), row_hashes[synced:]) if not changed
+            else _chain_checksum("", row_hashes)
+        ),
+        "synced_at": datetime.now().isoformat(timespec="seconds"),
+    })
+    conn.execute("COMMIT")
+    return True
+
+
+def load_mirror():
+    """
+    Reads the local mirror without touching Google Sheets.
+    """
+    conn = _connect_mirror()
+    try:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        if "removal_events" not in tables:
+            return pd.DataFrame()
+        cur = conn.execute("SELECT * FROM removal_events ORDER BY _row")
+        header = [c[0] for c in cur.description]
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    df = frame_from_values([header] + rows, WORKSHEET_NAME)
+    if df.empty:
+        return pd.DataFrame()
+    return df.drop(columns=["_row", "_hash"])
+
+
+def reset_mirror():
+    """
+    Empties the local mirror (after the sheet was wiped); the next sync
+    starts with a full reload.
+    """
+    with _SYNC_LOCK:
+        conn = _connect_mirror()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DROP TABLE IF EXISTS removal_events")
+            conn.execute("DELETE FROM sync_chunks")
+            conn.execute("DELETE FROM sync_meta")
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+
+def get_sync_status():
+    """
+    Returns the mirror bookkeeping (last synced row, checksum, timestamps).
+    """
+    conn = _connect_mirror()
+    try:
+        return _read_meta(conn)
+    finally:
+        conn.close()
+
+
+def sync_notice():
+    """
+    Warning to show about the last sync (it failed, or the sheet was
+    unreachable and the mirror was served), or None.
+    """
+    return _LAST_SYNC["notice"]
+
+
+def sync_removal_events(full=False):
+    """
+    Brings the local mirror of 'removal_events' up to date and returns it.
+    The sheet is compared with the mirror chunk by chunk and only new rows
+    and changed chunks are written; a full reload happens on first use, when
+    forced, or when rows were removed. Falls back to the last mirror if the
+    sheet is unreachable.
+    """
+    with _SYNC_LOCK:
+        sheet = connect_to_sheet(WORKSHEET_NAME)
+        if not sheet:
+            df = load_mirror()
+            _LAST_SYNC["notice"] = (
+                "Showing the last synced copy of removal events (Google Sheet unreachable)." if not df.empty else None
+            )
+            return df
+
+        conn = _connect_mirror()
+        try:
+            meta = _read_meta(conn)
+            all_values = sheet.get_all_values()
+            if (
+                full
+                or int(meta.get("last_row", 0)) < 1
+                or not _incremental_sync(conn, all_values, meta)
+            ):
+                _full_reload(conn, all_values)
+            _LAST_SYNC["notice"] = None
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            _LAST_SYNC["notice"] = f"Error syncing removal events: {e}. Showing the last synced copy."
+        finally:
+            conn.close()
+
+    df = load_mirror()
+    # Entry-time FH/FC checks follow the synced history
+    refresh_counter_index(df)
+    return df
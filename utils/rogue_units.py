@@ -0,0 +1,138 @@
+# /utils/rogue_units.py
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset_version import cached_for_version, dataset_version
+from utils.mtbf_calculator import unscheduled_mask
+
+# A rogue unit is an individual serial that keeps coming back: N or more
+# unscheduled removals within a window of calendar days or flight hours.
+# Units are tracked by component + serial, so a rogue that moves between
+# aircraft is still caught on a calendar window. FH windows only count
+# removals from one continuous stay on the same aircraft, since aircraft FH
+# can't be compared across tails.
+UNIT_KEYS = ["component_code", "serial_number"]
+
+ROGUE_MIN_REMOVALS = 3
+ROGUE_WINDOWS = {"days": 365, "fh": 1000}
+
+_CARRIED = ["aircraft_reg", "ata_chapter", "component_name", "part_number", "removal_date", "aircraft_fh"]
+
+
+def build_unit_events(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Unscheduled removals with a serial number, sorted once by unit and date.
+    Adds integer codes for the unit and for each continuous stay of the unit
+    on one aircraft, plus the removal date as a day number.
+    """
+    required = UNIT_KEYS + ["aircraft_reg", "removal_date"]
+    if df.empty or any(c not in df.columns for c in required):
+        return pd.DataFrame()
+
+    events = df[unscheduled_mask(df)]
+    serials = events["serial_number"].astype("string").str.strip()
+    events = events[serials.notna() & (serials != "")]
+    if events.empty:
+        return pd.DataFrame()
+
+    events = events[UNIT_KEYS + [c for c in _CARRIED if c in events.columns]].copy()
+    events["removal_date"] = pd.to_datetime(events["removal_date"], errors="coerce")
+    events["aircraft_fh"] = pd.to_numeric(events["aircraft_fh"], errors="coerce") if "aircraft_fh" in events.columns else np.nan
+    events = events.dropna(subset=["removal_date"])
+    events = events.sort_values(UNIT_KEYS + ["removal_date", "aircraft_fh"], kind="stable").reset_index(drop=True)
+
+    unit = events.groupby(UNIT_KEYS, sort=False, observed=True).ngroup().to_numpy()
+    aircraft = events["aircraft_reg"].astype(str).to_numpy()
+    new_stay = np.r_[True, (unit[1:] != unit[:-1]) | (aircraft[1:] != aircraft[:-1])]
+
+    events["unit"] = unit
+    events["stay"] = np.cumsum(new_stay) - 1
+    events["day"] = (events["removal_date"] - events["removal_date"].min()) / pd.Timedelta(days=1)
+    return events
+
+
+def unit_events(df: pd.DataFrame, version: str = None) -> pd.DataFrame:
+    version = version or dataset_version(df)
+    return cached_for_version("rogue_unit_events", version, lambda: build_unit_events(df))
+
+
+def window_counts(events: pd.DataFrame, basis: str = "days", window: float = None) -> np.ndarray:
+    """
+    For every removal, how many removals of the same unit fall in the window
+    ending at it (itself included), by binary search on a group*span + position
+    key. NaN where the position (FH) is missing.
+    """
+    window = ROGUE_WINDOWS[basis] if window is None else window
+    if events.empty:
+        return np.array([], dtype="float64")
+
+    if basis == "days":
+        group, pos = events["unit"].to_numpy(), events["day"].to_numpy(dtype="float64")
+    else:
+        group, pos = events["stay"].to_numpy(), events["aircraft_fh"].to_numpy(dtype="float64")
+
+    counts = np.full(len(events), np.nan)
+    valid = ~np.isnan(pos)
+    if not valid.any():
+        return counts
+
+    group, pos = group[valid], pos[valid]
+    base = pos.min()
+    span = (pos.max() - base) + window + 1.0
+    key = group.astype("float64") * span + (pos - base)
+
+    order = np.argsort(key, kind="stable")
+    sorted_key = key[order]
+    ends = np.searchsorted(sorted_key, sorted_key, side="right")
+    starts = np.searchsorted(sorted_key, sorted_key - window, side="left")
+
+    valid_counts = np.empty(len(order))
+    valid_counts[order] = ends - starts
+    counts[valid] = valid_counts
+    return counts
+
+
+def rogue_windows(df: pd.DataFrame, basis: str = "days", window: float = None, version: str = None) -> pd.DataFrame:
+    """
+    Cached unit events with a `window_count` column, built once per dataset
+    version, basis and window size. Filter by scope, then summarize_rogues().
+    """
+    version = version or dataset_version(df)
+    window = ROGUE_WINDOWS[basis] if window is None else window
+
+    def build():
+        events = unit_events(df, version)
+        return events.assign(window_count=window_counts(events, basis, window))
+
+    return cached_for_version(f"rogue_windows:{basis}:{window}", version, build)
+
+
+def summarize_rogues(rows: pd.DataFrame, min_removals: int = ROGUE_MIN_REMOVALS) -> pd.DataFrame:
+    """
+    One row per flagged serial: the most removals seen in any window, when it
+    first crossed the threshold, total unscheduled removals in `rows` and the
+    aircraft of its latest removal.
+    """
+    if rows.empty:
+        return pd.DataFrame()
+
+    flagged = rows[rows["window_count"] >= min_removals]
+    if flagged.empty:
+        return pd.DataFrame()
+
+    summary = flagged.groupby(UNIT_KEYS, observed=True, sort=False).agg(
+        removals_in_window=("window_count", "max"),
+        first_flagged=("removal_date", "min"),
+    )
+    details = {col: (col, "last") for col in ["component_name", "part_number"] if col in rows.columns}
+    details.update(
+        last_aircraft=("aircraft_reg", "last"),
+        total_removals=("unit", "size"),
+        last_removal=("removal_date", "max"),
+    )
+    units = rows[rows["unit"].isin(flagged["unit"].unique())]
+    history = units.groupby(UNIT_KEYS, observed=True, sort=False).agg(**details)
+    summary = summary.join(history).reset_index()
+    summary["removals_in_window"] = summary["removals_in_window"].astype(int)
+    return summary.sort_values(["removals_in_window", "total_removals"], ascending=False).reset_index(drop=True)
@@ -0,0 +1,141 @@
+# /utils/schema.py
+
+import pandas as pd
+
+# Declared column types per worksheet/table. Frames built from raw sheet
+# values (or loaded from CSV) are converted column-by-column to these types
+# once, so pages don't have to re-parse dates and numbers themselves.
+#   date     -> datetime64
+#   float    -> float64
+#   int      -> nullable Int64
+#   category -> pandas Categorical of strings
+#   text     -> string
+SHEET_SCHEMAS = {
+    "removal_events": {
+        "aircraft_reg": "category",
+        "component_code": "category",
+        "component_name": "text",
+        "part_number": "text",
+        "component_type": "category",
+        "serial_number": "text",
+        "ata_chapter": "category",
+        "category": "category",
+        "criticality": "category",
+        "removal_date": "date",
+        "aircraft_fh": "float",
+        "aircraft_fc": "int",
+        "removal_type": "category",
+        "removal_reason": "text",
+        "station": "category",
+        "remarks": "text",
+    },
+    "aircraft_fleet": {
+        "Registration": "category",
+        "MSN": "text",
+        "FH": "float",
+        "FC": "int",
+    },
+    "ata_chapters": {
+        "Chapter": "text",
+        "Description": "text",
+    },
+}
+
+# Placeholder component codes for entries made without picking from the
+# component master (e.g. the quick entry page saves "N/A")
+UNSPECIFIED_CODES = ["", "N/A"]
+
+
+def _to_text(values):
+    """
+    String form of a column. Whole-number floats (e.g. ATA 28 read as 28.0
+    because the column had blanks) are written without the '.0'.
+    """
+    s = pd.Series(values)
+    if pd.api.types.is_float_dtype(s) and (s.dropna() % 1 == 0).all():
+        s = s.astype("Int64")
+    return s.astype("string")
+
+
+def _convert(values, kind):
+    if kind == "date":
+        return pd.to_datetime(pd.Series(values), errors="coerce")
+    if kind == "float":
+        return pd.to_numeric(pd.Series(values), errors="coerce").astype("float64")
+    if kind == "int":
+        return pd.to_numeric(pd.Series(values), errors="coerce").round().astype("Int64")
+    if kind == "category":
+        return _to_text(values).astype("category")
+    if kind == "text":
+        return _to_text(values)
+    raise ValueError(f"Unknown column type '{kind}'")
+
+
+def _numericise(values):
+    """
+    Fallback for columns without a declared type. Mimics get_all_records():
+    a column that is entirely numeric becomes numbers, otherwise text.
+    """
+    s = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(s):
+        return s
+    blank = s.isna() | (s == "")
+    converted = pd.to_numeric(s, errors="coerce")
+    if converted.notna().sum() == (~blank).sum() and (~blank).any():
+        return converted
+    return s
+
+
+def _matches(series, kind):
+    dtype = series.dtype
+    if kind == "date":
+        return pd.api.types.is_datetime64_any_dtype(dtype)
+    if kind == "float":
+        return dtype == "float64"
+    if kind == "int":
+        return dtype == "Int64"
+    if kind == "category":
+        return isinstance(dtype, pd.CategoricalDtype)
+    if kind == "text":
+        return isinstance(dtype, pd.StringDtype)
+    return False
+
+
+def frame_from_values(values, table):
+    """
+    Builds a typed DataFrame from raw sheet values (header row first), one
+    column at a time, without the intermediate list of row dictionaries.
+    """
+    if not values or len(values) < 2:
+        return pd.DataFrame()
+
+    header = values[0]
+    width = len(header)
+    # Sheets trims trailing blank cells, so short rows are padded to the header
+    rows = [r if len(r) == width else (list(r) + [""] * width)[:width] for r in values[1:]]
+    schema = SHEET_SCHEMAS.get(table, {})
+
+    columns = {}
+    for name, column in zip(header, zip(*rows)):
+        if not name:
+            continue
+        kind = schema.get(name)
+        columns[name] = _convert(column, kind) if kind else _numericise(column)
+    return pd.DataFrame(columns)
+
+
+def apply_schema(df, table):
+    """
+    Converts an already-loaded frame (CSV upload, mirror, generated data) to
+    the declared types. Columns that already have the right dtype are left
+    untouched, so calling this on a typed frame is cheap.
+    """
+    if df is None or df.empty:
+        return df
+
+    schema = SHEET_SCHEMAS.get(table, {})
+    df = df.copy()
+    for name, kind in schema.items():
+        if name in df.columns and not _matches(df[name], kind):
+            df[name] = _convert(df[name], kind)
+    return df
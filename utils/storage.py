@@ -0,0 +1,466 @@
+# /utils/storage.py
+
+import csv
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+import streamlit as st
+
+from utils.csv_appender import CsvAppender
+
+# Backend selection: MAINTWATCH_STORAGE env var, else [storage] backend in
+# Streamlit secrets, else CSV. Options: "csv", "sqlite", "sheets".
+DEFAULT_BACKEND = "csv"
+DATA_DIR = "data"
+SQLITE_PATH = "data/maintwatch.sqlite"
+
+# Column order (and SQLite type) for the tables MaintWatch writes to.
+# Tables not listed here are stored with whatever columns they arrive with.
+TABLE_SCHEMAS = {
+    "removal_events": {
+        "aircraft_reg": "TEXT",
+        "component_code": "TEXT",
+        "component_name": "TEXT",
+        "part_number": "TEXT",
+        "serial_number": "TEXT",
+        "ata_chapter": "TEXT",
+        "category": "TEXT",
+        "criticality": "TEXT",
+        "removal_date": "TEXT",
+        "aircraft_fh": "REAL",
+        "aircraft_fc": "INTEGER",
+        "removal_type": "TEXT",
+        "removal_reason": "TEXT",
+        "station": "TEXT",
+        "remarks": "TEXT",
+    },
+    "defect_log": {
+        "defect_id": "INTEGER",
+        "aircraft_reg": "TEXT",
+        "defect_date": "TEXT",
+        "ata_chapter": "TEXT",
+        "defect_description": "TEXT",
+        "mel_reference": "TEXT",
+        "deferral_category": "TEXT",
+        "operational_limitations": "TEXT",
+        "raised_by": "TEXT",
+        "status": "TEXT",
+        "closure_date": "TEXT",
+        "remarks": "TEXT",
+    },
+}
+
+# Secondary indexes created by the SQLite backend
+TABLE_INDEXES = {
+    "removal_events": [
+        ("aircraft_reg", "removal_date"),
+        ("component_code", "serial_number"),
+        ("ata_chapter",),
+    ],
+    "defect_log": [
+        ("aircraft_reg", "ata_chapter", "status"),
+    ],
+}
+
+
+class StorageBackend:
+    """
+    Common interface for table storage. Tables are addressed by name
+    ('removal_events', 'defect_log', ...); rows are plain dictionaries.
+    """
+
+    name = "base"
+
+    def read_table(self, table, where=None, columns=None):
+        """Returns the table as a DataFrame, optionally filtered by equality on columns."""
+        raise NotImplementedError
+
+    def append_rows(self, table, records):
+        """Appends a list of dictionaries. Returns True on success."""
+        raise NotImplementedError
+
+    def bulk_append(self, table, df):
+        """Appends a DataFrame. Returns True on success."""
+        return self.append_rows(table, df.to_dict("records"))
+
+    def update_where(self, table, where, values):
+        """Sets `values` on every row matching `where`. Returns the number of rows updated."""
+        raise NotImplementedError
+
+    def clear(self, table):
+        """Deletes all rows but keeps the table/header. Returns True on success."""
+        raise NotImplementedError
+
+    def stamp(self, table):
+        """
+        A cheap JSON-able marker that changes whenever the table may have
+        changed (file sizes and times), or None if the backend has none.
+        """
+        return None
+
+
+def _file_stamp(*paths):
+    stamp = []
+    for path in paths:
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            continue
+        stamp += [info.st_mtime_ns, info.st_size]
+    return stamp or None
+
+
+def _fieldnames(table, records):
+    if table in TABLE_SCHEMAS:
+        return list(TABLE_SCHEMAS[table])
+    fields = []
+    for record in records:
+        for key in record:
+            if key not in fields:
+                fields.append(key)
+    return fields
+
+
+def _match_mask(df, where):
+    """
+    Equality mask over string forms, so 28 and "28" match like they do in
+    the CSV files.
+    """
+    mask = pd.Series(True, index=df.index)
+    for col, value in (where or {}).items():
+        if col not in df.columns:
+            return pd.Series(False, index=df.index)
+        mask &= df[col].astype(str) == str(value)
+    return mask
+
+
+class CsvBackend(StorageBackend):
+    """
+    One CSV file per table under data/. The original storage format.
+    """
+
+    name = "csv"
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self._lock = threading.Lock()
+        self._appenders = {}
+
+    def path(self, table):
+        return os.path.join(self.data_dir, f"{table}.csv")
+
+    def appender(self, table, records=()):
+        """
+        The table's group-commit appender (file-locked across processes).
+        """
+        with self._lock:
+            if table not in self._appenders:
+                self._appenders[table] = CsvAppender(self.path(table), _fieldnames(table, records))
+            return self._appenders[table]
+
+    def stamp(self, table):
+        return _file_stamp(self.path(table))
+
+    def read_table(self, table, where=None, columns=None):
+        try:
+            df = pd.read_csv(self.path(table), usecols=columns)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            return pd.DataFrame()
+
+        if where:
+            df = df[_match_mask(df, where)]
+        return df
+
+    def _existing_header(self, table):
+        """
+        Returns the header of an existing file, or None if the file is
+        missing or holds no header yet (blank file).
+        """
+        try:
+            with open(self.path(table), newline="", encoding="utf-8") as f:
+                for row in csv.reader(f):
+                    if row:
+                        return row
+        except FileNotFoundError:
+            pass
+        return None
+
+    def append_rows(self, table, records):
+        if not records:
+            return True
+
+        # Rows from concurrent sessions are grouped into one locked write +
+        # fsync; a missing or blank file is (re)started with a header line.
+        # Extra keys that aren't columns of the table are ignored.
+        return self.appender(table, records).append(records)
+
+    def update_where(self, table, where, values):
+        with self.appender(table).locked():
+            df = self.read_table(table)
+            if df.empty:
+                return 0
+
+            mask = _match_mask(df, where)
+            count = int(mask.sum())
+            if count:
+                for col, value in values.items():
+                    if col not in df.columns:
+                        df[col] = pd.NA
+                    df[col] = df[col].astype(object)
+                    df.loc[mask, col] = value
+                df.to_csv(self.path(table), index=False)
+        return count
+
+    def clear(self, table):
+        with self.appender(table).locked():
+            header = self._existing_header(table) or _fieldnames(table, [])
+            with open(self.path(table), "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(header)
+        return True
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Single indexed SQLite file. Tables are created on first use and seeded
+    from the matching data/*.csv, so an existing CSV install can switch over
+    without a migration step.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_PATH, data_dir=DATA_DIR):
+        self.path = path
+        self.data_dir = data_dir
+        self._lock = threading.Lock()
+        self._ready = set()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def stamp(self, table):
+        # The whole database; with WAL, recent commits change only the -wal file
+        return _file_stamp(self.path, self.path + "-wal")
+
+    def _columns(self, conn, table):
+        return [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')]
+
+    def _ensure_table(self, conn, table):
+        if table in self._ready:
+            return
+
+        if not self._columns(conn, table):
+            seed = CsvBackend(self.data_dir).read_table(table)
+            schema = TABLE_SCHEMAS.get(table)
+            if schema:
+                cols = ", ".join(f'"{c}" {t}' for c, t in schema.items())
+                conn.execute(f'CREATE TABLE "{table}" ({cols})')
+                if not seed.empty:
+                    seed = seed[[c for c in seed.columns if c in schema]]
+                    seed.to_sql(table, conn, index=False, if_exists="append")
+            elif not seed.empty:
+                seed.to_sql(table, conn, index=False)
+            else:
+                return
+
+        for index_cols in TABLE_INDEXES.get(table, []):
+            index_name = f"idx_{table}_{'_'.join(index_cols)}"
+            col_list = ", ".join(f'"{c}"' for c in index_cols)
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table}" ({col_list})')
+        conn.commit()
+        self._ready.add(table)
+
+    def _where_clause(self, where):
+        if not where:
+            return "", []
+        parts = [f'CAST("{c}" AS TEXT) = ?' for c in where]
+        return " WHERE " + " AND ".join(parts), [str(v) for v in where.values()]
+
+    def read_table(self, table, where=None, columns=None):
+        conn = self._connect()
+        try:
+            self._ensure_table(conn, table)
+            if table not in self._ready:
+                return pd.DataFrame()
+            col_sql = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+            clause, params = self._where_clause(where)
+            return pd.read_sql(f'SELECT {col_sql} FROM "{table}"{clause}', conn, params=params)
+        finally:
+            conn.close()
+
+    def append_rows(self, table, records):
+        if not records:
+            return True
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                self._ensure_table(conn, table)
+                if table not in self._ready:
+                    pd.DataFrame(records).to_sql(table, conn, index=False)
+                    self._ensure_table(conn, table)
+                else:
+                    cols = [c for c in self._columns(conn, table) if any(c in r for r in records)]
+                    placeholders = ", ".join("?" * len(cols))
+                    col_list = ", ".join(f'"{c}"' for c in cols)
+                    conn.executemany(
+                        f'INSERT INTO "{table}" ({col_list}) VALUES ({placeholders})',
+                        [[_sql_value(r.get(c)) for c in cols] for r in records]
+                    )
+                conn.commit()
+            finally:
+                conn.close()
+        return True
+
+    def bulk_append(self, table, df):
+        if df.empty:
+            return True
+        records = df.astype(object).where(df.notna(), None).to_dict("records")
+        return self.append_rows(table, records)
+
+    def update_where(self, table, where, values):
+        with self._lock:
+            conn = self._connect()
+            try:
+                self._ensure_table(conn, table)
+                if table not in self._ready:
+                    return 0
+                existing = self._columns(conn, table)
+                for col in values:
+                    if col not in existing:
+                        conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}"')
+                set_sql = ", ".join(f'"{c}" = ?' for c in values)
+                clause, params = self._where_clause(where)
+                cur = conn.execute(
+                    f'UPDATE "{table}" SET {set_sql}{clause}',
+                    [_sql_value(v) for v in values.values()] + params
+                )
+                conn.commit()
+                return cur.rowcount
+            finally:
+                conn.close()
+
+    def clear(self, table):
+        with self._lock:
+            conn = self._connect()
+            try:
+                self._ensure_table(conn, table)
+                if table in self._ready:
+                    conn.execute(f'DELETE FROM "{table}"')
+                    conn.commit()
+            finally:
+                conn.close()
+        return True
+
+
+def _sql_value(value):
+    """
+    Converts pandas/numpy/date values into something sqlite3 can bind.
+    """
+    if value is None:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, (int, float, str, bytes)):
+        return value
+    return str(value)
+
+
+class SheetsBackend(StorageBackend):
+    """
+    The 'MaintWatch_Data' Google Sheet, through utils/gsheet_loader.
+    Best used as a sync target: every read downloads the whole tab.
+    gsheet_loader (and gspread) are imported in the methods, so the other
+    backends never load them.
+    """
+
+    name = "sheets"
+
+    def read_table(self, table, where=None, columns=None):
+        from utils.gsheet_loader import fetch_all_data
+        df = fetch_all_data(table)
+        if df.empty:
+            return df
+        if where:
+            df = df[_match_mask(df, where)]
+        if columns:
+            df = df[[c for c in columns if c in df.columns]]
+        return df
+
+    def append_rows(self, table, records):
+        from utils.gsheet_loader import append_removal_event_gsheet, write_data_to_sheet
+        if table == "removal_events":
+            return all(append_removal_event_gsheet(r) for r in records)
+        return all(write_data_to_sheet(r, table) for r in records)
+
+    def bulk_append(self, table, df):
+        if table == "removal_events":
+            from utils.gsheet_loader import write_bulk_data
+            return write_bulk_data(df) is not None
+        return super().bulk_append(table, df)
+
+    def update_where(self, table, where, values):
+        from gspread.utils import rowcol_to_a1
+        from utils.gsheet_loader import connect_to_sheet
+        sheet = connect_to_sheet(table)
+        if not sheet:
+            return 0
+
+        all_values = sheet.get_all_values()
+        if len(all_values) < 2:
+            return 0
+
+        header = all_values[0]
+        df = pd.DataFrame([(r + [""] * len(header))[:len(header)] for r in all_values[1:]], columns=header)
+        matches = df.index[_match_mask(df, where)]
+
+        updates = []
+        for col, value in values.items():
+            if col not in header:
+                continue
+            col_number = header.index(col) + 1
+            for i in matches:
+                updates.append({"range": rowcol_to_a1(i + 2, col_number), "values": [[_sql_value(value)]]})
+
+        if updates:
+            sheet.batch_update(updates)
+        return len(matches)
+
+    def clear(self, table):
+        from utils.gsheet_loader import clear_worksheet_data
+        return clear_worksheet_data(table)
+
+
+BACKENDS = {
+    "csv": CsvBackend,
+    "sqlite": SqliteBackend,
+    "sheets": SheetsBackend,
+}
+
+_INSTANCES = {}
+
+
+def _configured_backend_name():
+    name = os.environ.get("MAINTWATCH_STORAGE")
+    if not name:
+        try:
+            name = st.secrets.get("storage", {}).get("backend")
+        except Exception:
+            name = None
+    return (name or DEFAULT_BACKEND).lower()
+
+
+def get_storage_backend(name=None):
+    """
+    Returns the shared backend instance selected by config (or by `name`).
+    """
+    name = (name or _configured_backend_name()).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+
+    if name not in _INSTANCES:
+        _INSTANCES[name] = BACKENDS[name]()
+    return _INSTANCES[name]
@@ -0,0 +1,189 @@
+# /utils/utilization.py
+
+import sqlite3
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset_version import cached_for_version, dataset_version
+
+# Dated FH/FC readings per aircraft, used to answer "hours flown by aircraft
+# X between dates A and B" by interpolation. Readings come from two places:
+#   - every removal record (aircraft_fh / aircraft_fc on the removal date)
+#   - the aircraft_fleet tab's current FH/FC, stored here with the date each
+#     value was first seen, since the tab itself keeps no history
+UTILIZATION_PATH = "data/utilization.sqlite"
+
+_LOCK = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fleet_snapshots (
+    aircraft_reg TEXT NOT NULL,
+    fh REAL NOT NULL,
+    fc REAL,
+    snapshot_date TEXT NOT NULL,
+    PRIMARY KEY (aircraft_reg, fh)
+);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(UTILIZATION_PATH)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def record_fleet_snapshots(fleet_df, as_of=None):
+    """
+    Stores the aircraft_fleet tab's current FH/FC as dated readings. A reading
+    keeps the date it was first seen, so re-reading an unchanged tab is a no-op.
+    """
+    if fleet_df is None or fleet_df.empty or "Registration" not in fleet_df.columns or "FH" not in fleet_df.columns:
+        return
+
+    as_of = (as_of or date.today()).strftime("%Y-%m-%d")
+    fh = pd.to_numeric(fleet_df["FH"], errors="coerce")
+    fc = pd.to_numeric(fleet_df["FC"], errors="coerce") if "FC" in fleet_df.columns else pd.Series(np.nan, index=fleet_df.index)
+    valid = fh.notna() & fleet_df["Registration"].notna()
+
+    rows = [
+        (str(reg), float(h), None if pd.isna(c) else float(c), as_of)
+        for reg, h, c in zip(fleet_df["Registration"][valid], fh[valid], fc[valid])
+    ]
+    if not rows:
+        return
+
+    with _LOCK:
+        conn = _connect()
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO fleet_snapshots (aircraft_reg, fh, fc, snapshot_date) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def load_fleet_snapshots():
+    conn = _connect()
+    try:
+        return pd.read_sql("SELECT aircraft_reg, snapshot_date, fh, fc FROM fleet_snapshots", conn)
+    finally:
+        conn.close()
+
+
+class UtilizationIndex:
+    """
+    Readings sorted once on a composite key aircraft * span + day, with FH
+    and FC made non-decreasing per aircraft. Queries for any set of aircraft
+    and dates are a clamp plus one np.interp over the whole fleet.
+    """
+
+    def __init__(self, snapshots):
+        snapshots = snapshots.dropna(subset=["aircraft_reg", "snapshot_date", "fh"])
+        self.aircraft = pd.Index(pd.unique(snapshots["aircraft_reg"].astype(str)))
+
+        codes = self.aircraft.get_indexer(snapshots["aircraft_reg"].astype(str))
+        days = snapshots["snapshot_date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+        fh = snapshots["fh"].to_numpy(dtype="float64")
+        fc = snapshots["fc"].to_numpy(dtype="float64", na_value=np.nan)
+
+        # One reading per aircraft and day (the day's highest counters)
+        order = np.lexsort((fh, days, codes))
+        codes, days, fh, fc = codes[order], days[order], fh[order], fc[order]
+        last_of_day = np.r_[(codes[1:] != codes[:-1]) | (days[1:] != days[:-1]), True]
+        codes, days, fh, fc = codes[last_of_day], days[last_of_day], fh[last_of_day], fc[last_of_day]
+
+        # Counters never go backwards; a low entry is treated as a typo
+        frame = pd.DataFrame({"code": codes, "fh": fh, "fc": fc})
+        cummax = frame.groupby("code")[["fh", "fc"]].cummax()
+        self.fh = cummax["fh"].to_numpy(dtype="float64")
+        fc_filled = cummax["fc"].groupby(frame["code"]).ffill().groupby(frame["code"]).bfill()
+        self.fc = fc_filled.fillna(0).to_numpy(dtype="float64")
+
+        self.min_day = int(days.min()) if len(days) else 0
+        self.span = int(days.max() - self.min_day) + 1 if len(days) else 1
+        self.key = codes.astype(np.int64) * self.span + (days - self.min_day)
+
+        n = len(self.aircraft)
+        self.first_day = np.full(n, 0, dtype=np.int64)
+        self.last_day = np.full(n, 0, dtype=np.int64)
+        if len(codes):
+            bounds = np.r_[0, np.flatnonzero(codes[1:] != codes[:-1]) + 1]
+            self.first_day[codes[bounds]] = days[bounds] - self.min_day
+            ends = np.r_[bounds[1:] - 1, len(codes) - 1]
+            self.last_day[codes[ends]] = days[ends] - self.min_day
+
+    def _day(self, when):
+        return int(np.datetime64(pd.Timestamp(when).date(), "D").astype(np.int64)) - self.min_day
+
+    def _counters_at(self, codes, day):
+        """
+        Interpolated FH and FC for each aircraft code on one day. Days outside
+        an aircraft's readings clamp to its first/last reading.
+        """
+        day = np.clip(day, self.first_day[codes], self.last_day[codes])
+        x = codes * self.span + day
+        return np.interp(x, self.key, self.fh), np.interp(x, self.key, self.fc)
+
+    def exposure(self, aircraft, start, end) -> pd.DataFrame:
+        """
+        FH and FC flown by each aircraft between `start` and `end` (dates,
+        inclusive). Aircraft without readings report 0.
+        """
+        aircraft = pd.Index([str(a) for a in aircraft])
+        codes = self.aircraft.get_indexer(aircraft)
+        known = codes >= 0
+
+        fh = np.zeros(len(aircraft))
+        fc = np.zeros(len(aircraft))
+        if known.any() and len(self.key):
+            known_codes = codes[known].astype(np.int64)
+            fh_start, fc_start = self._counters_at(known_codes, self._day(start))
+            fh_end, fc_end = self._counters_at(known_codes, self._day(end))
+            fh[known] = fh_end - fh_start
+            fc[known] = fc_end - fc_start
+
+        return pd.DataFrame({"aircraft_reg": aircraft, "fh": fh, "fc": fc})
+
+    def fleet_hours(self, aircraft, start, end) -> float:
+        return float(self.exposure(aircraft, start, end)["fh"].sum())
+
+
+def build_snapshots(removals_df, fleet_snapshots=None) -> pd.DataFrame:
+    """
+    Dated FH/FC readings from removal records plus stored fleet readings.
+    """
+    frames = []
+    if removals_df is not None and not removals_df.empty and {"aircraft_reg", "removal_date", "aircraft_fh"} <= set(removals_df.columns):
+        frames.append(pd.DataFrame({
+            "aircraft_reg": removals_df["aircraft_reg"].astype(str).to_numpy(),
+            "snapshot_date": pd.to_datetime(removals_df["removal_date"], errors="coerce").to_numpy(),
+            "fh": pd.to_numeric(removals_df["aircraft_fh"], errors="coerce").to_numpy(dtype="float64"),
+            "fc": (
+                pd.to_numeric(removals_df["aircraft_fc"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+                if "aircraft_fc" in removals_df.columns else np.nan
+            ),
+        }))
+    if fleet_snapshots is not None and not fleet_snapshots.empty:
+        frames.append(fleet_snapshots.assign(snapshot_date=pd.to_datetime(fleet_snapshots["snapshot_date"])))
+
+    if not frames:
+        return pd.DataFrame(columns=["aircraft_reg", "snapshot_date", "fh", "fc"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def utilization_index(removals_df, version: str = None) -> UtilizationIndex:
+    """
+    UtilizationIndex over the removal records and stored fleet readings,
+    cached per dataset version and fleet reading set.
+    """
+    version = version or dataset_version(removals_df)
+    fleet_snapshots = load_fleet_snapshots()
+    return cached_for_version(
+        f"utilization:{dataset_version(fleet_snapshots)}", version,
+        lambda: UtilizationIndex(build_snapshots(removals_df, fleet_snapshots))
+    )
@@ -0,0 +1,294 @@
+# /utils/write_queue.py
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import gspread
+
+from utils.gsheet_loader import build_sheet_row, connect_to_sheet
+
+# Removal entries are written to a local append-only journal first and pushed
+# to Google Sheets in batches by a background thread. The journal survives
+# crashes and outages: anything past the flushed offset is replayed on start.
+# Delivery is at-least-once (a crash between append_rows and the offset write
+# resends that batch), and there is one flusher per app process, started
+# when this module is first imported.
+# An entry the sheet rejects for good (a 4xx other than auth/quota/timeout, or
+# a journal line that can't be read) is moved to a dead-letter file instead
+# of blocking every later entry; the entry page lists them.
+JOURNAL_PATH = "data/removal_journal.jsonl"
+OFFSET_PATH = "data/removal_journal.offset"
+DEAD_LETTER_PATH = "data/removal_dead_letters.jsonl"
+WORKSHEET_NAME = "removal_events"
+
+BATCH_SIZE = 200            # Max rows per append_rows call
+FLUSH_DELAY = 2.0           # Seconds to wait for more entries before flushing
+BACKOFF_BASE = 2.0          # First retry delay (seconds), doubled per failure
+BACKOFF_MAX = 300.0
+COMPACT_BYTES = 1_000_000   # Truncate the journal once fully flushed and this large
+
+# Client errors that aren't about the entry itself and will pass on retry
+RETRYABLE_STATUS = (401, 403, 408, 429)
+
+logger = logging.getLogger(__name__)
+
+_LOCK = threading.Lock()
+_WAKE = threading.Event()
+_STATE = {
+    "thread": None,
+    "failures": 0,
+    "last_error": None,
+    "last_flush": None,
+    "flushed_rows": 0,
+    "api_calls": 0,
+}
+
+
+def _read_offset():
+    try:
+        with open(OFFSET_PATH, "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_offset(offset):
+    # Write-then-rename so a crash never leaves a half-written offset
+    tmp_path = OFFSET_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, OFFSET_PATH)
+
+
+def _read_pending(limit=None):
+    """
+    Returns (entries, end_offsets) for journal lines after the flushed offset;
+    end_offsets[i] is the journal offset just past entry i. A line that isn't
+    valid JSON is returned as {"raw": line} so it can be dead-lettered. A torn
+    last line (crash mid-write) is left for the next pass.
+    """
+    offset = _read_offset()
+    entries, end_offsets = [], []
+    if not os.path.isfile(JOURNAL_PATH):
+        return entries, end_offsets
+
+    with open(JOURNAL_PATH, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                entries.append({"raw": line.decode("utf-8", errors="replace").rstrip("\n")})
+            end_offsets.append(offset)
+            if limit and len(entries) >= limit:
+                break
+    return entries, end_offsets
+
+
+def _compact_journal():
+    """
+    Empties the journal once everything in it has been flushed.
+    Caller must hold _LOCK.
+    """
+    if not os.path.isfile(JOURNAL_PATH):
+        return
+    size = os.path.getsize(JOURNAL_PATH)
+    if size >= COMPACT_BYTES and _read_offset() == size:
+        open(JOURNAL_PATH, "w").close()
+        _write_offset(0)
+
+
+def _is_permanent(error):
+    """
+    True for errors that retrying the same entry can't fix.
+    """
+    if isinstance(error, gspread.exceptions.APIError):
+        status = getattr(error.response, "status_code", None)
+        return status is not None and 400 <= status < 500 and status not in RETRYABLE_STATUS
+    return isinstance(error, (KeyError, TypeError, ValueError))
+
+
+def _sheet_row(entry):
+    if "raw" in entry:
+        raise ValueError("Journal line is not valid JSON")
+    return entry["row"]
+
+
+def _dead_letter(entry, error, end_offset):
+    """
+    Moves one entry to the dead-letter file and advances the journal past it.
+    """
+    failure = {
+        "failed_at": datetime.now().isoformat(timespec="seconds"),
+        "error": _describe_error(error),
+        "entry": entry,
+    }
+    with _LOCK:
+        with open(DEAD_LETTER_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(failure, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        _write_offset(end_offset)
+    logger.error("Removal entry %s moved to dead letters: %s", entry.get("id", "?"), failure["error"])
+
+
+def _describe_error(error):
+    if isinstance(error, gspread.exceptions.APIError):
+        status = getattr(error.response, "status_code", None)
+        if status == 429:
+            return "Sheets write quota exceeded (429)"
+        return f"Sheets API error ({status}): {error}"
+    return f"{type(error).__name__}: {error}"
+
+
+def flush_pending():
+    """
+    Sends one batch of journaled rows to the sheet with append_rows.
+    Returns the number of entries handled, flushed or dead-lettered (0 if
+    nothing was pending). Raises on retryable failures so the caller can
+    back off.
+    """
+    entries, end_offsets = _read_pending(limit=BATCH_SIZE)
+    if not entries:
+        return 0
+
+    sheet = connect_to_sheet(WORKSHEET_NAME)
+    if not sheet:
+        raise ConnectionError("Could not connect to the 'removal_events' worksheet.")
+
+    try:
+        sheet.append_rows([_sheet_row(e) for e in entries])
+    except Exception as e:
+        if not _is_permanent(e):
+            raise
+        # Find the rejected entry: resend the oldest one alone. If the sheet
+        # takes it, the rest of the batch goes on the next pass.
+        entries, end_offsets = entries[:1], end_offsets[:1]
+        try:
+            sheet.append_rows([_sheet_row(entries[0])])
+        except Exception as e:
+            if not _is_permanent(e):
+                raise
+            _dead_letter(entries[0], e, end_offsets[0])
+            return 1
+
+    with _LOCK:
+        _write_offset(end_offsets[-1])
+        _STATE["flushed_rows"] += len(entries)
+        _STATE["api_calls"] += 1
+        _STATE["last_flush"] = datetime.now().isoformat(timespec="seconds")
+        _compact_journal()
+    return len(entries)
+
+
+def _flusher_loop():
+    while True:
+        # Periodic wake-ups replay anything left over from a crash or outage
+        if _WAKE.wait(timeout=FLUSH_DELAY * 5):
+            # Give concurrent submits a moment to land in the same batch
+            time.sleep(FLUSH_DELAY)
+        _WAKE.clear()
+
+        try:
+            while flush_pending():
+                pass
+            _STATE["failures"] = 0
+            _STATE["last_error"] = None
+        except Exception as e:
+            # Every failure is retried: a removal record is never dropped
+            _STATE["failures"] += 1
+            _STATE["last_error"] = _describe_error(e)
+            logger.warning("Removal journal flush failed: %s", _STATE["last_error"])
+
+            # Exponential backoff with jitter
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (_STATE["failures"] - 1)))
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+def start_flusher():
+    """
+    Starts the background flusher once per process. Any entries left in the
+    journal from a previous run are replayed on its first pass.
+    """
+    with _LOCK:
+        thread = _STATE["thread"]
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=_flusher_loop, name="removal-journal-flusher", daemon=True)
+            thread.start()
+            _STATE["thread"] = thread
+    _WAKE.set()
+
+
+def enqueue_removal_event(record):
+    """
+    Appends a removal record to the durable local journal and schedules it
+    for upload. Returns as soon as the entry is on disk.
+    """
+    entry = {
+        "id": uuid.uuid4().hex,
+        "queued_at": datetime.now().isoformat(timespec="seconds"),
+        "row": build_sheet_row(record, WORKSHEET_NAME),
+    }
+    line = json.dumps(entry, default=str) + "\n"
+
+    with _LOCK:
+        with open(JOURNAL_PATH, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    start_flusher()
+    return True
+
+
+def get_queue_status():
+    """
+    Returns pending row count and flusher health for display.
+    """
+    entries, _ = _read_pending()
+    return {
+        "pending": len(entries),
+        "dead_letters": len(get_dead_letters()),
+        "failures": _STATE["failures"],
+        "last_error": _STATE["last_error"],
+        "last_flush": _STATE["last_flush"],
+        "flushed_rows": _STATE["flushed_rows"],
+        "api_calls": _STATE["api_calls"],
+    }
+
+
+def get_dead_letters():
+    """
+    Entries the sheet rejected for good, oldest first, as
+    {"failed_at", "error", "entry"} dicts.
+    """
+    if not os.path.isfile(DEAD_LETTER_PATH):
+        return []
+    with open(DEAD_LETTER_PATH, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def clear_dead_letters():
+    """
+    Discards the dead-letter entries (after they were re-entered or checked).
+    """
+    with _LOCK:
+        if os.path.isfile(DEAD_LETTER_PATH):
+            os.remove(DEAD_LETTER_PATH)
+
+
+# Replay anything left in the journal as soon as the app loads this module
+start_flusher()
@@ -1,32 +1,111 @@
 # /validation/component_rules.py
 
-def validate_removal_event(record):
-    errors = []
-
-    required_fields = [
-        "aircraft_reg",
-        "component_name",
-        "part_number",
-        "serial_number",
-        "ata_chapter",
-        "removal_date",
-        "aircraft_fh",
-        "aircraft_fc",
-        "removal_reason"
-    ]
-
-    for field in required_fields:
-        if not record.get(field):
-            errors.append(f"{field} is required")
-
-    if record.get("aircraft_fh", 0) <= 0:
-        errors.append("Aircraft FH must be greater than zero")
-
-    if record.get("aircraft_fc", -1) < 0:
-        errors.append("Aircraft FC must be zero or greater")
-
-    ata = str(record.get("ata_chapter", ""))
-    if not ata.replace("-", "").isdigit():
-        errors.append("ATA chapter format is invalid")
-
-    return errors
+import numpy as np
+import pandas as pd
+
+from utils.schema import UNSPECIFIED_CODES
+
+REQUIRED_FIELDS = [
+    "aircraft_reg",
+    "component_name",
+    "part_number",
+    "serial_number",
+    "ata_chapter",
+    "removal_date",
+    "aircraft_fh",
+    "aircraft_fc",
+    "removal_reason"
+]
+
+FH_RULE = "Aircraft FH must be greater than zero"
+FC_RULE = "Aircraft FC must be zero or greater"
+ATA_RULE = "ATA chapter format is invalid"
+CODE_RULE = "Component code is not in the component master"
+
+
+def _text(values):
+    """
+    Column as strings (missing stays <NA>); whole-number floats such as an
+    ATA chapter read as 28.0 are written without the '.0'.
+    """
+    if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+        values = values.astype("Int64")
+    return values.astype("string")
+
+
+def _blank(values):
+    """
+    Values a required field counts as missing: blank text, and for numbers
+    also 0, as in the per-record check (`not record.get(field)`) this
+    replaced, so an FH or FC left at 0 is reported as not entered.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.isna().to_numpy(dtype=bool) | (values == 0).fillna(False).to_numpy(dtype=bool)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.isna().to_numpy(dtype=bool)
+    return _text(values).str.strip().fillna("").eq("").to_numpy(dtype=bool)
+
+
+def _number(df, field):
+    if field not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[field], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def validate_removal_events(df, known_codes=None):
+    """
+    Checks every row of a removal-events frame at once. Returns a boolean
+    error matrix with the frame's index and one column per rule (the column
+    name is the error message); True marks a violation. With `known_codes`,
+    component codes must be among them (placeholders excepted).
+    """
+    n = len(df)
+    errors = {}
+
+    for field in REQUIRED_FIELDS:
+        errors[f"{field} is required"] = _blank(df[field]) if field in df.columns else np.ones(n, dtype=bool)
+
+    # NaN compares False, so a missing or non-numeric counter fails its rule
+    errors[FH_RULE] = ~(_number(df, "aircraft_fh") > 0)
+    errors[FC_RULE] = ~(_number(df, "aircraft_fc") >= 0)
+
+    if "ata_chapter" in df.columns:
+        ata = _text(df["ata_chapter"]).str.replace("-", "", regex=False)
+        errors[ATA_RULE] = ~ata.str.isdigit().fillna(False).to_numpy(dtype=bool)
+    else:
+        errors[ATA_RULE] = np.ones(n, dtype=bool)
+
+    if known_codes is not None and "component_code" in df.columns:
+        codes = _text(df["component_code"]).str.strip().fillna("")
+        # Placeholder codes (no component picked from the master) pass
+        known = pd.Index(list(known_codes), dtype="string").append(pd.Index(UNSPECIFIED_CODES, dtype="string"))
+        errors[CODE_RULE] = ~codes.isin(known).to_numpy(dtype=bool)
+
+    return pd.DataFrame(errors, index=df.index)
+
+
+def error_summary(errors):
+    """
+    Number of failing rows per rule, for rules that fail at least once.
+    """
+    counts = errors.sum()
+    return counts[counts > 0].rename("rows").rename_axis("rule").reset_index()
+
+
+def row_errors(errors, limit=None):
+    """
+    Error messages per failing row ({index: [messages]}), first `limit` rows.
+    """
+    failing = errors[errors.any(axis=1)]
+    if limit is not None:
+        failing = failing.head(limit)
+    columns = np.array(errors.columns)
+    return {idx: columns[row].tolist() for idx, row in zip(failing.index, failing.to_numpy())}
+
+
+def validate_removal_event(record, known_codes=None):
+    """
+    Error messages for one record (same rules as validate_removal_events).
+    """
+    errors = validate_removal_events(pd.DataFrame([record]), known_codes)
+    return errors.columns[errors.iloc[0].to_numpy()].tolist()